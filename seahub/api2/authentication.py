@@ -5,8 +5,9 @@ from rest_framework import status
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import APIException
 
-from seaserv import ccnet_api
 from seahub.base.accounts import User
+from seahub.auth.identity_cache import get_cached_token, \
+    get_user_with_cache, get_user_orgs
 from seahub.api2.models import Token, TokenV2
 from seahub.api2.utils import get_client_ip
 from seahub.utils import within_time_range
@@ -67,17 +68,17 @@ class TokenAuthentication(BaseAuthentication):
 
     def authenticate_v1(self, request, key):
         try:
-            token = Token.objects.get(key=key)
+            token = get_cached_token(Token, key)
         except Token.DoesNotExist:
             raise AuthenticationFailed('Invalid token')
 
         try:
-            user = User.objects.get(email=token.user)
+            user = get_user_with_cache(token.user)
         except User.DoesNotExist:
             raise AuthenticationFailed('User inactive or deleted')
 
         if MULTI_TENANCY:
-            orgs = ccnet_api.get_orgs_by_user(token.user)
+            orgs = get_user_orgs(token.user)
             if orgs:
                 user.org = orgs[0]
 
@@ -86,7 +87,7 @@ class TokenAuthentication(BaseAuthentication):
 
     def authenticate_v2(self, request, key):
         try:
-            token = TokenV2.objects.get(key=key)
+            token = get_cached_token(TokenV2, key)
         except TokenV2.DoesNotExist:
             # Continue authentication in token v1
             return None
@@ -95,12 +96,12 @@ class TokenAuthentication(BaseAuthentication):
             raise DeviceRemoteWipedException('Device set to be remote wiped')
 
         try:
-            user = User.objects.get(email=token.user)
+            user = get_user_with_cache(token.user)
         except User.DoesNotExist:
             raise AuthenticationFailed('User inactive or deleted')
 
         if MULTI_TENANCY:
-            orgs = ccnet_api.get_orgs_by_user(token.user)
+            orgs = get_user_orgs(token.user)
             if orgs:
                 user.org = orgs[0]
 
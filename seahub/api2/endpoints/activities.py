@@ -9,14 +9,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
 
-from seahub.base.templatetags.seahub_tags import email2contact_email
 from seahub.utils import EVENTS_ENABLED, get_user_activities
 from seahub.utils.timeutils import utc_datetime_to_isoformat_timestr
 from seahub.api2.utils import api_error
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.authentication import TokenAuthentication
-from seahub.base.templatetags.seahub_tags import email2nickname
-from seahub.avatar.templatetags.avatar_tags import api_avatar_url
+from seahub.utils.user_info import get_users_info
 from seahub.drafts.models import Draft
 
 logger = logging.getLogger(__name__)
@@ -53,6 +51,15 @@ class ActivitiesView(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
+        try:
+            avatar_size = int(request.GET.get('avatar_size', 72))
+        except ValueError:
+            avatar_size = 72
+
+        # Use dict to reduce memcache fetch cost in large for-loop.
+        users_info = get_users_info(set([event.op_user for event in events]),
+                avatar_size)
+
         events_list = []
         for e in events:
             d = dict(op_type=e.op_type)
@@ -63,16 +70,11 @@ class ActivitiesView(APIView):
             d['path'] = e.path
             d['name'] = '' if e.path == '/' else os.path.basename(e.path)
             d['author_email'] = e.op_user
-            d['author_name'] = email2nickname(e.op_user)
-            d['author_contact_email'] = email2contact_email(e.op_user)
-
-            try:
-                avatar_size = int(request.GET.get('avatar_size', 72))
-            except ValueError as e:
-                avatar_size = 72
-
-            url, is_default, date_uploaded = api_avatar_url(e.op_user, avatar_size)
-            d['avatar_url'] = request.build_absolute_uri(url)
+            user_info = users_info.get(e.op_user, {})
+            d['author_name'] = user_info.get('name', '')
+            d['author_contact_email'] = user_info.get('contact_email', '')
+            d['avatar_url'] = request.build_absolute_uri(
+                    user_info.get('avatar_url', ''))
             d['time'] = utc_datetime_to_isoformat_timestr(e.timestamp)
 
             if e.op_type == 'clean-up-trash':
@@ -21,9 +21,10 @@ from seahub.base.accounts import User
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.profile.models import Profile, DetailedProfile
 from seahub.institutions.models import Institution
+from seahub.institutions.utils import update_user_quota
 from seahub.utils import is_valid_username, is_org_context
 from seahub.utils.file_size import get_file_size_unit
-from seahub.group.utils import is_group_member
+from seahub.group.utils import is_group_member, clear_user_group_ids_cache
 
 
 logger = logging.getLogger(__name__)
@@ -98,6 +99,7 @@ class Account(APIView):
                     # add new user to the group on behalf of the group creator
                     ccnet_threaded_rpc.group_add_member(g.id, g.creator_name,
                                                         to_user)
+                    clear_user_group_ids_cache(to_user)
 
                 if from_user == g.creator_name:
                     ccnet_threaded_rpc.set_group_creator(g.id, to_user)
@@ -155,7 +157,7 @@ class Account(APIView):
                 seaserv.seafserv_threaded_rpc.set_org_user_quota(org_id,
                         email, space_quota)
             else:
-                seafile_api.set_user_quota(email, space_quota)
+                update_user_quota(email, space_quota)
 
         # update user institution
         institution = request.data.get("institution", None)
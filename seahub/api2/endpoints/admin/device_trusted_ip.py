@@ -14,9 +14,17 @@ from seahub.api2.permissions import IsProVersion
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
 from seahub.trusted_ip.models import TrustedIP
+from seahub.trusted_ip.utils import parse_ip_range
 
 
 def cmp_ip(big_ip, small_ip):
+    # CIDRs and IPv6 addresses are listed after IPv4 addresses/wildcards
+    big_is_v4 = '/' not in big_ip['ip'] and ':' not in big_ip['ip']
+    small_is_v4 = '/' not in small_ip['ip'] and ':' not in small_ip['ip']
+    if not big_is_v4 or not small_is_v4:
+        return cmp((not big_is_v4, big_ip['ip']),
+                   (not small_is_v4, small_ip['ip'])) or 1
+
     big_ip = big_ip['ip'].split('.')
     small_ip = small_ip['ip'].split('.')
     new_big_ip = []
@@ -68,8 +76,12 @@ def check_parameter(func):
             try:
                 validate_ipv4_address(ipaddress.replace('*', '1'))
             except ValidationError:
-                error_msg = "IP address invalid."
-                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+                # CIDR or IPv6
+                try:
+                    parse_ip_range(ipaddress)
+                except ValueError:
+                    error_msg = "IP address invalid."
+                    return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
 
         return func(view, request, *args, **kwargs)
     return _decorated
@@ -9,7 +9,8 @@ from rest_framework import status
 
 from seaserv import seafile_api, ccnet_api
 
-from seahub.group.utils import get_group_member_info, is_group_member
+from seahub.group.utils import get_group_member_info, \
+    get_group_members_info, is_group_member, clear_user_group_ids_cache
 from seahub.group.signals import add_user_to_group
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.base.accounts import User
@@ -54,10 +55,8 @@ class AdminGroupMembers(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
-        group_members_info = []
-        for m in members:
-            member_info = get_group_member_info(request, group_id, m.user_name, avatar_size)
-            group_members_info.append(member_info)
+        group_members_info = get_group_members_info(request, group_id,
+                                                    members, avatar_size)
 
         group_members = {
             'group_id': group_id,
@@ -115,6 +114,7 @@ class AdminGroupMembers(APIView):
         for email in emails_need_add:
             try:
                 ccnet_api.group_add_member(group_id, group.creator_name, email)
+                clear_user_group_ids_cache(email)
                 member_info = get_group_member_info(request, group_id, email)
                 result['success'].append(member_info)
             except Exception as e:
@@ -214,6 +214,7 @@ class AdminGroupMember(APIView):
 
         try:
             ccnet_api.group_remove_member(group_id, group.creator_name, email)
+            clear_user_group_ids_cache(email)
             # remove repo-group share info of all 'email' owned repos
             seafile_api.remove_group_repos_by_owner(group_id, email)
         except Exception as e:
@@ -16,7 +16,8 @@ from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.utils import is_valid_username, is_pro_version
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from seahub.group.utils import is_group_member, is_group_admin, \
-        validate_group_name, check_group_name_conflict
+        validate_group_name, check_group_name_conflict, \
+        clear_user_group_ids_cache
 from seahub.admin_log.signals import admin_operation
 from seahub.admin_log.models import GROUP_CREATE, GROUP_DELETE, GROUP_TRANSFER
 from seahub.api2.utils import api_error
@@ -205,6 +206,7 @@ class AdminGroup(APIView):
             try:
                 if not is_group_member(group_id, new_owner):
                     ccnet_api.group_add_member(group_id, old_owner, new_owner)
+                    clear_user_group_ids_cache(new_owner)
 
                 if not is_group_admin(group_id, new_owner):
                     ccnet_api.group_set_admin(group_id, new_owner)
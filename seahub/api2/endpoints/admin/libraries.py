@@ -19,10 +19,10 @@ from seahub.views import get_system_default_repo_id
 from seahub.admin_log.signals import admin_operation
 from seahub.admin_log.models import REPO_CREATE, REPO_DELETE, REPO_TRANSFER
 from seahub.share.models import FileShare, UploadLinkShare
-from seahub.base.templatetags.seahub_tags import email2nickname, email2contact_email
-from seahub.group.utils import is_group_member, group_id_to_name
+from seahub.group.utils import is_group_member, group_ids_to_names
 from seahub.utils.repo import get_related_users_by_repo, normalize_repo_status_code, normalize_repo_status_str
 from seahub.utils import is_valid_dirent_name, is_valid_email
+from seahub.utils.user_info import emails2nicknames, emails2contact_emails
 
 from seahub.api2.endpoints.group_owned_libraries import get_group_id_by_repo_owner
 
@@ -33,35 +33,70 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-def get_repo_info(repo):
-
-    repo_owner = seafile_api.get_repo_owner(repo.repo_id)
-    if not repo_owner:
-        try:
-            org_repo_owner = seafile_api.get_org_repo_owner(repo.repo_id)
-        except Exception:
-            org_repo_owner = None
-
-    owner = repo_owner or org_repo_owner or ''
+def _get_repo_owner(repo_id):
+    repo_owner = seafile_api.get_repo_owner(repo_id)
+    if repo_owner:
+        return repo_owner
+
+    try:
+        return seafile_api.get_org_repo_owner(repo_id) or ''
+    except Exception:
+        return ''
+
+def get_repo_info_list(repos, owner=None):
+    """Return info of ``repos``, resolving owners, owner names and group
+    names once per distinct value, with one query for all owner profiles.
+
+    ``owner`` is the owner of all ``repos`` if already known.
+    """
+    owners = {}
+    for repo in repos:
+        if repo.repo_id not in owners:
+            owners[repo.repo_id] = owner or _get_repo_owner(repo.repo_id)
+
+    emails = set(owners.values())
+    nicknames = emails2nicknames(emails)
+    contact_emails = emails2contact_emails(emails)
+    group_names = group_ids_to_names([get_group_id_by_repo_owner(e)
+                                      for e in emails if '@seafile_group' in e])
+
+    results = []
+    for repo in repos:
+        repo_owner = owners[repo.repo_id]
+
+        result = {}
+        result['id'] = repo.repo_id
+        result['name'] = repo.repo_name
+        result['owner'] = repo_owner
+        result['owner_email'] = repo_owner
+        result['owner_name'] = nicknames.get(repo_owner, '')
+        result['owner_contact_email'] = contact_emails.get(repo_owner, '')
+        result['size'] = repo.size
+        result['size_formatted'] = filesizeformat(repo.size)
+        result['encrypted'] = repo.encrypted
+        result['file_count'] = repo.file_count
+        result['status'] = normalize_repo_status_code(repo.status)
+
+        if '@seafile_group' in repo_owner:
+            group_id = get_group_id_by_repo_owner(repo_owner)
+            result['group_name'] = group_names.get(group_id, '')
+
+        results.append(result)
+
+    return results
 
-    result = {}
-    result['id'] = repo.repo_id
-    result['name'] = repo.repo_name
-    result['owner'] = owner
-    result['owner_email'] = owner
-    result['owner_name'] = email2nickname(owner)
-    result['owner_contact_email'] = email2contact_email(owner)
-    result['size'] = repo.size
-    result['size_formatted'] = filesizeformat(repo.size)
-    result['encrypted'] = repo.encrypted
-    result['file_count'] = repo.file_count
-    result['status'] = normalize_repo_status_code(repo.status)
+def get_repo_info(repo):
+    return get_repo_info_list([repo])[0]
 
-    if '@seafile_group' in owner:
-        group_id = get_group_id_by_repo_owner(owner)
-        result['group_name'] = group_id_to_name(group_id)
+def _get_page_params(request):
+    try:
+        current_page = int(request.GET.get('page', '1'))
+        per_page = int(request.GET.get('per_page', '100'))
+    except ValueError:
+        current_page = 1
+        per_page = 100
 
-    return result
+    return max(current_page, 1), max(per_page, 1)
 
 
 class AdminLibraries(APIView):
@@ -79,52 +114,47 @@ class AdminLibraries(APIView):
         # search libraries (by name/owner)
         repo_name = request.GET.get('name', '')
         owner = request.GET.get('owner', '')
-        repos = []
         if repo_name and owner:
             # search by name and owner
             owned_repos = seafile_api.get_owned_repo_list(owner)
-            for repo in owned_repos:
-                if not repo.name or repo.is_virtual:
-                    continue
-
-                if repo_name in repo.name:
-                    repo_info = get_repo_info(repo)
-                    repos.append(repo_info)
+            matched = [r for r in owned_repos if r.name and
+                       not r.is_virtual and repo_name in r.name]
+            repos = get_repo_info_list(matched, owner=owner)
 
             return Response({"name": repo_name, "owner": owner, "repos": repos})
 
         elif repo_name:
             # search by name(keyword in name)
             repos_all = seafile_api.get_repo_list(-1, -1)
-            for repo in repos_all:
-                if not repo.name or repo.is_virtual:
-                    continue
-
-                if repo_name in repo.name:
-                    repo_info = get_repo_info(repo)
-                    repos.append(repo_info)
+            matched = [r for r in repos_all if r.name and
+                       not r.is_virtual and repo_name in r.name]
+
+            if 'page' not in request.GET and 'per_page' not in request.GET:
+                repos = get_repo_info_list(matched)
+                return Response({"name": repo_name, "owner": '', "repos": repos})
+
+            # only look up owners of libraries on the requested page
+            current_page, per_page = _get_page_params(request)
+            start = (current_page - 1) * per_page
+            repos = get_repo_info_list(matched[start:start + per_page])
+            page_info = {
+                'has_next_page': len(matched) > start + per_page,
+                'current_page': current_page
+            }
 
-            return Response({"name": repo_name, "owner": '', "repos": repos})
+            return Response({"name": repo_name, "owner": '', "repos": repos,
+                             "page_info": page_info})
 
         elif owner:
             # search by owner
             owned_repos = seafile_api.get_owned_repo_list(owner)
-            for repo in owned_repos:
-                if repo.is_virtual:
-                    continue
-
-                repo_info = get_repo_info(repo)
-                repos.append(repo_info)
+            owned_repos = [r for r in owned_repos if not r.is_virtual]
+            repos = get_repo_info_list(owned_repos, owner=owner)
 
             return Response({"name": '', "owner": owner, "repos": repos})
 
         # get libraries by page
-        try:
-            current_page = int(request.GET.get('page', '1'))
-            per_page = int(request.GET.get('per_page', '100'))
-        except ValueError:
-            current_page = 1
-            per_page = 100
+        current_page, per_page = _get_page_params(request)
 
         start = (current_page - 1) * per_page
         limit = per_page + 1
@@ -141,11 +171,7 @@ class AdminLibraries(APIView):
         repos_all = filter(lambda r: not r.is_virtual, repos_all)
         repos_all = filter(lambda r: r.repo_id != default_repo_id, repos_all)
 
-        return_results = []
-
-        for repo in repos_all:
-            repo_info = get_repo_info(repo)
-            return_results.append(repo_info)
+        return_results = get_repo_info_list(repos_all)
 
         page_info = {
             'has_next_page': has_next_page,
@@ -12,9 +12,11 @@ from seaserv import ccnet_api
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
+from seahub.api2.endpoints.admin.sysinfo import SYSINFO_METRICS
 from seahub.settings import LICENSE_PATH
 from seahub.utils import get_file_type_and_ext
 from seahub.utils.error_msg import file_type_error_msg, file_size_error_msg
+from seahub.utils.system_metrics import clear_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +51,7 @@ class AdminLicense(APIView):
                 fd.write(license_file.read())
 
             ccnet_api.reload_license()
+            clear_metrics(SYSINFO_METRICS)
         except Exception as e:
             logger.error(e)
             error_msg = 'Internal Server Error'
@@ -16,6 +16,7 @@ from seahub.base.templatetags.seahub_tags import email2nickname, \
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
+from seahub.auth.identity_cache import invalidate_user_identity
 from seahub.api2.permissions import IsProVersion
 from seahub.role_permissions.utils import get_available_roles
 
@@ -243,6 +244,7 @@ class AdminOrganization(APIView):
             users = ccnet_api.get_org_emailusers(org.url_prefix, -1, -1)
             for u in users:
                 ccnet_api.remove_org_user(org_id, u.email)
+                invalidate_user_identity(u.email)
 
             # remove org groups
             groups = ccnet_api.get_org_groups(org_id, -1, -1)
@@ -19,6 +19,7 @@ from seahub.utils import get_file_ops_stats_by_day, \
         is_pro_version, EVENTS_ENABLED, get_system_traffic_by_day, \
         seafevents_api
 from seahub.utils.timeutils import datetime_to_isoformat_timestr
+from seahub.utils.system_metrics import get_metrics
 from seahub.utils.ms_excel import write_xls
 from seahub.utils.file_size import byte_to_mb
 from seahub.views.sysadmin import _populate_user_quota_usage
@@ -81,7 +82,8 @@ class FileOperationsView(APIView):
                 the list of file operations record.
         """
         offset = get_time_offset()
-        data = get_file_ops_stats_by_day(start_time, end_time, offset)
+        data = get_stats('file-operations', get_file_ops_stats_by_day,
+                         start_time, end_time, offset)
         ops_added_dict = get_init_data(start_time, end_time)
         ops_visited_dict = get_init_data(start_time, end_time)
         ops_deleted_dict = get_init_data(start_time, end_time)
@@ -114,7 +116,8 @@ class TotalStorageView(APIView):
 
     @check_parameter
     def get(self, request, start_time, end_time):
-        data = get_total_storage_stats_by_day(start_time, end_time, get_time_offset())
+        data = get_stats('total-storage', get_total_storage_stats_by_day,
+                         start_time, end_time, get_time_offset())
 
         res_data = []
         init_data = get_init_data(start_time, end_time)
@@ -133,7 +136,8 @@ class ActiveUsersView(APIView):
 
     @check_parameter
     def get(self, request, start_time, end_time):
-        data = get_user_activity_stats_by_day(start_time, end_time, get_time_offset())
+        data = get_stats('active-users', get_user_activity_stats_by_day,
+                         start_time, end_time, get_time_offset())
 
         res_data = []
         init_data = get_init_data(start_time, end_time)
@@ -159,8 +163,8 @@ class SystemTrafficView(APIView):
         init_data = get_init_data(start_time, end_time,
                                   dict(zip(op_type_list, init_count)))
 
-        for e in get_system_traffic_by_day(start_time, end_time,
-                                           get_time_offset()):
+        for e in get_stats('system-traffic', get_system_traffic_by_day,
+                           start_time, end_time, get_time_offset()):
             dt, op_type, count = e
             init_data[dt].update({op_type: count})
 
@@ -173,6 +177,16 @@ class SystemTrafficView(APIView):
         return Response(sorted(res_data, key=lambda x: x['datetime']))
 
 
+def get_stats(name, func, start_time, end_time, offset):
+    """Return ``func(start_time, end_time, offset)`` from a snapshot, so
+    redrawing a chart does not query seafevents again.
+    """
+    def compute():
+        return [tuple(e) for e in func(start_time, end_time, offset)]
+
+    return get_metrics('statistics_%s_%s_%s_%s' % (name, start_time,
+                                                   end_time, offset), compute)
+
 def get_init_data(start_time, end_time, init_data=0):
     res = {}
     start_time = start_time.replace(hour=0).replace(minute=0).replace(second=0)
@@ -11,6 +11,7 @@ from pysearpc import SearpcError
 
 from seahub.utils import is_pro_version
 from seahub.utils.licenseparse import parse_license
+from seahub.utils.system_metrics import get_metrics
 
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
@@ -23,135 +24,151 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-class SysInfo(APIView):
-    """Show system info.
-    """
-    authentication_classes = (TokenAuthentication, SessionAuthentication)
-    throttle_classes = (UserRateThrottle,)
-    permission_classes = (IsAdminUser,)
+SYSINFO_METRICS = 'sysinfo'
 
-    def get(self, request, format=None):
-        # count repos
-        try:
-            repos_count = seafile_api.count_repos()
-        except SearpcError as e:
-            logger.error(e)
-            repos_count = 0
+def count_groups():
+    # ``count_groups`` rpc is not available in older ccnet
+    if hasattr(ccnet_api, 'count_groups'):
+        return ccnet_api.count_groups()
+    return len(ccnet_api.get_all_groups(-1, -1))
 
-        # count groups
+def get_sys_info():
+    """Count users, groups, libraries, files, storage and devices, and get
+    license info.
+    """
+    # count repos
+    try:
+        repos_count = seafile_api.count_repos()
+    except SearpcError as e:
+        logger.error(e)
+        repos_count = 0
+
+    # count groups
+    try:
+        groups_count = count_groups()
+    except Exception as e:
+        logger.error(e)
+        groups_count = 0
+
+    # count orgs
+    if MULTI_TENANCY:
+        multi_tenancy_enabled = True
         try:
-            groups_count = len(ccnet_api.get_all_groups(-1, -1))
+            org_count = ccnet_api.count_orgs()
         except Exception as e:
             logger.error(e)
-            groups_count = 0
-
-        # count orgs
-        if MULTI_TENANCY:
-            multi_tenancy_enabled = True
-            try:
-                org_count = ccnet_api.count_orgs()
-            except Exception as e:
-                logger.error(e)
-                org_count = 0
-        else:
-            multi_tenancy_enabled = False
             org_count = 0
-
-        # count users
+    else:
+        multi_tenancy_enabled = False
+        org_count = 0
+
+    # count users
+    try:
+        active_db_users = ccnet_api.count_emailusers('DB')
+    except Exception as e:
+        logger.error(e)
+        active_db_users = 0
+
+    try:
+        active_ldap_users = ccnet_api.count_emailusers('LDAP')
+    except Exception as e:
+        logger.error(e)
+        active_ldap_users = 0
+
+    try:
+        inactive_db_users = ccnet_api.count_inactive_emailusers('DB')
+    except Exception as e:
+        logger.error(e)
+        inactive_db_users = 0
+
+    try:
+        inactive_ldap_users = ccnet_api.count_inactive_emailusers('LDAP')
+    except Exception as e:
+        logger.error(e)
+        inactive_ldap_users = 0
+
+    active_users = active_db_users + active_ldap_users if \
+        active_ldap_users > 0 else active_db_users
+
+    inactive_users = inactive_db_users + inactive_ldap_users if \
+        inactive_ldap_users > 0 else inactive_db_users
+
+    # get license info
+    is_pro = is_pro_version()
+    if is_pro:
+        license_dict = parse_license()
+    else:
+        license_dict = {}
+
+    if license_dict:
+        with_license = True
         try:
-            active_db_users = ccnet_api.count_emailusers('DB')
-        except Exception as e:
+            max_users = int(license_dict.get('MaxUsers', 3))
+        except ValueError as e:
             logger.error(e)
-            active_db_users = 0
-
-        try:
-            active_ldap_users = ccnet_api.count_emailusers('LDAP')
-        except Exception as e:
-            logger.error(e)
-            active_ldap_users = 0
-
-        try:
-            inactive_db_users = ccnet_api.count_inactive_emailusers('DB')
-        except Exception as e:
-            logger.error(e)
-            inactive_db_users = 0
-
-        try:
-            inactive_ldap_users = ccnet_api.count_inactive_emailusers('LDAP')
-        except Exception as e:
-            logger.error(e)
-            inactive_ldap_users = 0
-
-        active_users = active_db_users + active_ldap_users if \
-            active_ldap_users > 0 else active_db_users
-
-        inactive_users = inactive_db_users + inactive_ldap_users if \
-            inactive_ldap_users > 0 else inactive_db_users
-
-        # get license info
-        is_pro = is_pro_version()
-        if is_pro:
-            license_dict = parse_license()
-        else:
-            license_dict = {}
-
-        if license_dict:
-            with_license = True
-            try:
-                max_users = int(license_dict.get('MaxUsers', 3))
-            except ValueError as e:
-                logger.error(e)
-                max_users = 0
-        else:
-            with_license = False
             max_users = 0
+    else:
+        with_license = False
+        max_users = 0
+
+    # count total file number
+    try:
+        total_files_count = seafile_api.get_total_file_number()
+    except Exception as e:
+        logger.error(e)
+        total_files_count = 0
+
+    # count total storage
+    try:
+        total_storage = seafile_api.get_total_storage()
+    except Exception as e:
+        logger.error(e)
+        total_storage = 0
+
+    # count devices number
+    try:
+        total_devices_count = TokenV2.objects.get_total_devices_count()
+    except Exception as e:
+        logger.error(e)
+        total_devices_count = 0
+
+    # count current connected devices
+    try:
+        current_connected_devices_count = TokenV2.objects.\
+                get_current_connected_devices_count()
+    except Exception as e:
+        logger.error(e)
+        current_connected_devices_count = 0
+
+    info = {
+        'users_count': active_users + inactive_users,
+        'active_users_count': active_users,
+        'repos_count': repos_count,
+        'total_files_count': total_files_count,
+        'groups_count': groups_count,
+        'org_count': org_count,
+        'multi_tenancy_enabled': multi_tenancy_enabled,
+        'is_pro': is_pro,
+        'with_license': with_license,
+        'license_expiration': license_dict.get('Expiration', ''),
+        'license_mode': license_dict.get('Mode', ''),
+        'license_maxusers': max_users,
+        'license_to': license_dict.get('Name', ''),
+        'total_storage': total_storage,
+        'total_devices_count': total_devices_count,
+        'current_connected_devices_count': current_connected_devices_count
+    }
+
+    return info
 
-        # count total file number
-        try:
-            total_files_count = seafile_api.get_total_file_number()
-        except Exception as e:
-            logger.error(e)
-            total_files_count = 0
-
-        # count total storage
-        try:
-            total_storage = seafile_api.get_total_storage()
-        except Exception as e:
-            logger.error(e)
-            total_storage = 0
-
-        # count devices number
-        try:
-            total_devices_count = TokenV2.objects.get_total_devices_count()
-        except Exception as e:
-            logger.error(e)
-            total_devices_count = 0
+class SysInfo(APIView):
+    """Show system info.
+    """
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    throttle_classes = (UserRateThrottle,)
+    permission_classes = (IsAdminUser,)
 
-        # count current connected devices
-        try:
-            current_connected_devices_count = TokenV2.objects.\
-                    get_current_connected_devices_count()
-        except Exception as e:
-            logger.error(e)
-            current_connected_devices_count = 0
-
-        info = {
-            'users_count': active_users + inactive_users,
-            'active_users_count': active_users,
-            'repos_count': repos_count,
-            'total_files_count': total_files_count,
-            'groups_count': groups_count,
-            'org_count': org_count,
-            'multi_tenancy_enabled': multi_tenancy_enabled,
-            'is_pro': is_pro,
-            'with_license': with_license,
-            'license_expiration': license_dict.get('Expiration', ''),
-            'license_mode': license_dict.get('Mode', ''),
-            'license_maxusers': max_users,
-            'license_to': license_dict.get('Name', ''),
-            'total_storage': total_storage,
-            'total_devices_count': total_devices_count,
-            'current_connected_devices_count': current_connected_devices_count
-        }
-
-        return Response(info)
+    def get(self, request, format=None):
+        # counted in background at most every few minutes, see
+        # ``seahub.utils.system_metrics``
+        return Response(get_metrics(SYSINFO_METRICS, get_sys_info))
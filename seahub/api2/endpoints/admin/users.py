@@ -21,6 +21,7 @@ from seahub.base.accounts import User
 from seahub.base.templatetags.seahub_tags import email2nickname, \
         email2contact_email
 from seahub.profile.models import Profile, DetailedProfile
+from seahub.institutions.utils import update_user_quota
 from seahub.profile.settings import CONTACT_CACHE_TIMEOUT, CONTACT_CACHE_PREFIX
 from seahub.utils import is_valid_username, is_org_context, \
         is_pro_version, normalize_cache_key, is_valid_email
@@ -101,7 +102,7 @@ def update_user_info(request, user):
             org_id = request.user.org.org_id
             seafile_api.set_org_user_quota(org_id, email, quota_total)
         else:
-            seafile_api.set_user_quota(email, quota_total)
+            update_user_quota(email, quota_total)
 
 def get_user_info(email):
 
@@ -18,6 +18,7 @@ from seahub.api2.utils import api_error
 from seahub.base.accounts import User
 from seahub.profile.models import Profile
 from seahub.institutions.models import Institution
+from seahub.institutions.utils import update_user_quota
 from seahub.utils.file_size import get_file_size_unit
 from seahub.admin_log.models import USER_DELETE
 from seahub.admin_log.signals import admin_operation
@@ -85,7 +86,7 @@ class AdminUsersBatch(APIView):
             for user in existed_users:
                 email = user.email
                 try:
-                    seafile_api.set_user_quota(email, quota_total_byte)
+                    update_user_quota(email, quota_total_byte)
                 except Exception as e:
                     logger.error(e)
                     result['failed'].append({
@@ -7,15 +7,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
-import seaserv
 from seaserv import ccnet_api
 
 from seahub.api2.utils import api_error
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
-from seahub.avatar.templatetags.group_avatar_tags import api_grp_avatar_url, get_default_group_avatar_url
+from seahub.avatar.templatetags.group_avatar_tags import api_grp_avatar_urls
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
-from seahub.group.utils import is_group_member
+from seahub.group.utils import get_user_group_ids
 from seahub.avatar.settings import GROUP_AVATAR_DEFAULT_SIZE
 
 logger = logging.getLogger(__name__)
@@ -43,20 +42,14 @@ class Departments(APIView):
         except ValueError:
             avatar_size = GROUP_AVATAR_DEFAULT_SIZE
 
+        # departments user is in, or in a sub department of
+        group_ids = get_user_group_ids(request.user.username)
+        departments = [d for d in departments if d.id in group_ids]
+        avatar_urls = api_grp_avatar_urls([d.id for d in departments],
+                                          avatar_size)
+
         result = []
         for department in departments:
-            department = seaserv.get_group(department.id)
-
-            username = request.user.username
-            if not is_group_member(department.id, username):
-                continue
-
-            try:
-                avatar_url, is_default, date_uploaded = api_grp_avatar_url(department.id, avatar_size)
-            except Exception as e:
-                logger.error(e)
-                avatar_url = get_default_group_avatar_url()
-
             created_at = timestamp_to_isoformat_timestr(department.timestamp)
 
             department_info = {
@@ -66,7 +59,8 @@ class Departments(APIView):
                 "name": department.group_name,
                 "owner": department.creator_name,
                 "created_at": created_at,
-                "avatar_url": request.build_absolute_uri(avatar_url),
+                "avatar_url": request.build_absolute_uri(
+                    avatar_urls[department.id]),
             }
 
             result.append(department_info)
@@ -14,9 +14,13 @@ from django.utils.http import urlquote
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.utils import api_error, to_python_boolean
-from seahub.api2.views import get_dir_file_recursively
+from seahub.api2.views import iter_dir_file_recursively
 
 from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.thumbnail.jobs import prefetch_thumbnails
+from seahub.thumbnail.store import get_existing_thumbnails
+from seahub.utils.dir_listing_cache import get_dir_listing_version, \
+        get_dir_listing_etag, get_cached_dir_listing, set_cached_dir_listing
 from seahub.views import check_folder_permission
 from seahub.utils import check_filename_with_rename, is_valid_dirent_name, \
         normalize_dir_path, is_pro_version, FILEEXT_TYPE_MAP
@@ -24,11 +28,9 @@ from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from seahub.utils.file_tags import get_files_tags_in_dir
 from seahub.utils.file_types import IMAGE, VIDEO, XMIND
 from seahub.base.models import UserStarredFiles
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
+from seahub.utils.user_info import emails2nicknames, emails2contact_emails
 
-from seahub.settings import ENABLE_VIDEO_THUMBNAIL, \
-        THUMBNAIL_ROOT
+from seahub.settings import ENABLE_VIDEO_THUMBNAIL
 
 from seaserv import seafile_api
 from pysearpc import SearpcError
@@ -37,14 +39,113 @@ logger = logging.getLogger(__name__)
 
 
 def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
-        with_thumbnail, thumbnail_size):
+        with_thumbnail, thumbnail_size, parent_dir_id=None, permission=None):
+
+    repo_id = repo_obj.id
+    if parent_dir_id is None:
+        parent_dir_id = seafile_api.get_dir_id_by_path(repo_id, parent_dir)
+
+    # listing is cached by dir id, lock and thumbnail info are added
+    # afterwards since locks expire and thumbnails are created in background
+    version = get_dir_listing_version(username, repo_id, parent_dir_id,
+            permission, parent_dir, request_type)
+    listing = get_cached_dir_listing(version)
+    if listing is None:
+        listing = _get_dir_file_info_list(username, request_type, repo_obj,
+                parent_dir, parent_dir_id)
+        set_cached_dir_listing(version, listing)
+
+    dir_info_list, file_info_list = listing
+    if is_pro_version() and file_info_list:
+        add_lock_info(username, repo_id, parent_dir, parent_dir_id,
+                      file_info_list)
+
+    if with_thumbnail and not repo_obj.encrypted:
+        add_thumbnail_info(repo_id, parent_dir, file_info_list, thumbnail_size)
+
+    return dir_info_list, file_info_list
+
+
+def add_lock_info(username, repo_id, parent_dir, parent_dir_id,
+        file_info_list):
+    """Set lock info of files in ``file_info_list``, which are in
+    ``parent_dir``.
+    """
+    dirents = seafile_api.list_dir_with_perm(repo_id, parent_dir,
+            parent_dir_id, username, -1, -1)
+    locked_dirents = dict((d.obj_name, d) for d in dirents if d.is_locked)
+
+    lock_owners = set([d.lock_owner for d in locked_dirents.values()])
+    nickname_dict = emails2nicknames(lock_owners)
+    contact_email_dict = emails2contact_emails(lock_owners)
+
+    for file_info in file_info_list:
+        dirent = locked_dirents.get(file_info['name'])
+        lock_owner_email = (dirent.lock_owner or '') if dirent else ''
+
+        file_info["is_locked"] = dirent is not None
+        file_info["lock_time"] = dirent.lock_time if dirent else 0
+        file_info["lock_owner"] = lock_owner_email
+        file_info['lock_owner_name'] = nickname_dict.get(lock_owner_email, '')
+        file_info['lock_owner_contact_email'] = contact_email_dict.get(lock_owner_email, '')
+        file_info["locked_by_me"] = username == lock_owner_email
+
+
+def add_thumbnail_info(repo_id, parent_dir, file_info_list, thumbnail_size):
+    """Set 'encoded_thumbnail_src' of files whose thumbnail exists, and
+    queue creating the missing image thumbnails.
+    """
+    files = []
+    for file_info in file_info_list:
+
+        # used for providing a way to determine
+        # if send a request to create thumbnail.
+
+        fileExt = os.path.splitext(file_info['name'])[1][1:].lower()
+        file_type = FILEEXT_TYPE_MAP.get(fileExt)
+
+        if file_type in (IMAGE, XMIND) or \
+                file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL:
+            files.append((file_info, file_type))
+
+    if not files:
+        return
+
+    # check thumbnails of all files at once
+    existing_thumbnails = get_existing_thumbnails(
+        repo_id, parent_dir, [f['id'] for f, _ in files], thumbnail_size)
+
+    # images without thumbnail, which are rendered in background before
+    # browser asks for them.
+    thumbnails_to_prefetch = []
+    for file_info, file_type in files:
+        file_path = posixpath.join(file_info['parent_dir'], file_info['name'])
+
+        # if thumbnail has already been created, return its src.
+        # Then web browser will use this src to get thumbnail instead of
+        # recreating it.
+        if file_info['id'] in existing_thumbnails:
+            src = get_thumbnail_src(repo_id, thumbnail_size, file_path)
+            file_info['encoded_thumbnail_src'] = urlquote(src)
+        elif file_type == IMAGE:
+            thumbnails_to_prefetch.append((file_info['id'], file_path,
+                                           file_info['size']))
+
+    if thumbnails_to_prefetch:
+        try:
+            prefetch_thumbnails(repo_id, thumbnails_to_prefetch, thumbnail_size)
+        except Exception as e:
+            logger.error(e)
+
+
+def _get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
+        parent_dir_id):
 
     repo_id = repo_obj.id
     dir_info_list = []
     file_info_list = []
 
     # get dirent(folder and file) list
-    parent_dir_id = seafile_api.get_dir_id_by_path(repo_id, parent_dir)
     dir_file_list = seafile_api.list_dir_with_perm(repo_id,
             parent_dir, parent_dir_id, username, -1, -1)
 
@@ -81,15 +182,9 @@ def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
         file_list = [dirent for dirent in dir_file_list if not stat.S_ISDIR(dirent.mode)]
 
         # Use dict to reduce memcache fetch cost in large for-loop.
-        nickname_dict = {}
-        contact_email_dict = {}
         modifier_set = set([x.modifier for x in file_list])
-        lock_owner_set = set([x.lock_owner for x in file_list])
-        for e in modifier_set | lock_owner_set:
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
+        nickname_dict = emails2nicknames(modifier_set)
+        contact_email_dict = emails2contact_emails(modifier_set)
 
         try:
             files_tags_in_dir = get_files_tags_in_dir(repo_id, parent_dir)
@@ -117,21 +212,6 @@ def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
             file_info['modifier_name'] = nickname_dict.get(modifier_email, '')
             file_info['modifier_contact_email'] = contact_email_dict.get(modifier_email, '')
 
-            # get lock info
-            if is_pro_version():
-                file_info["is_locked"] = dirent.is_locked
-                file_info["lock_time"] = dirent.lock_time
-
-                lock_owner_email = dirent.lock_owner or ''
-                file_info["lock_owner"] = lock_owner_email
-                file_info['lock_owner_name'] = nickname_dict.get(lock_owner_email, '')
-                file_info['lock_owner_contact_email'] = contact_email_dict.get(lock_owner_email, '')
-
-                if username == lock_owner_email:
-                    file_info["locked_by_me"] = True
-                else:
-                    file_info["locked_by_me"] = False
-
             # get star info
             file_info['starred'] = False
             if file_path.rstrip('/') in starred_item_path_list:
@@ -144,27 +224,6 @@ def get_dir_file_info_list(username, request_type, repo_obj, parent_dir,
                 for file_tag in file_tags:
                     file_info['file_tags'].append(file_tag)
 
-            # get thumbnail info
-            if with_thumbnail and not repo_obj.encrypted:
-
-                # used for providing a way to determine
-                # if send a request to create thumbnail.
-
-                fileExt = os.path.splitext(file_name)[1][1:].lower()
-                file_type = FILEEXT_TYPE_MAP.get(fileExt)
-
-                if file_type in (IMAGE, XMIND) or \
-                        file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL:
-
-                    # if thumbnail has already been created, return its src.
-                    # Then web browser will use this src to get thumbnail instead of
-                    # recreating it.
-                    thumbnail_file_path = os.path.join(THUMBNAIL_ROOT,
-                            str(thumbnail_size), file_obj_id)
-                    if os.path.exists(thumbnail_file_path):
-                        src = get_thumbnail_src(repo_id, thumbnail_size, file_path)
-                        file_info['encoded_thumbnail_src'] = urlquote(src)
-
             file_info_list.append(file_info)
 
     dir_info_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
@@ -258,27 +317,17 @@ class DirView(APIView):
         username = request.user.username
         if recursive == '1':
 
+            dirent_type = {'f': 'file', 'd': 'dir'}.get(request_type)
             try:
-                dir_file_info_list = get_dir_file_recursively(username, repo_id,
-                        parent_dir, [])
+                dirent_list = list(iter_dir_file_recursively(username,
+                        repo_id, parent_dir, dirent_type))
             except Exception as e:
                 logger.error(e)
                 error_msg = 'Internal Server Error'
                 return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
             response_dict = {}
-            response_dict['dirent_list'] = []
-
-            if request_type == 'f':
-                for item in dir_file_info_list:
-                    if item['type'] == 'file':
-                        response_dict['dirent_list'].append(item)
-            elif request_type == 'd':
-                for item in dir_file_info_list:
-                    if item['type'] == 'dir':
-                        response_dict['dirent_list'].append(item)
-            else:
-                response_dict['dirent_list'] = dir_file_info_list
+            response_dict['dirent_list'] = dirent_list
 
             return Response(response_dict)
 
@@ -299,14 +348,41 @@ class DirView(APIView):
                     tmp_parent_dir = normalize_dir_path(tmp_parent_dir)
                     parent_dir_list.append(tmp_parent_dir)
 
+        # dir ids of all parent folders, the listing is cached by them
+        parent_dir_ids = []
+        for tmp_parent_dir in parent_dir_list:
+            if tmp_parent_dir == parent_dir:
+                parent_dir_ids.append(dir_id)
+            else:
+                parent_dir_ids.append(
+                    seafile_api.get_dir_id_by_path(repo_id, tmp_parent_dir))
+
+        versions = [get_dir_listing_version(username, repo_id, tmp_dir_id,
+                                            permission, tmp_parent_dir,
+                                            request_type)
+                    for tmp_parent_dir, tmp_dir_id in
+                    zip(parent_dir_list, parent_dir_ids)]
+
+        # thumbnails may be created and files locked at any time, so with
+        # them the response can only be compared after it is built.
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        with_lock = is_pro_version() and request_type != 'd'
+        if not with_thumbnail and not with_lock:
+            etag = get_dir_listing_etag(versions)
+            if etag in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED,
+                                headers={'ETag': etag})
+
         all_dir_info_list = []
         all_file_info_list = []
 
         try:
-            for parent_dir in parent_dir_list:
+            for tmp_parent_dir, tmp_dir_id in zip(parent_dir_list,
+                                                  parent_dir_ids):
                 # get dir file info list
                 dir_info_list, file_info_list = get_dir_file_info_list(username,
-                        request_type, repo, parent_dir, with_thumbnail, thumbnail_size)
+                        request_type, repo, tmp_parent_dir, with_thumbnail,
+                        thumbnail_size, tmp_dir_id, permission)
                 all_dir_info_list.extend(dir_info_list)
                 all_file_info_list.extend(file_info_list)
         except Exception as e:
@@ -314,6 +390,21 @@ class DirView(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
+        if with_thumbnail or with_lock:
+            parts = list(versions)
+            if with_thumbnail:
+                parts.append(thumbnail_size)
+                parts.extend(sorted([f['id'] for f in all_file_info_list
+                                     if 'encoded_thumbnail_src' in f]))
+            if with_lock:
+                parts.extend(sorted(['%s/%s %s %s' % (f['parent_dir'],
+                    f['name'], f['lock_owner'], f['lock_time'])
+                    for f in all_file_info_list if f['is_locked']]))
+            etag = get_dir_listing_etag(parts)
+            if etag in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED,
+                                headers={'ETag': etag})
+
         response_dict = {}
         response_dict["user_perm"] = permission
         response_dict["dir_id"] = dir_id
@@ -325,7 +416,7 @@ class DirView(APIView):
         else:
             response_dict['dirent_list'] = all_dir_info_list + all_file_info_list
 
-        return Response(response_dict)
+        return Response(response_dict, headers={'ETag': etag})
 
     def post(self, request, repo_id, format=None):
         """ Create, rename, revert dir.
@@ -22,7 +22,8 @@ from seahub.utils import string2list, is_org_context
 from seahub.base.accounts import User
 from seahub.group.signals import add_user_to_group
 from seahub.group.utils import is_group_member, is_group_admin, \
-    is_group_owner, is_group_admin_or_owner, get_group_member_info
+    is_group_owner, is_group_admin_or_owner, get_group_member_info, \
+    get_group_members_info, clear_user_group_ids_cache
 
 from .utils import api_check_group
 
@@ -58,15 +59,13 @@ class GroupMembers(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
-        group_members = []
         is_admin = request.GET.get('is_admin', 'false')
-        for m in members:
+        if is_admin == 'true':
             # only return group admins
-            if is_admin == 'true' and not m.is_staff:
-                continue
+            members = [m for m in members if m.is_staff]
 
-            member_info = get_group_member_info(request, group_id, m.user_name, avatar_size)
-            group_members.append(member_info)
+        group_members = get_group_members_info(request, group_id, members,
+                                               avatar_size)
 
         return Response(group_members)
 
@@ -101,6 +100,7 @@ class GroupMembers(APIView):
                     return api_error(status.HTTP_404_NOT_FOUND, error_msg)
 
             ccnet_api.group_add_member(group_id, username, email)
+            clear_user_group_ids_cache(email)
             add_user_to_group.send(sender=None,
                                    group_staff=username,
                                    group_id=group_id,
@@ -205,6 +205,7 @@ class GroupMember(APIView):
         if username == email:
             try:
                 ccnet_api.quit_group(group_id, username)
+                clear_user_group_ids_cache(username)
                 # remove repo-group share info of all 'email' owned repos
                 seafile_api.remove_group_repos_by_owner(group_id, email)
                 return Response({'success': True})
@@ -218,6 +219,7 @@ class GroupMember(APIView):
             if is_group_owner(group_id, username):
                 # group owner can delete all group member
                 ccnet_api.group_remove_member(group_id, username, email)
+                clear_user_group_ids_cache(email)
                 seafile_api.remove_group_repos_by_owner(group_id, email)
                 return Response({'success': True})
 
@@ -225,6 +227,7 @@ class GroupMember(APIView):
                 # group admin can NOT delete group owner/admin
                 if not is_group_admin_or_owner(group_id, email):
                     ccnet_api.group_remove_member(group_id, username, email)
+                    clear_user_group_ids_cache(email)
                     seafile_api.remove_group_repos_by_owner(group_id, email)
                     return Response({'success': True})
                 else:
@@ -311,6 +314,7 @@ class GroupMembersBulk(APIView):
             try:
                 seaserv.ccnet_threaded_rpc.group_add_member(group_id,
                     username, email)
+                clear_user_group_ids_cache(email)
                 member_info = get_group_member_info(request, group_id, email)
                 result['success'].append(member_info)
             except SearpcError as e:
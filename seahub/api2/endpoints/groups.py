@@ -26,7 +26,7 @@ from seahub.utils.repo import get_repo_owner
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from seahub.group.utils import validate_group_name, check_group_name_conflict, \
     is_group_member, is_group_admin, is_group_owner, is_group_admin_or_owner, \
-    group_id_to_name
+    group_id_to_name, clear_user_group_ids_cache
 from seahub.group.views import remove_group_common
 from seahub.base.models import UserStarredFiles
 from seahub.base.templatetags.seahub_tags import email2nickname, \
@@ -314,6 +314,7 @@ class Group(APIView):
                 # transfer a group
                 if not is_group_member(group_id, new_owner):
                     ccnet_api.group_add_member(group_id, username, new_owner)
+                    clear_user_group_ids_cache(new_owner)
 
                 if not is_group_admin(group_id, new_owner):
                     ccnet_api.group_set_admin(group_id, new_owner)
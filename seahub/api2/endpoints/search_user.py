@@ -4,8 +4,8 @@ import sys
 import json
 import logging
 
-from django.db.models import Q
 from django.conf import settings as django_settings
+from django.core.cache import cache
 
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import IsAuthenticated
@@ -18,13 +18,12 @@ from seaserv import ccnet_api
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error
-from seahub.utils import is_valid_email, is_org_context
+from seahub.utils import is_valid_email, is_org_context, normalize_cache_key
 from seahub.base.accounts import User
-from seahub.base.templatetags.seahub_tags import email2nickname, \
-        email2contact_email
 from seahub.profile.models import Profile
 from seahub.contacts.models import Contact
-from seahub.avatar.templatetags.avatar_tags import api_avatar_url
+from seahub.utils.user_info import get_users_info
+from seahub.utils.user_search_index import search_users
 
 from seahub.settings import ENABLE_GLOBAL_ADDRESSBOOK, \
     ENABLE_SEARCH_FROM_LDAP_DIRECTLY
@@ -46,6 +45,21 @@ try:
 except ImportError as e:
     CUSTOM_SEARCH_USER = False
 
+# Emails of org users are kept for a while, as the share dialog searches on
+# every keystroke.
+ORG_USER_EMAILS_CACHE_TIMEOUT = getattr(django_settings,
+        'ORG_USER_EMAILS_CACHE_TIMEOUT', 60)
+ORG_USER_EMAILS_CACHE_PREFIX = 'ORG_USER_EMAILS_'
+
+def get_org_user_emails(url_prefix):
+    key = normalize_cache_key(url_prefix, ORG_USER_EMAILS_CACHE_PREFIX)
+    emails = cache.get(key)
+    if emails is None:
+        org_users = ccnet_api.get_org_users_by_url_prefix(url_prefix, -1, -1)
+        emails = [org_user.email for org_user in org_users]
+        cache.set(key, emails, ORG_USER_EMAILS_CACHE_TIMEOUT)
+
+    return emails
 
 class SearchUser(APIView):
     """ Search user from contacts/all users
@@ -76,20 +90,16 @@ class SearchUser(APIView):
                     # get all org users
                     url_prefix = request.user.org.url_prefix
                     try:
-                        all_org_users = ccnet_api.get_org_users_by_url_prefix(url_prefix, -1, -1)
+                        limited_emails = get_org_user_emails(url_prefix)
                     except Exception as e:
                         logger.error(e)
                         error_msg = 'Internal Server Error'
                         return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
-                    limited_emails = []
-                    for org_user in all_org_users:
-                        # prepare limited emails for search from profile
-                        limited_emails.append(org_user.email)
-
-                        # search user from org users
-                        if q in org_user.email:
-                            email_list.append(org_user.email)
+                    # search user from org users
+                    for email in limited_emails:
+                        if q in email:
+                            email_list.append(email)
 
                     # search from profile, limit search range in all org users
                     email_list += search_user_from_profile_with_limits(q, limited_emails)
@@ -134,7 +144,8 @@ class SearchUser(APIView):
 
         if django_settings.ENABLE_ADDRESSBOOK_OPT_IN:
             # get users who has setted to show in address book
-            listed_users = Profile.objects.filter(list_in_address_book=True).values('user')
+            listed_users = Profile.objects.filter(user__in=email_result,
+                    list_in_address_book=True).values('user')
             listed_user_list = [ u['user'] for u in listed_users ]
 
             email_result = list(set(email_result) & set(listed_user_list))
@@ -166,13 +177,14 @@ class SearchUser(APIView):
 def format_searched_user_result(request, users, size):
     results = []
 
+    users_info = get_users_info(users, size)
     for email in users:
-        url, is_default, date_uploaded = api_avatar_url(email, size)
+        user_info = users_info[email]
         results.append({
             "email": email,
-            "avatar_url": request.build_absolute_uri(url),
-            "name": email2nickname(email),
-            "contact_email": email2contact_email(email),
+            "avatar_url": request.build_absolute_uri(user_info['avatar_url']),
+            "name": user_info['name'],
+            "contact_email": user_info['contact_email'],
         })
 
     return results
@@ -206,29 +218,14 @@ def search_user_from_ccnet(q):
 def search_user_from_profile(q):
     """ Return 10 items at most.
     """
-    # 'nickname__icontains' for search by nickname
-    # 'contact_email__icontains' for search by contact email
-    users = Profile.objects.filter(Q(nickname__icontains=q) | \
-            Q(contact_email__icontains=q)).values('user')[:10]
-
-    email_list = []
-    for user in users:
-        email_list.append(user['user'])
-
-    return email_list
+    # search by nickname, contact email and pinyin of nickname
+    return search_users(q, 10)
 
 def search_user_from_profile_with_limits(q, limited_emails):
     """ Return 10 items at most.
     """
     # search within limited_emails
-    users = Profile.objects.filter(Q(user__in=limited_emails) &
-            (Q(nickname__icontains=q) | Q(contact_email__icontains=q))).values('user')[:10]
-
-    email_list = []
-    for user in users:
-        email_list.append(user['user'])
-
-    return email_list
+    return search_users(q, 10, set(limited_emails))
 
 def search_user_when_global_address_book_disabled(request, q):
     """ Return 10 items at most.
@@ -34,11 +34,11 @@ from seahub.utils.timeutils import datetime_to_isoformat_timestr, \
         timestamp_to_isoformat_timestr
 from seahub.utils.repo import parse_repo_perm
 from seahub.thumbnail.utils import get_share_link_thumbnail_src
+from seahub.thumbnail.store import thumbnail_exists
 from seahub.settings import SHARE_LINK_EXPIRE_DAYS_MAX, \
         SHARE_LINK_EXPIRE_DAYS_MIN, SHARE_LINK_LOGIN_REQUIRED, \
         SHARE_LINK_EXPIRE_DAYS_DEFAULT, \
-        ENABLE_SHARE_LINK_AUDIT, ENABLE_VIDEO_THUMBNAIL, \
-        THUMBNAIL_ROOT
+        ENABLE_SHARE_LINK_AUDIT, ENABLE_VIDEO_THUMBNAIL
 from seahub.wiki.models import Wiki
 
 logger = logging.getLogger(__name__)
@@ -565,7 +565,7 @@ class ShareLinkDirents(APIView):
                 if file_type in (IMAGE, XMIND) or \
                         file_type == VIDEO and ENABLE_VIDEO_THUMBNAIL:
 
-                    if os.path.exists(os.path.join(THUMBNAIL_ROOT, str(thumbnail_size), dirent.obj_id)):
+                    if thumbnail_exists(dirent.obj_id, thumbnail_size):
                         req_image_path = posixpath.join(request_path, dirent.obj_name)
                         src = get_share_link_thumbnail_src(token, thumbnail_size, req_image_path)
                         dirent_info['encoded_thumbnail_src'] = urlquote(src)
@@ -22,9 +22,12 @@ from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.utils import api_error, to_python_boolean
 from seahub.wiki.models import Wiki, WikiPageMissing
-from seahub.wiki.utils import (clean_page_name, get_wiki_pages, get_inner_file_url,
-                               get_wiki_dirent, get_wiki_page_object, get_wiki_dirs_by_path)
+from seahub.wiki.utils import (clean_page_name, get_wiki_pages,
+                               get_wiki_dirent, get_wiki_page_object, get_wiki_dirs_by_path,
+                               get_wiki_page_content)
 from seahub.utils import gen_inner_file_get_url, normalize_dir_path
+from seahub.utils.file_content_cache import get_content_cache_id, \
+    read_file_content
 from seahub.base.templatetags.seahub_tags import email2contact_email, email2nickname
 
 logger = logging.getLogger(__name__)
@@ -160,9 +163,7 @@ class WikiPageView(APIView):
             error_msg = _("Page %s not found.") % page_name
             return api_error(status.HTTP_404_NOT_FOUND, error_msg)
 
-        url = get_inner_file_url(repo, wiki_dirent.obj_id, wiki_dirent.obj_name)
-        file_response = urllib2.urlopen(url)
-        content = file_response.read()
+        content = get_wiki_page_content(repo, wiki_dirent)
 
         wiki_page_object = get_wiki_page_object(wiki, page_name)
 
@@ -323,17 +324,20 @@ class WikiPageContentView(APIView):
         # send stats message
         send_file_access_msg(request, repo, path, 'api')
 
-        file_name = os.path.basename(path)
-        token = seafile_api.get_fileserver_access_token(repo.repo_id,
-                file_id, 'download', request.user.username, 'False')
+        def get_file_url():
+            token = seafile_api.get_fileserver_access_token(repo.repo_id,
+                    file_id, 'download', request.user.username, 'False')
+            if not token:
+                raise urllib2.URLError('Failed to get fileserver access token')
+            return gen_inner_file_get_url(token, os.path.basename(path))
 
-        if not token:
+        try:
+            content = read_file_content(get_content_cache_id(repo, file_id),
+                                        get_file_url)
+        except urllib2.URLError as e:
+            logger.error(e)
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
-
-        url = gen_inner_file_get_url(token, file_name)
-        file_response = urllib2.urlopen(url)
-        content = file_response.read()
         
         try:
             dirent = seafile_api.get_dirent_by_path(repo.repo_id, path)
@@ -192,3 +192,20 @@ class TokenV2(models.Model):
                     last_accessed=self.last_accessed,
                     last_login_ip=self.last_login_ip,
                     wiped_at=self.wiped_at)
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from seahub.auth.identity_cache import invalidate_token
+
+@receiver(post_save, sender=Token, dispatch_uid="token_saved")
+@receiver(post_delete, sender=Token, dispatch_uid="token_deleted")
+def invalidate_token_cache(sender, instance, **kwargs):
+    invalidate_token(Token, instance.key)
+
+@receiver(post_save, sender=TokenV2, dispatch_uid="token_v2_saved")
+@receiver(post_delete, sender=TokenV2, dispatch_uid="token_v2_deleted")
+def invalidate_token_v2_cache(sender, instance, **kwargs):
+    invalidate_token(TokenV2, instance.key)
@@ -7,10 +7,14 @@ from django.conf import settings
 from django.core.cache import cache as default_cache
 from django.core.exceptions import ImproperlyConfigured
 from rest_framework.settings import api_settings
+from collections import OrderedDict
+import threading
 import time
 
+from seahub.base.cache_backends import incr_counter
 from seahub.utils.ip import get_remote_ip
 
+REJECT_COUNTER_PREFIX = 'throttle_rejects_'
 
 class BaseThrottle(object):
     """
@@ -49,6 +53,62 @@ class BaseThrottle(object):
         return None
 
 
+class LocalTokenBuckets(object):
+    """
+    In-process token buckets, one per throttle key, refilled at the
+    throttle rate. A request finding its bucket empty would be rejected by
+    the shared counters as well, since this process alone has used up the
+    rate, so it is rejected without a cache round-trip.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (tokens, last refill time)
+        self._buckets = OrderedDict()
+
+    def _refill(self, key, now, num_requests, duration):
+        tokens, last = self._buckets.pop(key, (num_requests, now))
+        tokens = min(num_requests,
+                     tokens + (now - last) * num_requests / float(duration))
+        return tokens
+
+    def has_token(self, key, now, num_requests, duration):
+        with self._lock:
+            tokens = self._refill(key, now, num_requests, duration)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return tokens >= 1
+
+    def consume(self, key, now, num_requests, duration):
+        with self._lock:
+            tokens = self._refill(key, now, num_requests, duration)
+            self._buckets[key] = (max(tokens - 1, 0), now)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+local_buckets = LocalTokenBuckets(
+    getattr(settings, 'THROTTLE_LOCAL_BUCKETS_MAX_ENTRIES', 10000))
+
+
+def record_reject(scope):
+    incr_counter(default_cache, REJECT_COUNTER_PREFIX + (scope or 'unknown'))
+
+
+def get_reject_counts(scopes=None):
+    """
+    Return number of rejected requests by scope, of all processes.
+    """
+    if scopes is None:
+        scopes = list(api_settings.DEFAULT_THROTTLE_RATES.keys())
+    keys = [REJECT_COUNTER_PREFIX + s for s in scopes]
+    counts = default_cache.get_many(keys)
+    return dict((s, counts.get(REJECT_COUNTER_PREFIX + s, 0)) for s in scopes)
+
+
 class SimpleRateThrottle(BaseThrottle):
     """
     A simple cache implementation, that only requires `.get_cache_key()`
@@ -59,7 +119,10 @@ class SimpleRateThrottle(BaseThrottle):
 
     Period should be one of: ('s', 'sec', 'm', 'min', 'h', 'hour', 'd', 'day')
 
-    Previous request information used for throttling is stored in the cache.
+    Requests are counted per fixed window of one period with `incr_counter`.
+    The number of requests in the last period is estimated from the counters
+    of the current and the previous window (sliding window approximation),
+    weighting the previous one by how much of it is still in the period.
     """
 
     cache = default_cache
@@ -126,46 +189,76 @@ class SimpleRateThrottle(BaseThrottle):
         if self.key is None:
             return True
 
-        self.history = self.cache.get(self.key, [])
         self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_elapsed = self.now - window * self.duration
+        self.previous_count = 0
+        self.count = 0
+
+        if not local_buckets.has_token(self.key, self.now,
+                                       self.num_requests, self.duration):
+            self.count = self.num_requests
+            return self.throttle_failure()
+
+        current_key = '%s_%d' % (self.key, window)
+        previous_key = '%s_%d' % (self.key, window - 1)
 
-        # Drop any requests from the history which have now passed the
-        # throttle duration
-        while self.history and self.history[-1] <= self.now - self.duration:
-            self.history.pop()
-        if len(self.history) >= self.num_requests:
+        self.count = self.incr(current_key)
+        self.previous_count = self.cache.get(previous_key, 0)
+        if self.get_estimated_count() > self.num_requests:
+            # only allowed requests are counted
+            self.incr(current_key, -1)
+            self.count -= 1
             return self.throttle_failure()
         return self.throttle_success()
 
+    def incr(self, key, delta=1):
+        """
+        Add `delta` to counter of `key` and return the new value.
+
+        The counter is kept until the next window has ended. On caches
+        without atomic increment (e.g. the file based cache), it is updated
+        under a lock instead of with `cache.incr`, which would lose
+        concurrent requests and reset the timeout to the default.
+        """
+        return incr_counter(self.cache, key, delta, self.duration * 2)
+
+    def get_estimated_count(self):
+        """
+        Number of requests in the last period, including the current one.
+        """
+        weight = 1 - self.window_elapsed / float(self.duration)
+        return self.previous_count * weight + self.count
+
     def throttle_success(self):
         """
-        Inserts the current request's timestamp along with the key
-        into the cache.
+        Called when a request to the API is allowed.
         """
-        self.history.insert(0, self.now)
-        self.cache.set(self.key, self.history, self.duration)
+        local_buckets.consume(self.key, self.now, self.num_requests,
+                              self.duration)
         return True
 
     def throttle_failure(self):
         """
         Called when a request to the API has failed due to throttling.
         """
+        record_reject(self.scope)
         return False
 
     def wait(self):
         """
         Returns the recommended next request time in seconds.
         """
-        if self.history:
-            remaining_duration = self.duration - (self.now - self.history[-1])
-        else:
-            remaining_duration = self.duration
-
-        available_requests = self.num_requests - len(self.history) + 1
-        if available_requests <= 0:
-            return None
-
-        return remaining_duration / float(available_requests)
+        if not self.previous_count:
+            # wait for the next window
+            return self.duration - self.window_elapsed
+
+        # time until the weighted previous window allows one more request
+        window_remaining = self.duration - self.window_elapsed
+        excess = self.previous_count * window_remaining / float(self.duration) + \
+            self.count + 1 - self.num_requests
+        return min(window_remaining,
+                   max(excess, 0) * self.duration / float(self.previous_count))
 
 
 class AnonRateThrottle(SimpleRateThrottle):
@@ -24,7 +24,7 @@ from django.contrib.auth.hashers import check_password
 from django.contrib.sites.shortcuts import get_current_site
 from django.db import IntegrityError
 from django.db.models import F
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.defaultfilters import filesizeformat
 from django.utils import timezone
 from django.utils.translation import ugettext as _
@@ -53,8 +53,11 @@ from seahub.constants import PERMISSION_READ_WRITE, PERMISSION_PREVIEW_EDIT
 from seahub.group.views import remove_group_common, \
     rename_group_with_new_name, is_group_staff
 from seahub.group.utils import BadGroupNameError, ConflictGroupNameError, \
-    validate_group_name, is_group_member, group_id_to_name
+    validate_group_name, is_group_member, group_id_to_name, \
+    clear_user_group_ids_cache
 from seahub.thumbnail.utils import generate_thumbnail
+from seahub.thumbnail.store import thumbnail_exists, read_thumbnail, \
+    record_stat
 from seahub.notifications.models import UserNotification
 from seahub.options.models import UserOptions
 from seahub.profile.models import Profile, DetailedProfile
@@ -73,6 +76,9 @@ from seahub.utils import gen_file_get_url, gen_token, gen_file_upload_url, \
     normalize_file_path, get_no_duplicate_obj_name, normalize_dir_path
 
 from seahub.utils.file_revisions import get_file_revisions_after_renamed
+from seahub.utils.user_info import emails2nicknames, emails2contact_emails
+from seahub.utils.repo_list_cache import get_repo_list_token, \
+    get_repo_list_snapshot, set_repo_list_snapshot, diff_repo_list_snapshots
 from seahub.utils.devices import do_unlink_device
 from seahub.utils.repo import get_repo_owner, get_library_storages, \
         get_locked_files_by_dir, get_related_users_by_repo, \
@@ -96,7 +102,7 @@ from seahub.utils import HAS_OFFICE_CONVERTER
 if HAS_OFFICE_CONVERTER:
     from seahub.utils import query_office_convert_status, prepare_converted_html
 import seahub.settings as settings
-from seahub.settings import THUMBNAIL_EXTENSION, THUMBNAIL_ROOT, \
+from seahub.settings import THUMBNAIL_EXTENSION, \
     FILE_LOCK_EXPIRATION_DAYS, ENABLE_STORAGE_CLASSES, \
     ENABLE_THUMBNAIL, STORAGE_CLASS_MAPPING_POLICY, \
     ENABLE_RESET_ENCRYPTED_REPO_PASSWORD, SHARE_LINK_EXPIRE_DAYS_MAX, \
@@ -130,7 +136,7 @@ from pysearpc import SearpcError, SearpcObjEncoder
 import seaserv
 from seaserv import seafserv_threaded_rpc, \
     get_personal_groups_by_user, get_session_info, is_personal_repo, \
-    get_repo, check_permission, get_commits, is_passwd_set,\
+    get_repo, check_permission, get_commits, \
     check_quota, list_share_repos, get_group_repos_by_owner, get_group_repoids, \
     remove_share, get_group, \
     get_commit, get_file_id_by_path, MAX_DOWNLOAD_DIR_SIZE, edit_repo, \
@@ -657,34 +663,13 @@ class Repos(APIView):
     permission_classes = (IsAuthenticated,)
     throttle_classes = (UserRateThrottle, )
 
-    def get(self, request, format=None):
-        # parse request params
-        filter_by = {
-            'mine': False,
-            'shared': False,
-            'group': False,
-            'org': False,
-        }
-
-        q = request.GET.get('nameContains', '')
-        rtype = request.GET.get('type', "")
-        if not rtype:
-            # set all to True, no filter applied
-            filter_by = filter_by.fromkeys(filter_by.iterkeys(), True)
-
-        for f in rtype.split(','):
-            f = f.strip()
-            filter_by[f] = True
-
+    def _get_repo_entries(self, request, filter_by, q):
+        """Return list of (key, category, repo) of libraries to list, in the
+        order they are returned, without resolving any user info.
+        """
         email = request.user.username
-        owner_name = email2nickname(email)
-        owner_contact_email = email2contact_email(email)
-
-        # Use dict to reduce memcache fetch cost in large for-loop.
-        contact_email_dict = {}
-        nickname_dict = {}
+        entries = []
 
-        repos_json = []
         if filter_by['mine']:
             if is_org_context(request):
                 org_id = request.user.org.org_id
@@ -694,14 +679,6 @@ class Repos(APIView):
                 owned_repos = seafile_api.get_owned_repo_list(email,
                         ret_corrupted=True)
 
-            # Reduce memcache fetch ops.
-            modifiers_set = set([x.last_modifier for x in owned_repos])
-            for e in modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
-
             owned_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
             for r in owned_repos:
                 # do not return virtual repos
@@ -711,6 +688,76 @@ class Repos(APIView):
                 if q and q.lower() not in r.name.lower():
                     continue
 
+                entries.append(('mine:%s' % r.id, 'mine', r))
+
+        if filter_by['shared']:
+
+            if is_org_context(request):
+                org_id = request.user.org.org_id
+                shared_repos = seafile_api.get_org_share_in_repo_list(org_id,
+                        email, -1, -1)
+            else:
+                shared_repos = seafile_api.get_share_in_repo_list(
+                        email, -1, -1)
+
+            shared_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
+            for r in shared_repos:
+                if q and q.lower() not in r.name.lower():
+                    continue
+
+                if parse_repo_perm(r.permission).can_download is False:
+                    if not is_web_request(request):
+                        continue
+
+                entries.append(('shared:%s' % r.repo_id, 'shared', r))
+
+        if filter_by['group']:
+            if is_org_context(request):
+                org_id = request.user.org.org_id
+                group_repos = seafile_api.get_org_group_repos_by_user(email,
+                        org_id)
+            else:
+                group_repos = seafile_api.get_group_repos_by_user(email)
+
+            group_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
+            for r in group_repos:
+                if q and q.lower() not in r.name.lower():
+                    continue
+
+                if parse_repo_perm(r.permission).can_download is False:
+                    if not is_web_request(request):
+                        continue
+
+                entries.append(('group:%s:%s' % (r.group_id, r.repo_id),
+                                'group', r))
+
+        if filter_by['org'] and request.user.permissions.can_view_org():
+            public_repos = list_inner_pub_repos(request)
+            for r in public_repos:
+                if q and q.lower() not in r.name.lower():
+                    continue
+
+                entries.append(('org:%s' % r.repo_id, 'org', r))
+
+        return entries
+
+    def _get_repos_json(self, request, entries, repos_with_admin_share_to):
+        email = request.user.username
+        owner_name = email2nickname(email)
+        owner_contact_email = email2contact_email(email)
+
+        # Use dict to reduce memcache fetch cost in large for-loop.
+        email_set = set()
+        for key, category, r in entries:
+            email_set.add(r.last_modifier)
+            if category != 'mine':
+                email_set.add(r.user)
+        contact_email_dict = emails2contact_emails(email_set)
+        nickname_dict = emails2nicknames(email_set)
+
+        repos_json = []
+        for key, category, r in entries:
+            if category == 'mine':
                 repo = {
                     "type": "repo",
                     "id": r.id,
@@ -737,45 +784,12 @@ class Repos(APIView):
                     repo['storage_name'] = r.storage_name
                     repo['storage_id'] = r.storage_id
 
-                repos_json.append(repo)
-
-        if filter_by['shared']:
-
-            if is_org_context(request):
-                org_id = request.user.org.org_id
-                shared_repos = seafile_api.get_org_share_in_repo_list(org_id,
-                        email, -1, -1)
-            else:
-                shared_repos = seafile_api.get_share_in_repo_list(
-                        email, -1, -1)
-
-            repos_with_admin_share_to = ExtraSharePermission.objects.\
-                    get_repos_with_admin_permission(email)
-
-            # Reduce memcache fetch ops.
-            owners_set = set([x.user for x in shared_repos])
-            modifiers_set = set([x.last_modifier for x in shared_repos])
-            for e in owners_set | modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
-
-            shared_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
-            for r in shared_repos:
-                if q and q.lower() not in r.name.lower():
-                    continue
-
+            elif category == 'shared':
                 library_group_name = ''
                 if '@seafile_group' in r.user:
                     library_group_id = get_group_id_by_repo_owner(r.user)
                     library_group_name= group_id_to_name(library_group_id)
 
-                if parse_repo_perm(r.permission).can_download is False:
-                    if not is_web_request(request):
-                        continue
-
-                r.password_need = is_passwd_set(r.repo_id, email)
                 repo = {
                     "type": "srepo",
                     "id": r.repo_id,
@@ -806,35 +820,7 @@ class Repos(APIView):
                 else:
                     repo['is_admin'] = False
 
-                repos_json.append(repo)
-
-        if filter_by['group']:
-            if is_org_context(request):
-                org_id = request.user.org.org_id
-                group_repos = seafile_api.get_org_group_repos_by_user(email,
-                        org_id)
-            else:
-                group_repos = seafile_api.get_group_repos_by_user(email)
-
-            group_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
-
-            # Reduce memcache fetch ops.
-            share_from_set = set([x.user for x in group_repos])
-            modifiers_set = set([x.last_modifier for x in group_repos])
-            for e in modifiers_set | share_from_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
-
-            for r in group_repos:
-                if q and q.lower() not in r.name.lower():
-                    continue
-
-                if parse_repo_perm(r.permission).can_download is False:
-                    if not is_web_request(request):
-                        continue
-
+            elif category == 'group':
                 repo = {
                     "type": "grepo",
                     "id": r.repo_id,
@@ -857,24 +843,8 @@ class Repos(APIView):
                     "share_from_name": nickname_dict.get(r.user, ''),
                     "share_from_contact_email": contact_email_dict.get(r.user, ''),
                 }
-                repos_json.append(repo)
-
-        if filter_by['org'] and request.user.permissions.can_view_org():
-            public_repos = list_inner_pub_repos(request)
-
-            # Reduce memcache fetch ops.
-            share_from_set = set([x.user for x in public_repos])
-            modifiers_set = set([x.last_modifier for x in public_repos])
-            for e in modifiers_set | share_from_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
-
-            for r in public_repos:
-                if q and q.lower() not in r.name.lower():
-                    continue
 
+            else:
                 repo = {
                     "type": "grepo",
                     "id": r.repo_id,
@@ -897,7 +867,75 @@ class Repos(APIView):
                     "head_commit_id": r.head_cmmt_id,
                     "version": r.version,
                 }
-                repos_json.append(repo)
+
+            repos_json.append(repo)
+
+        return repos_json
+
+    def _get_removed_json(self, key):
+        """Return type and id of a library listed as ``key`` before.
+        """
+        parts = key.split(':')
+        category = parts[0]
+        removed = {
+            'type': {'mine': 'repo', 'shared': 'srepo'}.get(category, 'grepo'),
+            'id': parts[-1],
+        }
+        if category == 'group':
+            removed['groupid'] = int(parts[1])
+
+        return removed
+
+    def get(self, request, format=None):
+        """List libraries of user.
+
+        The response has an ETag, which changes when a library is added or
+        removed, or its head commit or permission changes. The ETag (without
+        quotes) can also be passed as ``since`` argument, then only the
+        libraries added, removed or changed since then are returned.
+        """
+        # parse request params
+        filter_by = {
+            'mine': False,
+            'shared': False,
+            'group': False,
+            'org': False,
+        }
+
+        q = request.GET.get('nameContains', '')
+        rtype = request.GET.get('type', "")
+        if not rtype:
+            # set all to True, no filter applied
+            filter_by = filter_by.fromkeys(filter_by.iterkeys(), True)
+
+        for f in rtype.split(','):
+            f = f.strip()
+            filter_by[f] = True
+
+        since = request.GET.get('since', '')
+
+        email = request.user.username
+        entries = self._get_repo_entries(request, filter_by, q)
+
+        repos_with_admin_share_to = []
+        if filter_by['shared']:
+            repos_with_admin_share_to = ExtraSharePermission.objects.\
+                    get_repos_with_admin_permission(email)
+
+        # state of every listed library, compared by ETag and delta requests
+        snapshot = {}
+        for key, category, r in entries:
+            if category == 'mine':
+                permission = 'rw'
+            elif category == 'shared' and r.repo_id in repos_with_admin_share_to:
+                permission = r.permission + ':admin'
+            else:
+                permission = r.permission
+            snapshot[key] = '%s:%s' % (r.head_cmmt_id, permission)
+
+        token = get_repo_list_token(email, snapshot, q, rtype,
+                                    is_web_request(request))
+        etag = '"%s"' % token
 
         utc_dt = datetime.datetime.utcnow()
         timestamp = utc_dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -909,8 +947,43 @@ class Repos(APIView):
             send_message('seahub.stats', 'user-login\t%s\t%s\t%s' % (email, timestamp, org_id))
         except Exception as e:
             logger.error('Error when sending user-login message: %s' % str(e))
-        response = HttpResponse(json.dumps(repos_json), status=200,
-                                content_type=json_content_type)
+
+        if since:
+            old_snapshot = get_repo_list_snapshot(email, since)
+            if old_snapshot is None:
+                # unknown or expired token, client has to start over
+                added, removed, changed = snapshot.keys(), [], []
+            else:
+                added, removed, changed = diff_repo_list_snapshots(
+                    old_snapshot, snapshot)
+
+            added, changed = set(added), set(changed)
+            added_entries = [entry for entry in entries if entry[0] in added]
+            changed_entries = [entry for entry in entries if entry[0] in changed]
+            repos_json = self._get_repos_json(request,
+                    added_entries + changed_entries, repos_with_admin_share_to)
+
+            result = {
+                'since': since,
+                'token': token,
+                'reset': old_snapshot is None,
+                'added': repos_json[:len(added_entries)],
+                'changed': repos_json[len(added_entries):],
+                'removed': [self._get_removed_json(k) for k in removed],
+            }
+            set_repo_list_snapshot(email, token, snapshot)
+            response = HttpResponse(json.dumps(result), status=200,
+                                    content_type=json_content_type)
+        elif etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponse(status=304)
+        else:
+            repos_json = self._get_repos_json(request, entries,
+                                              repos_with_admin_share_to)
+            set_repo_list_snapshot(email, token, snapshot)
+            response = HttpResponse(json.dumps(repos_json), status=200,
+                                    content_type=json_content_type)
+
+        response['ETag'] = etag
         response["enable_encrypted_library"] = config.ENABLE_ENCRYPTED_LIBRARY
         return response
 
@@ -1955,62 +2028,112 @@ class UpdateBlksLinkView(APIView):
         url = gen_file_upload_url(token, 'update-blks-api')
         return Response(url)
 
-def get_dir_file_recursively(username, repo_id, path, all_dirs):
+def iter_dir_file_recursively(username, repo_id, path, dirent_type=None,
+        max_depth=None, max_entries=None):
+    """Walk the folder tree under `path` and yield dirent info one by one.
+
+    Folders are visited depth first in the same order as before, but
+    iteratively, so deep trees do not hit the recursion limit and the
+    caller can serialize entries while the walk is still going on.
+
+    Modifier/lock owner names are resolved once per email for each folder
+    listing and memoized for the whole walk.
+
+    `dirent_type`: 'file' or 'dir' to only yield that type of entries.
+    `max_depth`: only descend `max_depth` levels below `path`, 1 means
+    only the direct children of `path`.
+    `max_entries`: stop after `max_entries` dirents have been walked.
+    """
     is_pro = is_pro_version()
+    nickname_dict = {}
+    contact_email_dict = {}
+
+    def list_dirents(parent_dir, dir_id):
+        dirents = seafile_api.list_dir_with_perm(repo_id, parent_dir,
+                dir_id, username, -1, -1)
+        dirents = dirents if dirents else []
+
+        # Use dict to reduce memcache fetch cost in large for-loop.
+        email_set = set()
+        for dirent in dirents:
+            if not stat.S_ISDIR(dirent.mode):
+                email_set.add(dirent.modifier)
+                if is_pro and dirent.lock_owner:
+                    email_set.add(dirent.lock_owner)
+
+        email_set = email_set - set(nickname_dict.keys())
+        nickname_dict.update(emails2nicknames(email_set))
+        contact_email_dict.update(emails2contact_emails(email_set))
+
+        return iter(dirents)
+
     path_id = seafile_api.get_dir_id_by_path(repo_id, path)
-    dirs = seafile_api.list_dir_with_perm(repo_id, path,
-            path_id, username, -1, -1)
+    stack = [(path, 1, list_dirents(path, path_id))]
+    entries_count = 0
+
+    while stack:
+        parent_dir, depth, dirents = stack[-1]
+        dirent = next(dirents, None)
+        if dirent is None:
+            stack.pop()
+            continue
 
-    for dirent in dirs:
         entry = {}
         if stat.S_ISDIR(dirent.mode):
             entry["type"] = 'dir'
         else:
             entry["type"] = 'file'
-            entry['modifier_email'] = dirent.modifier
+            modifier_email = dirent.modifier
+            entry['modifier_email'] = modifier_email
+            entry['modifier_name'] = nickname_dict.get(modifier_email, '')
+            entry['modifier_contact_email'] = contact_email_dict.get(modifier_email, '')
             entry["size"] = dirent.size
 
             if is_pro:
                 entry["is_locked"] = dirent.is_locked
                 entry["lock_owner"] = dirent.lock_owner
                 if dirent.lock_owner:
-                    entry["lock_owner_name"] = email2nickname(dirent.lock_owner)
+                    entry["lock_owner_name"] = nickname_dict.get(dirent.lock_owner, '')
                 entry["lock_time"] = dirent.lock_time
                 if username == dirent.lock_owner:
                     entry["locked_by_me"] = True
                 else:
                     entry["locked_by_me"] = False
 
-        entry["parent_dir"] = path
+        entry["parent_dir"] = parent_dir
         entry["id"] = dirent.obj_id
         entry["name"] = dirent.obj_name
         entry["mtime"] = dirent.mtime
         entry["permission"] = dirent.permission
 
-        all_dirs.append(entry)
-
-        # Use dict to reduce memcache fetch cost in large for-loop.
-        file_list =  [item for item in all_dirs if item['type'] == 'file']
-        contact_email_dict = {}
-        nickname_dict = {}
-        modifiers_set = set([x['modifier_email'] for x in file_list])
-        for e in modifiers_set:
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
-
-        for e in file_list:
-            e['modifier_contact_email'] = contact_email_dict.get(e['modifier_email'], '')
-            e['modifier_name'] = nickname_dict.get(e['modifier_email'], '')
+        if not dirent_type or entry["type"] == dirent_type:
+            yield entry
 
+        entries_count += 1
+        if max_entries and entries_count >= max_entries:
+            return
 
-        if stat.S_ISDIR(dirent.mode):
-            sub_path = posixpath.join(path, dirent.obj_name)
-            get_dir_file_recursively(username, repo_id, sub_path, all_dirs)
+        if stat.S_ISDIR(dirent.mode) and \
+                (not max_depth or depth < max_depth):
+            # obj_id of a folder dirent is its dir id, no need to look it up.
+            sub_path = posixpath.join(parent_dir, dirent.obj_name)
+            stack.append((sub_path, depth + 1,
+                list_dirents(sub_path, dirent.obj_id)))
 
+def get_dir_file_recursively(username, repo_id, path, all_dirs):
+    all_dirs.extend(iter_dir_file_recursively(username, repo_id, path))
     return all_dirs
 
+def stream_json_list(items):
+    """Serialize an iterable to a json array piece by piece.
+    """
+    yield '['
+    for i, item in enumerate(items):
+        if i > 0:
+            yield ', '
+        yield json.dumps(item)
+    yield ']'
+
 def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
     """ Get dirents in a dir
 
@@ -2063,14 +2186,9 @@ def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
             file_list.append(entry)
 
     # Use dict to reduce memcache fetch cost in large for-loop.
-    contact_email_dict = {}
-    nickname_dict = {}
     modifiers_set = set([x['modifier_email'] for x in file_list])
-    for e in modifiers_set:
-        if e not in contact_email_dict:
-            contact_email_dict[e] = email2contact_email(e)
-        if e not in nickname_dict:
-            nickname_dict[e] = email2nickname(e)
+    contact_email_dict = emails2contact_emails(modifiers_set)
+    nickname_dict = emails2nicknames(modifiers_set)
 
     starred_files = get_dir_starred_files(username, repo.id, path)
     files_tags_in_dir = get_files_tags_in_dir(repo.id, path)
@@ -3505,22 +3623,13 @@ class DirView(APIView):
             return response
 
         if recursive == '1':
-            result = []
             username = request.user.username
-            dir_file_list = get_dir_file_recursively(username, repo_id, path, [])
-            if request_type == 'f':
-                for item in dir_file_list:
-                    if item['type'] == 'file':
-                        result.append(item)
-            elif request_type == 'd':
-                for item in dir_file_list:
-                    if item['type'] == 'dir':
-                        result.append(item)
-            else:
-                result = dir_file_list
+            dirent_type = {'f': 'file', 'd': 'dir'}.get(request_type)
+            dir_file_iter = iter_dir_file_recursively(username, repo_id,
+                    path, dirent_type)
 
-            response = HttpResponse(json.dumps(result), status=200,
-                                    content_type=json_content_type)
+            response = StreamingHttpResponse(stream_json_list(dir_file_iter),
+                    status=200, content_type=json_content_type)
             response["oid"] = dir_id
             response["dir_perm"] = permission
             return response
@@ -4629,6 +4738,7 @@ class GroupMembers(APIView):
 
         try:
             ccnet_threaded_rpc.group_add_member(group.id, request.user.username, user_name)
+            clear_user_group_ids_cache(user_name)
         except SearpcError, e:
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, 'Unable to add user to group')
 
@@ -4654,6 +4764,7 @@ class GroupMembers(APIView):
 
         try:
             ccnet_threaded_rpc.group_remove_member(group.id, request.user.username, user_name)
+            clear_user_group_ids_cache(user_name)
         except SearpcError, e:
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, 'Unable to add user to group')
 
@@ -4768,15 +4879,10 @@ class GroupRepos(APIView):
         group.is_staff = is_group_staff(group, request.user)
 
         # Use dict to reduce memcache fetch cost in large for-loop.
-        contact_email_dict = {}
-        nickname_dict = {}
         owner_set = set([x.user for x in repos])
         modifiers_set = set([x.modifier for x in repos])
-        for e in owner_set | modifiers_set:
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
+        contact_email_dict = emails2contact_emails(owner_set | modifiers_set)
+        nickname_dict = emails2nicknames(owner_set | modifiers_set)
 
         # Get repos that is admin permission in group.
         admin_repos = ExtraGroupsSharePermission.objects.\
@@ -5023,13 +5129,16 @@ class ThumbnailView(APIView):
             check_folder_permission(request, repo_id, path) is None:
             return api_error(status.HTTP_403_FORBIDDEN, 'Permission denied.')
 
-        success, status_code = generate_thumbnail(request, repo_id, size, path)
+        success = True
+        if thumbnail_exists(obj_id, size):
+            record_stat('hits')
+        else:
+            record_stat('misses')
+            success, status_code = generate_thumbnail(request, repo_id, size, path)
+
         if success:
-            thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-            thumbnail_file = os.path.join(thumbnail_dir, obj_id)
             try:
-                with open(thumbnail_file, 'rb') as f:
-                    thumbnail = f.read()
+                thumbnail = read_thumbnail(obj_id, size)
                 return HttpResponse(thumbnail, 'image/' + THUMBNAIL_EXTENSION)
             except IOError as e:
                 logger.error(e)
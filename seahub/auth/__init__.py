@@ -113,11 +113,17 @@ def logout(request):
 
 def get_user(request):
     from seahub.auth.models import AnonymousUser
+    from seahub.auth.identity_cache import get_cached_user, set_cached_user
     try:
         username = request.session[SESSION_KEY]
         backend_path = request.session[BACKEND_SESSION_KEY]
-        backend = load_backend(backend_path)
-        user = backend.get_user(username) or AnonymousUser()
+        user = get_cached_user(username)
+        if user is None:
+            backend = load_backend(backend_path)
+            user = backend.get_user(username)
+            if user is not None:
+                set_cached_user(user)
+        user = user or AnonymousUser()
     except KeyError:
         user = AnonymousUser()
     return user
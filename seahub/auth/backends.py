@@ -7,6 +7,7 @@ from django.conf import settings
 from seaserv import ccnet_api, seafile_api
 
 from seahub.base.accounts import User, AuthBackend
+from seahub.auth.identity_cache import invalidate_user_identity
 from seahub.profile.models import Profile
 from seahub.utils.file_size import get_quota_from_string
 from seahub.role_permissions.utils import get_enabled_role_permissions_by_role
@@ -252,6 +253,7 @@ class SeafileRemoteUserBackend(AuthBackend):
 
             # update user role
             ccnet_api.update_role_emailuser(user_info['email'], role)
+            invalidate_user_identity(user_info['email'])
 
             # update user role quota
             role_quota = get_enabled_role_permissions_by_role(role)['role_quota']
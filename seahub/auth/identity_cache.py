@@ -0,0 +1,121 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Short-lived cache of authenticated users.
+
+Resolving ``request.user`` costs a ccnet rpc (plus an ``AdminRole`` query for
+staff) on every request, api calls add a ``Token``/``TokenV2`` query, and in
+multi-tenancy mode the user's orgs are fetched once more. Sync clients poll
+often, so we keep those results in cache for a short while and drop them
+explicitly when the user's password, status or role changes, or when the
+token is deleted.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlquote
+
+USER_IDENTITY_CACHE_TIMEOUT = getattr(settings, 'USER_IDENTITY_CACHE_TIMEOUT', 60)
+USER_IDENTITY_CACHE_PREFIX = 'USER_IDENTITY_'
+USER_ORGS_CACHE_PREFIX = 'USER_ORGS_'
+API_TOKEN_CACHE_PREFIX = 'API_TOKEN_'
+
+# Attributes set by ``UserManager.get``/``AuthBackend.get_user``.
+USER_ATTRS = ('id', 'enc_password', 'is_staff', 'is_active', 'ctime',
+              'source', 'role', 'reference_id', 'admin_role')
+# Attributes of ccnet org objects returned by ``get_orgs_by_user``, where
+# ``is_staff`` tells whether the user is admin of the org.
+ORG_ATTRS = ('org_id', 'org_name', 'url_prefix', 'creator', 'ctime',
+             'is_staff')
+
+def _cache_key(prefix, value):
+    # same as ``seahub.utils.normalize_cache_key``, which can not be imported
+    # here since ``seahub.utils`` imports ``seahub.api2.models``.
+    return urlquote(prefix + value)[:200]
+
+class CachedOrg(object):
+    """Picklable snapshot of a ccnet org object.
+    """
+    def __init__(self, org):
+        for attr in ORG_ATTRS:
+            setattr(self, attr, getattr(org, attr, None))
+
+def get_cached_user(username):
+    """Return the ``User`` cached for ``username``, or None.
+    """
+    if not username:
+        return None
+
+    attrs = cache.get(_cache_key(USER_IDENTITY_CACHE_PREFIX, username))
+    if attrs is None:
+        return None
+
+    from seahub.base.accounts import User
+    user = User(username)
+    for attr, value in attrs.iteritems():
+        setattr(user, attr, value)
+
+    return user
+
+def set_cached_user(user):
+    attrs = {}
+    for attr in USER_ATTRS:
+        if hasattr(user, attr):
+            attrs[attr] = getattr(user, attr)
+
+    cache.set(_cache_key(USER_IDENTITY_CACHE_PREFIX, user.username), attrs,
+              USER_IDENTITY_CACHE_TIMEOUT)
+
+def get_user_orgs(username):
+    """Cached version of ``ccnet_api.get_orgs_by_user``.
+    """
+    key = _cache_key(USER_ORGS_CACHE_PREFIX, username)
+    orgs = cache.get(key)
+    if orgs is None:
+        from seaserv import ccnet_api
+        orgs = [CachedOrg(o) for o in ccnet_api.get_orgs_by_user(username) or []]
+        cache.set(key, orgs, USER_IDENTITY_CACHE_TIMEOUT)
+
+    return orgs
+
+def invalidate_user_identity(username):
+    """Called when a user's password, status, role or orgs change.
+    """
+    if not username:
+        return
+
+    cache.delete_many([_cache_key(USER_IDENTITY_CACHE_PREFIX, username),
+                       _cache_key(USER_ORGS_CACHE_PREFIX, username)])
+
+def get_cached_token(model, key):
+    """Return the ``model`` (``Token`` or ``TokenV2``) object of ``key``.
+
+    Raise ``model.DoesNotExist`` if there is no such token, the negative
+    result is cached as well.
+    """
+    cache_key = _cache_key(API_TOKEN_CACHE_PREFIX + model.__name__ + '_', key)
+    token = cache.get(cache_key)
+    if token is None:
+        try:
+            token = model.objects.get(key=key)
+        except model.DoesNotExist:
+            token = False
+        cache.set(cache_key, token, USER_IDENTITY_CACHE_TIMEOUT)
+
+    if token is False:
+        raise model.DoesNotExist
+
+    return token
+
+def invalidate_token(model, key):
+    """Called when a token is created, updated or deleted.
+    """
+    cache.delete(_cache_key(API_TOKEN_CACHE_PREFIX + model.__name__ + '_', key))
+
+def get_user_with_cache(username):
+    """Cached version of ``User.objects.get(email=username)``.
+    """
+    user = get_cached_user(username)
+    if user is None:
+        from seahub.base.accounts import User
+        user = User.objects.get(email=username)
+        set_cached_user(user)
+
+    return user
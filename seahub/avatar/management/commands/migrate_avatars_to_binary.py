@@ -0,0 +1,89 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+import os
+import base64
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from seahub.avatar.models import Avatar, GroupAvatar
+from seahub.avatar.util import get_avatar_dbs_options
+from seahub.base.database_storage import BinaryDatabaseStorage
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+
+def get_avatar_names():
+    """Return names of current avatars, and dirs of their thumbnails.
+    """
+    names = set()
+    for model in (Avatar, GroupAvatar):
+        names.update(model.objects.values_list('avatar', flat=True))
+
+    return names, set([os.path.dirname(name) for name in names])
+
+def is_avatar_file(name, avatar_names, avatar_dirs):
+    if '/resized/' in name:
+        # thumbnail, in <dir of avatar>/resized/<size>/
+        return name.split('/resized/')[0] in avatar_dirs
+    return name in avatar_names
+
+
+class Command(BaseCommand):
+    help = "Convert avatars stored base64 encoded in database to " + \
+        "BinaryDatabaseStorage. Can be run again to convert files saved " + \
+        "meanwhile, files deleted or saved again since the first run are " + \
+        "skipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of files converted per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        source = get_avatar_dbs_options()
+        storage = BinaryDatabaseStorage(options=get_avatar_dbs_options(binary=True))
+
+        query = 'SELECT %(name_column)s, filename_md5, %(data_column)s, ' + \
+                'mtime FROM %(table)s WHERE filename_md5 > %%s ' + \
+                'ORDER BY filename_md5 LIMIT %%s'
+        query %= source
+
+        avatar_names, avatar_dirs = get_avatar_names()
+
+        count = skipped = 0
+        last_md5 = ''
+        while True:
+            cursor = connection.cursor()
+            cursor.execute(query, [last_md5, batch_size])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            with transaction.atomic(using='default'):
+                for name, name_md5, data, mtime in rows:
+                    if not is_avatar_file(name, avatar_names, avatar_dirs):
+                        # deleted after the storage was switched
+                        skipped += 1
+                        continue
+
+                    info = storage.get_file_info(name)
+                    if info is not None and info[2] >= mtime:
+                        # converted already, or saved again since
+                        skipped += 1
+                        continue
+
+                    try:
+                        storage.save_data(name, base64.b64decode(data), mtime)
+                    except TypeError as e:
+                        logger.error(e)
+                        self.stderr.write('ERROR: invalid content of %s, skip.' % name)
+                        continue
+                    count += 1
+
+            last_md5 = rows[-1][1]
+            self.stdout.write('%d files converted.' % count)
+
+        self.stdout.write('Done, %d files converted, %d skipped.' %
+                          (count, skipped))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 10:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import seahub.base.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avatar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvatarIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emailuser', seahub.base.fields.LowerCaseCharField(db_index=True, max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('url', models.CharField(max_length=1024)),
+                ('date_uploaded', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='avatarindex',
+            unique_together=set([('emailuser', 'size')]),
+        ),
+    ]
@@ -116,6 +116,9 @@ class AvatarBase(object):
             logger.error(e)
             return # What should we do here?  Render a "sorry, didn't work" img?
 
+        if isinstance(self, Avatar) and self.primary:
+            self.index_thumbnail(size)
+
     def avatar_url(self, size):
         return self.avatar.storage.url(self.avatar_name(size))
 
@@ -154,12 +157,38 @@ class Avatar(models.Model, AvatarBase):
         else:
             avatars.delete()
         invalidate_cache(self.emailuser)
+        AvatarIndex.objects.filter(emailuser=self.emailuser).delete()
         super(Avatar, self).save(*args, **kwargs)
     
     def delete(self, *args, **kwargs):
         invalidate_cache(self.emailuser)
+        AvatarIndex.objects.filter(emailuser=self.emailuser).delete()
         super(Avatar, self).delete(*args, **kwargs)
 
+    def index_thumbnail(self, size):
+        """Record url of thumbnail of ``size`` in ``AvatarIndex``.
+        """
+        try:
+            AvatarIndex.objects.update_or_create(
+                emailuser=self.emailuser, size=size,
+                defaults={'url': self.avatar_url(size),
+                          'date_uploaded': self.date_uploaded})
+        except Exception as e:
+            logger.error(e)
+
+class AvatarIndex(models.Model):
+    """Url of the thumbnail of each size of a user's primary avatar,
+    written when the thumbnail is created, so looking up avatar urls does not
+    touch the avatar storage.
+    """
+    emailuser = LowerCaseCharField(max_length=255, db_index=True)
+    size = models.PositiveIntegerField()
+    url = models.CharField(max_length=1024)
+    date_uploaded = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('emailuser', 'size')
+
 class GroupAvatar(models.Model, AvatarBase):
     group_id = models.CharField(max_length=255)
     avatar = models.ImageField(max_length=1024,
@@ -0,0 +1,2 @@
+CREATE TABLE `avatar_uploaded_file` (`filename` TEXT NOT NULL, `filename_md5` CHAR(32) NOT NULL PRIMARY KEY, `sha1` CHAR(40) NOT NULL, `size` INTEGER NOT NULL, `mtime` datetime NOT NULL, KEY `avatar_uploaded_file_sha1` (`sha1`));
+CREATE TABLE `avatar_uploaded_blob` (`sha1` CHAR(40) NOT NULL PRIMARY KEY, `data` MEDIUMBLOB NOT NULL);
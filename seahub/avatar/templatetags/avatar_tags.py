@@ -15,7 +15,7 @@ from seahub.views import is_registered_user
 from seahub.avatar.settings import (AVATAR_GRAVATAR_BACKUP, AVATAR_GRAVATAR_DEFAULT,
                              AVATAR_DEFAULT_SIZE)
 from seahub.avatar.util import get_primary_avatar, get_default_avatar_url, \
-    cache_result, get_default_avatar_non_registered_url
+    cache_result, get_default_avatar_non_registered_url, get_avatar_infos
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -41,13 +41,9 @@ def avatar_url(user, size=AVATAR_DEFAULT_SIZE):
 
 @cache_result
 def api_avatar_url(user, size=AVATAR_DEFAULT_SIZE):
-    avatar = get_primary_avatar(user, size=size)
-    if avatar:
-        url = avatar.avatar_url(size)
-        date_uploaded = avatar.date_uploaded
-        return url, False, date_uploaded
-    else:
-        return get_default_avatar_url(), True, None
+    if isinstance(user, User):
+        user = user.username
+    return get_avatar_infos([user], size)[user]
 
 @cache_result
 @register.simple_tag
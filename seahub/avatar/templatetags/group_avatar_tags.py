@@ -44,6 +44,35 @@ def api_grp_avatar_url(group_id, size=GROUP_AVATAR_DEFAULT_SIZE):
     else:
         return get_default_group_avatar_url(), True, None
 
+def api_grp_avatar_urls(group_ids, size=GROUP_AVATAR_DEFAULT_SIZE):
+    """Return dict of group id to avatar url of ``size``, with avatars of
+    all groups read in one query.
+    """
+    avatars = {}
+    # latest uploaded avatar of a group wins
+    for avatar in GroupAvatar.objects.filter(
+            group_id__in=[str(group_id) for group_id in group_ids]).order_by(
+                'date_uploaded'):
+        avatars[avatar.group_id] = avatar
+
+    default_url = get_default_group_avatar_url()
+    urls = {}
+    for group_id in group_ids:
+        avatar = avatars.get(str(group_id))
+        if avatar is None:
+            urls[group_id] = default_url
+            continue
+
+        try:
+            if not avatar.thumbnail_exists(size):
+                avatar.create_thumbnail(size)
+            urls[group_id] = avatar.avatar_url(size)
+        except Exception as e:
+            logger.error(e)
+            urls[group_id] = default_url
+
+    return urls
+
 
 @register.simple_tag
 def grp_avatar(group_id, size=GROUP_AVATAR_DEFAULT_SIZE):
@@ -35,9 +35,12 @@ def cache_result(func):
         cache.set(key, value, AVATAR_CACHE_TIMEOUT)
         return value
 
+    prefix = func.__name__
+    # register when decorated, so ``invalidate_cache`` deletes the keys
+    # even in processes that have not called ``func`` yet
+    cached_funcs.add(prefix)
+
     def cached_func(user, size):
-        prefix = func.__name__
-        cached_funcs.add(prefix)
         key = get_cache_key(user, size, prefix=prefix)
         return cache.get(key) or cache_set(key, func(user, size))
     return cached_func
@@ -113,19 +116,94 @@ def get_primary_avatar(user, size=AVATAR_DEFAULT_SIZE):
             avatar.create_thumbnail(size)
     return avatar
 
+def get_avatar_dbs_options(binary=False):
+    """Get options of the database storage of avatar files, for
+    ``BinaryDatabaseStorage`` if ``binary`` is True.
+    """
+    dbs_options = {
+        'table': 'avatar_uploaded',
+        'base_url': '%simage-view/' % settings.SITE_ROOT,
+        'name_column': 'filename',
+        'data_column': 'data',
+        'size_column': 'size',
+        }
+    if binary:
+        dbs_options['table'] = 'avatar_uploaded_file'
+        dbs_options['blob_table'] = 'avatar_uploaded_blob'
+    return dbs_options
+
 def get_avatar_file_storage():
     """Get avatar file storage, defaults to file system storage.
     """
     if not AVATAR_FILE_STORAGE:
         return default_storage
     else:
-        dbs_options = {
-            'table': 'avatar_uploaded',
-            'base_url': '%simage-view/' % settings.SITE_ROOT,
-            'name_column': 'filename',
-            'data_column': 'data',
-            'size_column': 'size',
-            }
-        return get_storage_class(AVATAR_FILE_STORAGE)(options=dbs_options)
-    
-    
+        from seahub.base.database_storage import BinaryDatabaseStorage
+        storage_class = get_storage_class(AVATAR_FILE_STORAGE)
+        dbs_options = get_avatar_dbs_options(
+            binary=issubclass(storage_class, BinaryDatabaseStorage))
+        return storage_class(options=dbs_options)
+
+def get_avatar_infos(emails, size=AVATAR_DEFAULT_SIZE):
+    """Return a dict of email -> (url, is_default, date_uploaded), same as
+    ``api_avatar_url``, for many users at once.
+
+    Results are read from cache with the keys ``api_avatar_url`` uses, then
+    from ``AvatarIndex`` with one query. For the rest, primary avatars are
+    read with one query, and their thumbnails are indexed (or created if
+    missing). Users without avatar get the default url.
+    """
+    from seahub.avatar.models import Avatar, AvatarIndex
+
+    emails = set([e for e in emails if e])
+    key_to_email = dict([(get_cache_key(e, size, 'api_avatar_url'), e)
+        for e in emails])
+
+    result = {}
+    for key, value in cache.get_many(key_to_email.keys()).iteritems():
+        if value:
+            result[key_to_email[key]] = value
+
+    # ``Avatar.emailuser`` is stored in lower case
+    misses = {}
+    for email in emails - set(result.keys()):
+        misses.setdefault(email.lower(), []).append(email)
+    if not misses:
+        return result
+
+    found = {}
+    for index in AvatarIndex.objects.filter(emailuser__in=misses.keys(),
+                                            size=size):
+        found[index.emailuser] = (index.url, False, index.date_uploaded)
+
+    not_indexed = [e for e in misses if e not in found]
+    if not_indexed:
+        for avatar in Avatar.objects.filter(emailuser__in=not_indexed,
+                                            primary=True):
+            if avatar.emailuser in found:
+                continue
+
+            if avatar.thumbnail_exists(size):
+                avatar.index_thumbnail(size)
+            else:
+                avatar.create_thumbnail(size)
+            found[avatar.emailuser] = (avatar.avatar_url(size), False,
+                                       avatar.date_uploaded)
+
+    to_cache = {}
+    default = (get_default_avatar_url(), True, None)
+    for lower_email, emails in misses.iteritems():
+        info = found.get(lower_email, default)
+        for email in emails:
+            result[email] = info
+            to_cache[get_cache_key(email, size, 'api_avatar_url')] = info
+
+    cache.set_many(to_cache, AVATAR_CACHE_TIMEOUT)
+    return result
+
+def avatar_urls(emails, size=AVATAR_DEFAULT_SIZE):
+    """Return a dict of email -> avatar url, the bulk version of
+    ``api_avatar_url``.
+    """
+    return dict([(email, info[0]) for email, info in
+                 get_avatar_infos(emails, size).iteritems()])
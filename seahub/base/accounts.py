@@ -17,6 +17,7 @@ from constance import config
 from registration import signals
 
 from seahub.auth import login
+from seahub.auth.identity_cache import invalidate_user_identity
 from seahub.constants import DEFAULT_USER, DEFAULT_ORG, DEFAULT_ADMIN
 from seahub.profile.models import Profile, DetailedProfile
 from seahub.role_permissions.models import AdminRole
@@ -65,6 +66,7 @@ class UserManager(object):
         If user has a role, update it; or create a role for user.
         """
         ccnet_api.update_role_emailuser(email, role)
+        invalidate_user_identity(email)
         return self.get(email=email)
 
     def create_superuser(self, email, password):
@@ -353,6 +355,10 @@ class User(object):
                                                            self.password,
                                                            int(self.is_staff),
                                                            int(self.is_active))
+
+        # password, status or staff flag may be changed
+        invalidate_user_identity(self.username)
+
         # -1 stands for failed; 0 stands for success
         return result_code
 
@@ -411,6 +417,7 @@ class User(object):
         ccnet_api.remove_group_user(username)
 
         ccnet_api.remove_emailuser(source, username)
+        invalidate_user_identity(username)
         signals.user_deleted.send(sender=self.__class__, username=username)
 
         Profile.objects.delete_profile_by_user(username)
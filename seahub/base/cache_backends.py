@@ -0,0 +1,491 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Two-level cache backend: a small in-process LRU in front of the shared
+cache (file based, memcached or redis).
+
+Keys starting with one of ``LOCAL_KEY_PREFIXES`` are also kept in a bounded
+per-process LRU for at most ``LOCAL_TIMEOUT`` seconds, all the other keys go
+to the shared cache directly. Overwriting, deleting or incrementing such a
+key records it in an invalidation log in the shared cache, under the next
+generation of its prefix. Each process compares its generations with the
+shared ones at most every ``GENERATION_CHECK_INTERVAL`` seconds, and drops
+only the local entries of the logged keys, or all entries of a prefix if
+part of its log is missing. Setting a key that is not in the shared cache,
+e.g. filling it after a miss, invalidates nothing.
+
+Example::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'seahub.base.cache_backends.TieredCache',
+            'OPTIONS': {
+                'SHARED_CACHE': 'shared',
+                'LOCAL_MAX_ENTRIES': 10000,
+                'LOCAL_TIMEOUT': 300,
+            },
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        },
+    }
+"""
+import io
+import os
+import time
+import zlib
+import fcntl
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Immutable or long-lived keys used by template tags, nickname/avatar lookups
+# and authentication.
+DEFAULT_LOCAL_KEY_PREFIXES = (
+    'CHAR2PINYIN_',
+    'NICKNAME_',
+    'CONTACT_',
+    'avatar_',
+    'api_avatar_url_',
+    'primary_avatar_',
+    'render_avatar_',
+    'Group__',
+    'USER_IDENTITY_',
+    'USER_ORGS_',
+    'API_TOKEN_',
+)
+
+GENERATION_KEY_PREFIX = 'TIERED_CACHE_GENERATION_'
+INVALIDATION_KEY_PREFIX = 'TIERED_CACHE_INVALIDATION_'
+OTHER_NAMESPACE = 'other'
+# More invalidations than this since last check drop all entries of a prefix.
+MAX_INVALIDATIONS = 100
+
+########## counters
+# Counters of caches without atomic incr are updated under one of these
+# locks, chosen by key, so unrelated counters do not wait for each other.
+COUNTER_LOCK_STRIPES = 64
+_counter_locks = [threading.Lock() for i in range(COUNTER_LOCK_STRIPES)]
+
+def has_atomic_incr(cache):
+    """Return whether ``incr`` of ``cache`` is atomic and keeps the timeout
+    of the key, i.e. it is memcached or redis.
+    """
+    if isinstance(cache, TieredCache):
+        cache = cache.shared
+    return isinstance(cache, BaseMemcachedCache) or \
+        'redis' in type(cache).__module__
+
+def _file_cache(cache):
+    if isinstance(cache, TieredCache):
+        cache = cache.shared
+    return cache if isinstance(cache, FileBasedCache) else None
+
+@contextmanager
+def _counter_lock(cache, key):
+    stripe = (zlib.crc32(key) & 0xffffffff) % COUNTER_LOCK_STRIPES
+    with _counter_locks[stripe]:
+        file_cache = _file_cache(cache)
+        if file_cache is None:
+            yield
+            return
+
+        # other processes on this host use the same cache dir
+        file_cache._createdir()
+        lock_path = os.path.join(file_cache._dir, 'counters-%02d.lock' % stripe)
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def set_without_cull(cache, key, value, timeout=DEFAULT_TIMEOUT):
+    """Same as ``cache.set``, but the file based cache does not cull.
+
+    ``FileBasedCache.set`` globs the whole cache dir to count entries each
+    time, which is too slow for counters updated on every request.
+    """
+    file_cache = _file_cache(cache)
+    if file_cache is None or (isinstance(cache, TieredCache) and
+                              cache._get_namespace(key)):
+        # local copies of the key must be invalidated as well
+        cache.set(key, value, timeout)
+        return
+
+    file_cache._createdir()
+    fname = file_cache._key_to_file(key)
+    fd, tmp_path = tempfile.mkstemp(dir=file_cache._dir)
+    renamed = False
+    try:
+        with io.open(fd, 'wb') as f:
+            expiry = file_cache.get_backend_timeout(timeout)
+            f.write(pickle.dumps(expiry, pickle.HIGHEST_PROTOCOL))
+            f.write(zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        os.rename(tmp_path, fname)
+        renamed = True
+    finally:
+        if not renamed:
+            os.remove(tmp_path)
+
+def incr_counter(cache, key, delta=1, timeout=None, initial=0):
+    """Add ``delta`` to counter ``key`` in ``cache`` and return new value.
+
+    A missing counter starts from ``initial``, and by default never expires.
+    If ``initial`` is None, a missing counter is left missing, and None is
+    returned.
+    ``BaseCache.incr``, which the file based cache uses, is a get and a set
+    with the default timeout, so the counter would expire after 5 minutes,
+    and concurrent increments would be lost. For caches other than memcached
+    and redis, the counter is read and written under a lock of its key
+    instead, and ``timeout`` counts from the last increment rather than from
+    creation.
+    """
+    if has_atomic_incr(cache):
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            if initial is None:
+                return None
+            if cache.add(key, initial + delta, timeout):
+                return initial + delta
+            return cache.incr(key, delta)
+
+    with _counter_lock(cache, key):
+        value = cache.get(key)
+        if value is None:
+            if initial is None:
+                return None
+            value = initial
+        value += delta
+        set_without_cull(cache, key, value, timeout)
+        return value
+
+def bump_generation(cache, key):
+    """Increase generation counter ``key`` in ``cache``, which never
+    expires, and return it.
+    """
+    # Start from current time rather than 1, so generations seen before the
+    # cache was cleared are not reused.
+    return incr_counter(cache, key, initial=int(time.time() * 1000))
+
+
+class TieredCache(BaseCache):
+
+    def __init__(self, location, params):
+        super(TieredCache, self).__init__(params)
+
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE', location or 'shared')
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 10000))
+        self._local_timeout = int(options.get('LOCAL_TIMEOUT', 300))
+        self._local_key_prefixes = tuple(options.get('LOCAL_KEY_PREFIXES',
+                                                     DEFAULT_LOCAL_KEY_PREFIXES))
+        self._check_interval = float(options.get('GENERATION_CHECK_INTERVAL', 1))
+
+        self._shared_cache = None
+        self._lock = threading.RLock()
+        # (key, version) -> (pickled value, expire time, namespace)
+        self._local = OrderedDict()
+        # None: not known yet, nothing is kept locally
+        self._generations = dict.fromkeys(self._local_key_prefixes, None)
+        self._generations_checked_at = 0
+        self._stats = {}
+
+    @property
+    def shared(self):
+        if self._shared_cache is None:
+            from django.core.cache import caches
+            self._shared_cache = caches[self._shared_alias]
+        return self._shared_cache
+
+    def _get_namespace(self, key):
+        for prefix in self._local_key_prefixes:
+            if key.startswith(prefix):
+                return prefix
+        return None
+
+    def _count(self, namespace, name, n=1):
+        stats = self._stats.setdefault(namespace or OTHER_NAMESPACE, {
+            'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0,
+        })
+        stats[name] += n
+
+    def get_stats(self):
+        """Return hit/miss counters of this process, by key prefix.
+        """
+        with self._lock:
+            return dict((ns, dict(s)) for ns, s in self._stats.iteritems())
+
+    ########## generations
+    def _generation_key(self, namespace):
+        return GENERATION_KEY_PREFIX + namespace
+
+    def _invalidation_key(self, namespace, gen):
+        return '%s%s%d' % (INVALIDATION_KEY_PREFIX, namespace, gen)
+
+    def _get_invalidated(self, namespace, old_gen, gen):
+        """Return (key, version) invalidated after ``old_gen``, or None if
+        they are not all known.
+        """
+        if old_gen is None:
+            return None
+
+        # Entries are (previous generation, invalidated keys), previous one
+        # is usually ``gen - 1``, or 0 if the generation was just created.
+        gens = range(max(old_gen + 1, gen - MAX_INVALIDATIONS + 1), gen + 1)
+        logged = self.shared.get_many(
+            [self._invalidation_key(namespace, g) for g in gens])
+
+        invalidated = set()
+        while gen != old_gen:
+            entry = logged.get(self._invalidation_key(namespace, gen))
+            if entry is None:
+                return None
+            gen, key_versions = entry
+            invalidated.update(key_versions)
+        return invalidated
+
+    def _refresh_generations(self):
+        now = time.time()
+        if now - self._generations_checked_at < self._check_interval:
+            return
+
+        keys = [self._generation_key(ns) for ns in self._local_key_prefixes]
+        shared_gens = self.shared.get_many(keys)
+        for ns in self._local_key_prefixes:
+            gen = shared_gens.get(self._generation_key(ns), 0)
+            old_gen = self._generations.get(ns)
+            if gen == old_gen:
+                continue
+
+            invalidated = self._get_invalidated(ns, old_gen, gen)
+            with self._lock:
+                if self._generations.get(ns) != old_gen:
+                    # changed by another thread meanwhile
+                    continue
+                if invalidated is None:
+                    self._local_drop_namespace(ns)
+                else:
+                    for key_version in invalidated:
+                        self._local.pop(key_version, None)
+                self._generations[ns] = gen
+
+        self._generations_checked_at = now
+
+    def _invalidate(self, namespace, key_versions):
+        """Drop ``key_versions`` locally, and log them for other processes.
+        """
+        with self._lock:
+            for key_version in key_versions:
+                self._local.pop(key_version, None)
+
+        # see ``bump_generation``
+        seed = int(time.time() * 1000)
+        gen = incr_counter(self.shared, self._generation_key(namespace),
+                           initial=seed)
+        prev_gen = 0 if gen == seed + 1 else gen - 1
+        set_without_cull(self.shared, self._invalidation_key(namespace, gen),
+                         (prev_gen, list(key_versions)), self._local_timeout + 60)
+
+        with self._lock:
+            # Skip the own entry only if there is no other one before it.
+            if self._generations.get(namespace) == prev_gen:
+                self._generations[namespace] = gen
+
+    ########## local LRU
+    def _local_get(self, namespace, key, version):
+        with self._lock:
+            if self._generations.get(namespace) is None:
+                return None
+
+            entry = self._local.pop((key, version), None)
+            if entry is None:
+                return None
+
+            pickled, expire_at, entry_namespace = entry
+            if expire_at <= time.time():
+                return None
+
+            # move to the most recently used end
+            self._local[(key, version)] = entry
+
+        return pickle.loads(pickled)
+
+    def _local_set(self, namespace, key, value, timeout, version, gen):
+        """Keep ``value`` locally, if generation of ``namespace`` is still
+        ``gen``, which it was before ``value`` was read or written.
+        """
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            timeout = self._local_timeout
+        timeout = min(timeout, self._local_timeout)
+        if timeout <= 0:
+            self._local_delete(key, version)
+            return
+
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if gen is None or self._generations.get(namespace) != gen:
+                self._local.pop((key, version), None)
+                return
+
+            self._local.pop((key, version), None)
+            self._local[(key, version)] = (pickled, time.time() + timeout,
+                                           namespace)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+                self._count(namespace, 'evictions')
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop((key, version), None)
+
+    def _local_drop_namespace(self, namespace):
+        with self._lock:
+            for key_version, entry in self._local.items():
+                if entry[2] == namespace:
+                    del self._local[key_version]
+
+    ########## cache API
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace = self._get_namespace(key)
+        gen = self._generations.get(namespace) if namespace else None
+        added = self.shared.add(key, value, timeout, version)
+        if added and namespace:
+            self._local_set(namespace, key, value, timeout, version, gen)
+        return added
+
+    def get(self, key, default=None, version=None):
+        namespace = self._get_namespace(key)
+        gen = None
+        if namespace:
+            self._refresh_generations()
+            gen = self._generations.get(namespace)
+            value = self._local_get(namespace, key, version)
+            if value is not None:
+                self._count(namespace, 'local_hits')
+                return value
+
+        value = self.shared.get(key, version=version)
+        if value is None:
+            self._count(namespace, 'misses')
+            return default
+
+        self._count(namespace, 'shared_hits')
+        if namespace:
+            self._local_set(namespace, key, value, None, version, gen)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._refresh_generations()
+        gens = dict(self._generations)
+
+        result = {}
+        shared_keys = []
+        for key in keys:
+            namespace = self._get_namespace(key)
+            value = self._local_get(namespace, key, version) if namespace else None
+            if value is not None:
+                self._count(namespace, 'local_hits')
+                result[key] = value
+            else:
+                shared_keys.append(key)
+
+        if shared_keys:
+            shared_result = self.shared.get_many(shared_keys, version=version)
+            for key in shared_keys:
+                namespace = self._get_namespace(key)
+                if key not in shared_result:
+                    self._count(namespace, 'misses')
+                    continue
+
+                self._count(namespace, 'shared_hits')
+                value = shared_result[key]
+                result[key] = value
+                if namespace:
+                    self._local_set(namespace, key, value, None, version,
+                                    gens.get(namespace))
+
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace = self._get_namespace(key)
+        if not namespace:
+            self.shared.set(key, value, timeout, version)
+            return
+
+        gen = self._generations.get(namespace)
+        if not self.shared.add(key, value, timeout, version):
+            # overwrite a value other processes may have kept
+            self.shared.set(key, value, timeout, version)
+            self._invalidate(namespace, [(key, version)])
+            gen = self._generations.get(namespace)
+        self._local_set(namespace, key, value, timeout, version, gen)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        gens = dict(self._generations)
+        local_keys = [key for key in data if self._get_namespace(key)]
+        existing = self.shared.get_many(local_keys, version=version) \
+            if local_keys else {}
+
+        failed_keys = self.shared.set_many(data, timeout, version)
+
+        overwritten = {}
+        for key in existing:
+            overwritten.setdefault(self._get_namespace(key), []).append(
+                (key, version))
+        for namespace, key_versions in overwritten.iteritems():
+            self._invalidate(namespace, key_versions)
+
+        for key in local_keys:
+            if key in existing or key in (failed_keys or []):
+                continue
+            namespace = self._get_namespace(key)
+            self._local_set(namespace, key, data[key], timeout, version,
+                            gens.get(namespace))
+        return failed_keys
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        namespace = self._get_namespace(key)
+        if namespace:
+            self._invalidate(namespace, [(key, version)])
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        deleted = {}
+        for key in keys:
+            namespace = self._get_namespace(key)
+            if namespace:
+                deleted.setdefault(namespace, []).append((key, version))
+        for namespace, key_versions in deleted.iteritems():
+            self._invalidate(namespace, key_versions)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        namespace = self._get_namespace(key)
+        if namespace:
+            self._invalidate(namespace, [(key, version)])
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._local.clear()
+            self._generations = dict.fromkeys(self._local_key_prefixes, None)
+            self._generations_checked_at = 0
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,87 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Constance backend keeping all settings in a per-process snapshot.
+
+``config.X`` is read on hot paths (middleware, permission checks, library
+list), and the database backend costs a cache lookup or a query each time.
+This backend loads all ``CONSTANCE_CONFIG`` keys with one query into a dict,
+which is replaced as a whole when a setting is saved in any process. Saving
+bumps a version number in cache, every process compares its snapshot with it
+at most every ``CONSTANCE_SNAPSHOT_CHECK_INTERVAL`` seconds.
+
+Example::
+
+    CONSTANCE_BACKEND = 'seahub.base.constance_backends.SnapshotDatabaseBackend'
+"""
+import time
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from constance import settings as constance_settings
+from constance.backends.database import DatabaseBackend
+
+from seahub.base.cache_backends import bump_generation
+
+CONSTANCE_SNAPSHOT_CHECK_INTERVAL = getattr(settings,
+        'CONSTANCE_SNAPSHOT_CHECK_INTERVAL', 1)
+
+CONSTANCE_SNAPSHOT_VERSION_KEY = 'CONSTANCE_SNAPSHOT_VERSION'
+
+class SnapshotDatabaseBackend(DatabaseBackend):
+
+    def __init__(self):
+        super(SnapshotDatabaseBackend, self).__init__()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0
+
+    def _load_snapshot(self):
+        """Return all stored settings, read with one query.
+        """
+        return dict(super(SnapshotDatabaseBackend, self).mget(
+            constance_settings.CONFIG.keys()))
+
+    def _get_snapshot(self):
+        now = time.time()
+        if self._snapshot is not None and \
+                now - self._checked_at < CONSTANCE_SNAPSHOT_CHECK_INTERVAL:
+            return self._snapshot
+
+        version = cache.get(CONSTANCE_SNAPSHOT_VERSION_KEY)
+        if self._snapshot is None or version != self._version:
+            snapshot = self._load_snapshot()
+            with self._lock:
+                self._snapshot = snapshot
+                self._version = version
+
+        self._checked_at = now
+        return self._snapshot
+
+    def _bump_version(self):
+        return bump_generation(cache, CONSTANCE_SNAPSHOT_VERSION_KEY)
+
+    def get(self, key):
+        return self._get_snapshot().get(key)
+
+    def mget(self, keys):
+        snapshot = self._get_snapshot()
+        for key in keys:
+            if key in snapshot:
+                yield key, snapshot[key]
+
+    def set(self, key, value):
+        super(SnapshotDatabaseBackend, self).set(key, value)
+        version = self._bump_version()
+
+        with self._lock:
+            if self._snapshot is not None and self._version is not None and \
+                    version == self._version + 1:
+                # nobody else has saved meanwhile, the snapshot is current
+                snapshot = dict(self._snapshot)
+                snapshot[key] = value
+                self._snapshot = snapshot
+                self._version = version
+            else:
+                self._snapshot = None
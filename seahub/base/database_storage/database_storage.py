@@ -6,7 +6,7 @@
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.core.files.storage import Storage
 from django.core.files import File
-from django.db import connection, transaction
+from django.db import connection, transaction, IntegrityError
 
 import base64
 import hashlib
@@ -174,7 +174,7 @@ class DatabaseStorage(Storage):
                         '%(size_column)s = %%s, %(mtime_column)s = %%s ' + \
                         'WHERE %(name_md5_column)s = %%s'
                 query %= self.__dict__
-                cursor.execute(query, [encoded, size, mtime, name])
+                cursor.execute(query, [encoded, size, mtime, name_md5])
             else:
                 query = 'INSERT INTO %(table)s (%(name_column)s, ' + \
                     '%(name_md5_column)s, %(data_column)s, %(size_column)s, '+ \
@@ -238,4 +238,162 @@ class DatabaseStorage(Storage):
                 "DatabaseStorage file not found: %s" % name)
         
         return row[0]
-    
+
+
+class BinaryDatabaseStorage(DatabaseStorage):
+    """
+    ``DatabaseStorage`` keeping file contents as binary, and only once for
+    files with the same content.
+
+    Contents are stored in ``blob_table`` by their SHA-1, and ``table`` maps
+    file names to the SHA-1 of their content:
+
+        CREATE TABLE <table> (
+            filename TEXT NOT NULL,
+            filename_md5 CHAR(32) NOT NULL PRIMARY KEY,
+            sha1 CHAR(40) NOT NULL,
+            size INTEGER NOT NULL,
+            mtime DATETIME NOT NULL,
+            KEY (sha1)
+        );
+        CREATE TABLE <blob_table> (
+            sha1 CHAR(40) NOT NULL PRIMARY KEY,
+            data MEDIUMBLOB NOT NULL
+        );
+
+    The SHA-1 is also added to urls as ``?v=<sha1>``, so the view serving
+    them can tell the url will always point to the same content.
+    """
+
+    def __init__(self, options):
+        options = dict(options)
+        self.blob_table = options.pop('blob_table', None)
+        self.sha1_column = options.pop('sha1_column', 'sha1')
+        if not self.blob_table:
+            raise ImproperlyConfigured(
+                'BinaryDatabaseStorage missing required option: blob_table')
+
+        super(BinaryDatabaseStorage, self).__init__(options)
+
+    def _open(self, name, mode='rb'):
+        assert mode == 'rb', "DatabaseStorage open mode must be 'rb'."
+
+        info = self.get_file_info(name)
+        if info is None:
+            return None
+
+        inMemFile = StringIO.StringIO(self.read_blob(info[0]))
+        inMemFile.name = name
+        inMemFile.mode = mode
+
+        return File(inMemFile)
+
+    def _save(self, name, content):
+        name = name.replace('\\', '/')
+        self.save_data(name, content.read())
+        return name
+
+    def save_data(self, name, data, mtime=None):
+        """Save ``data`` as file ``name``, replacing the existing one.
+        """
+        name_md5 = hashlib.md5(name).hexdigest()
+        sha1 = hashlib.sha1(data).hexdigest()
+        mtime = value_to_db_datetime(mtime or datetime.today())
+
+        with transaction.atomic(using='default'):
+            cursor = connection.cursor()
+            query = 'SELECT COUNT(*) FROM %(blob_table)s ' + \
+                    'WHERE %(sha1_column)s = %%s'
+            query %= self.__dict__
+            cursor.execute(query, [sha1])
+            if int(cursor.fetchone()[0]) == 0:
+                query = 'INSERT INTO %(blob_table)s (%(sha1_column)s, ' + \
+                        '%(data_column)s) VALUES (%%s, %%s)'
+                query %= self.__dict__
+                try:
+                    # the same content may be saved concurrently
+                    with transaction.atomic(using='default'):
+                        cursor.execute(query, [sha1,
+                                               connection.Database.Binary(data)])
+                except IntegrityError:
+                    pass
+
+            info = self.get_file_info(name)
+            if info is not None:
+                query = 'UPDATE %(table)s SET %(sha1_column)s = %%s, ' + \
+                        '%(size_column)s = %%s, %(mtime_column)s = %%s ' + \
+                        'WHERE %(name_md5_column)s = %%s'
+                query %= self.__dict__
+                cursor.execute(query, [sha1, len(data), mtime, name_md5])
+                if info[0] != sha1:
+                    self._delete_unused_blob(info[0])
+            else:
+                query = 'INSERT INTO %(table)s (%(name_column)s, ' + \
+                    '%(name_md5_column)s, %(sha1_column)s, %(size_column)s, ' + \
+                    '%(mtime_column)s) VALUES (%%s, %%s, %%s, %%s, %%s)'
+                query %= self.__dict__
+                cursor.execute(query, [name, name_md5, sha1, len(data), mtime])
+
+    def _delete_unused_blob(self, sha1):
+        query = 'DELETE FROM %(blob_table)s WHERE %(sha1_column)s = %%s ' + \
+                'AND NOT EXISTS (SELECT 1 FROM %(table)s ' + \
+                'WHERE %(sha1_column)s = %%s)'
+        query %= self.__dict__
+        connection.cursor().execute(query, [sha1, sha1])
+
+    def delete(self, name):
+        info = self.get_file_info(name)
+        if info is None:
+            return
+
+        with transaction.atomic(using='default'):
+            name_md5 = hashlib.md5(name).hexdigest()
+            query = 'DELETE FROM %(table)s WHERE %(name_md5_column)s = %%s'
+            query %= self.__dict__
+            connection.cursor().execute(query, [name_md5])
+            self._delete_unused_blob(info[0])
+
+    def get_file_info(self, name):
+        """Return (sha1, size, mtime) of file ``name``, or None if it does
+        not exist.
+        """
+        name_md5 = hashlib.md5(name).hexdigest()
+        query = 'SELECT %(sha1_column)s, %(size_column)s, %(mtime_column)s ' + \
+                'FROM %(table)s WHERE %(name_md5_column)s = %%s'
+        query %= self.__dict__
+        cursor = connection.cursor()
+        cursor.execute(query, [name_md5])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return row[0], int(row[1]), row[2]
+
+    def read_blob(self, sha1, start=0, length=None):
+        """Return content ``sha1``, or ``length`` bytes of it from
+        ``start``. Only the requested part is read from database.
+        """
+        if start == 0 and length is None:
+            query = 'SELECT %(data_column)s FROM %(blob_table)s ' + \
+                    'WHERE %(sha1_column)s = %%s'
+            params = [sha1]
+        else:
+            query = 'SELECT SUBSTR(%(data_column)s, %%s, %%s) ' + \
+                    'FROM %(blob_table)s WHERE %(sha1_column)s = %%s'
+            params = [start + 1, length, sha1]
+        query %= self.__dict__
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        if row is None:
+            raise ObjectDoesNotExist(
+                "DatabaseStorage content not found: %s" % sha1)
+
+        return str(row[0])
+
+    def url(self, name):
+        url = super(BinaryDatabaseStorage, self).url(name)
+        info = self.get_file_info(name)
+        if info is not None:
+            url += '?v=' + info[0]
+        return url
@@ -5,11 +5,11 @@ from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 
-from seaserv import ccnet_api
-
 from seahub.notifications.models import Notification
 from seahub.notifications.utils import refresh_cache
 from seahub.constants import DEFAULT_ADMIN
+from seahub.auth.identity_cache import get_user_orgs
+from seahub.utils.user_info import start_request_memo, end_request_memo
 
 try:
     from seahub.settings import CLOUD_MODE
@@ -34,7 +34,7 @@ class BaseMiddleware(object):
             request.cloud_mode = True
 
             if MULTI_TENANCY:
-                orgs = ccnet_api.get_orgs_by_user(username)
+                orgs = get_user_orgs(username)
                 if orgs:
                     request.user.org = orgs[0]
         else:
@@ -45,6 +45,18 @@ class BaseMiddleware(object):
     def process_response(self, request, response):
         return response
 
+class UserInfoMemoMiddleware(object):
+    """Memoize user nickname/contact email/avatar lookups within a request.
+    """
+
+    def process_request(self, request):
+        start_request_memo()
+        return None
+
+    def process_response(self, request, response):
+        end_request_memo()
+        return response
+
 class InfobarMiddleware(object):
     """Query info bar close status, and store into request."""
 
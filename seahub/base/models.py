@@ -395,3 +395,15 @@ class RepoSecretKey(models.Model):
     secret_key = models.CharField(max_length=44)
 
     objects = RepoSecretKeyManager()
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from seahub.utils.dir_listing_cache import bump_starred_generation
+
+@receiver(post_save, sender=UserStarredFiles, dispatch_uid="starred_file_saved")
+@receiver(post_delete, sender=UserStarredFiles, dispatch_uid="starred_file_deleted")
+def invalidate_dir_listing_starred(sender, instance, **kwargs):
+    bump_starred_generation(instance.email)
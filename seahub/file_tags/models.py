@@ -91,3 +91,20 @@ class FileTags(models.Model):
             "file_tag_id": self.pk,
             "repo_tag_id": self.repo_tag_id,
         }
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from seahub.utils.dir_listing_cache import bump_repo_generation
+
+@receiver(post_save, sender=FileTags, dispatch_uid="file_tag_saved")
+@receiver(post_delete, sender=FileTags, dispatch_uid="file_tag_deleted")
+def invalidate_dir_listing_file_tags(sender, instance, **kwargs):
+    # repo tag of a deleted file tag is deleted after it, if at all
+    try:
+        repo_id = instance.repo_tag.repo_id
+    except RepoTags.DoesNotExist:
+        return
+    bump_repo_generation(repo_id)
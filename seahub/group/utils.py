@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import re
 import logging
+from django.conf import settings
 from django.core.cache import cache
 
 import seaserv
@@ -13,6 +14,7 @@ from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.avatar.templatetags.avatar_tags import api_avatar_url, \
     get_default_avatar_url
+from seahub.utils.user_info import get_users_info
 
 logger = logging.getLogger(__name__)
 
@@ -122,6 +124,44 @@ def get_group_member_info(request, group_id, email, avatar_size=AVATAR_DEFAULT_S
 
     return member_info
 
+def get_group_members_info(request, group_id, members,
+                           avatar_size=AVATAR_DEFAULT_SIZE):
+    """Return a list of info of ``members`` (from
+    ``ccnet_api.get_group_members``) as ``get_group_member_info`` returns,
+    with names, contact emails, login ids and avatars looked up in batch.
+    """
+    group = ccnet_api.get_group(int(group_id))
+    emails = [m.user_name for m in members]
+    users_info = get_users_info(emails, avatar_size)
+    login_ids = dict(Profile.objects.filter(user__in=emails).values_list(
+        'user', 'login_id'))
+
+    members_info = []
+    for m in members:
+        email = m.user_name
+        user_info = users_info.get(email, {})
+        is_admin = bool(m.is_staff)
+        if email == group.creator_name:
+            role = 'Owner'
+        elif is_admin:
+            role = 'Admin'
+        else:
+            role = 'Member'
+
+        members_info.append({
+            'group_id': group_id,
+            "name": user_info.get('name', ''),
+            'email': email,
+            "contact_email": user_info.get('contact_email', ''),
+            "login_id": login_ids.get(email) or '',
+            "avatar_url": request.build_absolute_uri(
+                user_info.get('avatar_url') or get_default_avatar_url()),
+            "is_admin": is_admin,
+            "role": role,
+        })
+
+    return members_info
+
 GROUP_ID_CACHE_PREFIX = "GROUP_ID_"
 GROUP_ID_CACHE_TIMEOUT = 24 * 60 * 60
 
@@ -142,3 +182,44 @@ def group_id_to_name(group_id):
     cache.set(key, group_name, GROUP_ID_CACHE_TIMEOUT)
 
     return group_name
+
+def group_ids_to_names(group_ids):
+    """Return dict of group id to group name, reading cached names with one
+    cache call and the others from ccnet.
+    """
+    keys = dict((normalize_cache_key(str(group_id), GROUP_ID_CACHE_PREFIX),
+                 group_id) for group_id in set(group_ids))
+    cached = cache.get_many(keys.keys())
+
+    names = {}
+    for key, group_id in keys.iteritems():
+        if cached.get(key):
+            names[group_id] = cached[key]
+        else:
+            names[group_id] = group_id_to_name(group_id)
+
+    return names
+
+USER_GROUP_IDS_CACHE_PREFIX = "USER_GROUP_IDS_"
+# Membership may also change outside seahub, e.g. by LDAP sync.
+USER_GROUP_IDS_CACHE_TIMEOUT = getattr(settings,
+        'USER_GROUP_IDS_CACHE_TIMEOUT', 10 * 60)
+
+def get_user_group_ids(email):
+    """Return set of ids of groups ``email`` is a member of, including
+    ancestors of departments ``email`` is in, as ``is_group_member`` checks.
+    """
+    key = normalize_cache_key(email, USER_GROUP_IDS_CACHE_PREFIX)
+    group_ids = cache.get(key)
+    if group_ids is None:
+        group_ids = set([g.id for g in
+                         ccnet_api.get_groups(email, return_ancestors=True)])
+        cache.set(key, group_ids, USER_GROUP_IDS_CACHE_TIMEOUT)
+
+    return group_ids
+
+def clear_user_group_ids_cache(*emails):
+    """Called after ``emails`` are added to or removed from a group.
+    """
+    cache.delete_many([normalize_cache_key(email, USER_GROUP_IDS_CACHE_PREFIX)
+                       for email in emails])
@@ -0,0 +1,36 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+import time
+import logging
+
+from django.core.management.base import BaseCommand
+
+from seahub.institutions.models import Institution
+from seahub.institutions.utils import compute_institution_totals
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recompute cached space usage and allocated quota of institutions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help='Names of institutions, default is all.')
+
+    def handle(self, *args, **options):
+        institutions = Institution.objects.all()
+        if options['names']:
+            institutions = institutions.filter(name__in=options['names'])
+
+        for inst in institutions:
+            start = time.time()
+            try:
+                usage, allocated = compute_institution_totals(inst)
+            except Exception as e:
+                logger.error(e)
+                self.stderr.write('Failed to recompute %s: %s' % (inst.name, e))
+                continue
+
+            self.stdout.write('%s: space usage %d, allocated quota %d, %.2fs' %
+                              (inst.name, usage, allocated, time.time() - start))
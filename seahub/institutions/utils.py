@@ -1,25 +1,146 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+"""Space usage and allocated quota of institutions.
+
+Both are sums over all members, which takes one rpc per member. Members are
+looked up in batches, with the rpcs of a batch run in a small thread pool,
+and the totals are cached per institution. Allocated quota only changes
+when a member's quota is set or a user joins or leaves the institution, and
+is updated incrementally then. Space usage changes with every upload, so
+its total is only cached for ``INSTITUTION_USAGE_CACHE_TIMEOUT`` seconds.
+
+Totals can be recomputed with ``manage.py recompute_institution_quota``.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
 from seaserv import seafile_api
+from seahub.base.cache_backends import incr_counter
 from seahub.profile.models import Profile
-from seahub.institutions.models import InstitutionQuota
+from seahub.institutions.models import Institution, InstitutionQuota
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+INSTITUTION_QUOTA_BATCH_SIZE = getattr(settings,
+        'INSTITUTION_QUOTA_BATCH_SIZE', 500)
+# Number of threads calling quota/usage rpcs.
+INSTITUTION_QUOTA_WORKERS = getattr(settings, 'INSTITUTION_QUOTA_WORKERS', 4)
+INSTITUTION_USAGE_CACHE_TIMEOUT = getattr(settings,
+        'INSTITUTION_USAGE_CACHE_TIMEOUT', 10 * 60)
+INSTITUTION_QUOTA_CACHE_TIMEOUT = getattr(settings,
+        'INSTITUTION_QUOTA_CACHE_TIMEOUT', 24 * 60 * 60)
+
+INSTITUTION_USAGE_CACHE_PREFIX = 'INSTITUTION_USAGE_'
+INSTITUTION_QUOTA_CACHE_PREFIX = 'INSTITUTION_ALLOCATED_QUOTA_'
+
+def _usage_cache_key(inst):
+    return '%s%d' % (INSTITUTION_USAGE_CACHE_PREFIX, inst.pk)
+
+def _quota_cache_key(inst):
+    return '%s%d' % (INSTITUTION_QUOTA_CACHE_PREFIX, inst.pk)
+
+def _get_usage_and_quota(email):
+    return (seafile_api.get_user_self_usage(email),
+            seafile_api.get_user_quota(email))
+
+def compute_institution_totals(inst):
+    """Return (space usage, allocated quota) of all members of ``inst``,
+    and cache them.
+    """
+    emails = list(Profile.objects.filter(institution=inst.name).values_list(
+        'user', flat=True))
+
+    usage = allocated = 0
+    executor = ThreadPoolExecutor(INSTITUTION_QUOTA_WORKERS)
+    try:
+        for i in range(0, len(emails), INSTITUTION_QUOTA_BATCH_SIZE):
+            batch = emails[i:i + INSTITUTION_QUOTA_BATCH_SIZE]
+            for user_usage, user_quota in executor.map(_get_usage_and_quota,
+                                                       batch):
+                usage += user_usage
+                allocated += user_quota
+    finally:
+        executor.shutdown(wait=False)
 
+    cache.set(_usage_cache_key(inst), usage, INSTITUTION_USAGE_CACHE_TIMEOUT)
+    cache.set(_quota_cache_key(inst), allocated,
+              INSTITUTION_QUOTA_CACHE_TIMEOUT)
+    return usage, allocated
 
 def get_institution_space_usage(inst):
-    # TODO: need to refactor
-    usernames = [x.user for x in Profile.objects.filter(institution=inst.name)]
-    total = 0
-    for user in usernames:
-        total += seafile_api.get_user_self_usage(user)
-    return total
+    usage = cache.get(_usage_cache_key(inst))
+    if usage is None:
+        usage, allocated = compute_institution_totals(inst)
+    return usage
+
+def get_institution_allocated_quota(inst):
+    allocated = cache.get(_quota_cache_key(inst))
+    if allocated is None:
+        usage, allocated = compute_institution_totals(inst)
+    return allocated
 
 def get_institution_available_quota(inst):
     inst_quota = InstitutionQuota.objects.get_or_none(institution=inst)
     if inst_quota is None:
         return None
 
-    usernames = [x.user for x in Profile.objects.filter(institution=inst.name)]
-    allocated = 0
-    for user in usernames:
-        allocated += seafile_api.get_user_quota(user)
-
+    allocated = get_institution_allocated_quota(inst)
     return 0 if allocated >= inst_quota else inst_quota - allocated
+
+def _get_institution(name):
+    if not name:
+        return None
+    return Institution.objects.filter(name=name).first()
+
+def _add_to_cached_total(key, delta, timeout):
+    # a total not cached is left to be computed
+    incr_counter(cache, key, delta, timeout, initial=None)
+
+def update_user_quota(email, quota):
+    """Set quota of ``email``, and update allocated quota of the
+    institution of ``email``.
+    """
+    profile = Profile.objects.get_profile_by_user(email)
+    inst = _get_institution(profile.institution) if profile else None
+
+    old_quota = None
+    if inst is not None and cache.get(_quota_cache_key(inst)) is not None:
+        old_quota = seafile_api.get_user_quota(email)
+
+    seafile_api.set_user_quota(email, quota)
+
+    if old_quota is not None:
+        _add_to_cached_total(_quota_cache_key(inst), quota - old_quota,
+                             INSTITUTION_QUOTA_CACHE_TIMEOUT)
+
+def institution_member_changed(email, old_name, new_name):
+    """Update totals of institutions ``email`` left (``old_name``) and
+    joined (``new_name``).
+    """
+    changes = []
+    for name, sign in ((old_name, -1), (new_name, 1)):
+        inst = _get_institution(name)
+        if inst is not None and cache.get_many([_usage_cache_key(inst),
+                                                _quota_cache_key(inst)]):
+            changes.append((inst, sign))
+    if not changes:
+        # nothing cached to update
+        return
+
+    try:
+        usage, quota = _get_usage_and_quota(email)
+    except Exception as e:
+        # e.g. user is deleted, totals will be recomputed
+        logger.warning(e)
+        for inst, sign in changes:
+            cache.delete_many([_usage_cache_key(inst), _quota_cache_key(inst)])
+        return
+
+    for inst, sign in changes:
+        _add_to_cached_total(_usage_cache_key(inst), sign * usage,
+                             INSTITUTION_USAGE_CACHE_TIMEOUT)
+        _add_to_cached_total(_quota_cache_key(inst), sign * quota,
+                             INSTITUTION_QUOTA_CACHE_TIMEOUT)
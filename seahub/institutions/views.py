@@ -18,7 +18,8 @@ from seahub.base.decorators import require_POST
 from seahub.base.models import UserLastLogin
 from seahub.institutions.decorators import (inst_admin_required,
                                             inst_admin_can_manage_user)
-from seahub.institutions.utils import get_institution_available_quota
+from seahub.institutions.utils import get_institution_available_quota, \
+    update_user_quota
 from seahub.profile.models import Profile, DetailedProfile
 from seahub.utils import is_valid_username
 from seahub.utils.rpc import mute_seafile_api
@@ -212,7 +213,7 @@ def user_set_quota(request, email):
                             (available_quota / 10 ** 6))
         return HttpResponse(json.dumps(result), status=400, content_type=content_type)
 
-    seafile_api.set_user_quota(email, quota)
+    update_user_quota(email, quota)
 
     return HttpResponse(json.dumps({'success': True}), content_type=content_type)
 
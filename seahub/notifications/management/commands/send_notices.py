@@ -5,9 +5,16 @@ import logging
 import json
 import os
 import re
+import time
+import threading
+from Queue import Queue
+from collections import OrderedDict
 
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
 from django.core.management.base import BaseCommand
 from django.core.urlresolvers import reverse
+from django.template import loader
 from django.utils.html import escape
 from django.utils import translation
 from django.utils.translation import ugettext as _
@@ -15,7 +22,8 @@ from django.utils.translation import ugettext as _
 from seaserv import seafile_api, ccnet_api
 from seahub.base.models import CommandsLastCheck
 from seahub.notifications.models import UserNotification
-from seahub.utils import send_html_email, get_site_scheme_and_netloc
+from seahub.utils import get_html_email_base_context, get_site_scheme_and_netloc
+from seahub.utils.user_info import emails2nicknames
 from seahub.avatar.templatetags.avatar_tags import avatar
 from seahub.avatar.util import get_default_avatar_url
 from seahub.base.templatetags.seahub_tags import email2nickname
@@ -27,12 +35,91 @@ from seahub.utils import get_site_name
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+PROGRESS_INTERVAL = 100
+
+
+class MailSender(object):
+    """Send emails from ``workers`` threads, each reusing one SMTP
+    connection.
+    """
+    def __init__(self, workers):
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._queue = Queue(maxsize=workers * 10)
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._work)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def send(self, msg):
+        self._queue.put(msg)
+
+    def close(self):
+        """Wait until all queued emails are sent.
+        """
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    def _work(self):
+        connection = None
+        while True:
+            msg = self._queue.get()
+            if msg is None:
+                break
+
+            to_user = msg.to[0]
+            try:
+                if connection is None:
+                    connection = get_connection()
+                    connection.open()
+                connection.send_messages([msg])
+                logger.info('Successfully sent email to %s' % to_user)
+                with self._lock:
+                    self.sent += 1
+            except Exception as e:
+                logger.error('Failed to send email to %s, error detail: %s' % (to_user, e))
+                with self._lock:
+                    self.failed += 1
+                # connection may be broken, open a new one for next email
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                connection = None
+
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning(e)
+
 
 class Command(BaseCommand):
     help = 'Send Email notifications to user if he/she has an unread notices every period of seconds .'
     label = "notifications_send_notices"
 
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self.workers = 1
+        self._repos = {}
+        self._groups = {}
+        self._nicknames = {}
+        self._avatar_srcs = {}
+        self._languages = {}
+        self._contact_emails = {}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='number of threads sending emails')
+
     def handle(self, *args, **options):
+        self.workers = max(options.get('workers') or 1, 1)
         logger.debug('Start sending user notices...')
         self.do_action()
         logger.debug('Finish sending user notices.\n')
@@ -44,12 +131,19 @@ class Command(BaseCommand):
         return re.sub(pattern, repl, img_tag)
 
     def get_avatar_src(self, username, default_size=32):
+        key = (username, default_size)
+        if key in self._avatar_srcs:
+            return self._avatar_srcs[key]
+
         avatar_img = self.get_avatar(username, default_size)
         m = re.search('<img src="(.*?)".*', avatar_img)
         if m:
-            return m.group(1)
+            src = m.group(1)
         else:
-            return ''
+            src = ''
+
+        self._avatar_srcs[key] = src
+        return src
 
     def get_default_avatar(self, default_size=32):
         # user default avatar
@@ -60,21 +154,87 @@ class Command(BaseCommand):
         return re.sub(pattern, repl, img_tag)
 
     def get_default_avatar_src(self, default_size=32):
+        key = (None, default_size)
+        if key in self._avatar_srcs:
+            return self._avatar_srcs[key]
+
         avatar_img = self.get_default_avatar(default_size)
         m = re.search('<img src="(.*?)".*', avatar_img)
         if m:
-            return m.group(1)
+            src = m.group(1)
         else:
-            return ''
+            src = ''
+
+        self._avatar_srcs[key] = src
+        return src
+
+    ########## prefetched data
+    def get_repo(self, repo_id):
+        if repo_id not in self._repos:
+            self._repos[repo_id] = seafile_api.get_repo(repo_id)
+        return self._repos[repo_id]
+
+    def get_group(self, group_id):
+        group_id = int(group_id)
+        if group_id not in self._groups:
+            self._groups[group_id] = ccnet_api.get_group(group_id)
+        return self._groups[group_id]
+
+    def get_nickname(self, username):
+        if username not in self._nicknames:
+            self._nicknames[username] = email2nickname(username)
+        return self._nicknames[username]
+
+    def prefetch(self, notices):
+        """Look up every repo, group, sender and recipient referenced by
+        ``notices`` once.
+        """
+        repo_ids = set()
+        group_ids = set()
+        senders = set()
+        recipients = set()
+        for notice in notices:
+            recipients.add(notice.to_user)
+            d = notice.detail_dict
+            if d.get('repo_id'):
+                repo_ids.add(d['repo_id'])
+            if d.get('group_id'):
+                group_ids.add(int(d['group_id']))
+            for key in ('msg_from', 'share_from', 'username', 'group_staff'):
+                if d.get(key):
+                    senders.add(d[key])
+
+        # errors are logged again, per notice, when formatting
+        for repo_id in repo_ids:
+            try:
+                self.get_repo(repo_id)
+            except Exception as e:
+                logger.error(e)
+        for group_id in group_ids:
+            try:
+                self.get_group(group_id)
+            except Exception as e:
+                logger.error(e)
+
+        self._nicknames.update(emails2nicknames(senders))
+        for username in senders:
+            self.get_avatar_src(username)
+        self.get_default_avatar_src()
+
+        for p in Profile.objects.filter(user__in=recipients):
+            if p.lang_code:
+                self._languages[p.user] = p.lang_code
+            if p.contact_email:
+                self._contact_emails[p.user] = p.contact_email
 
     def format_group_message(self, notice):
         d = notice.group_message_detail_to_dict()
         group_id = d['group_id']
         message = d['message']
-        group = ccnet_api.get_group(int(group_id))
+        group = self.get_group(int(group_id))
 
         notice.group_url = HASH_URLS['GROUP_DISCUSS'] % {'group_id': group.id}
-        notice.notice_from = escape(email2nickname(d['msg_from']))
+        notice.notice_from = escape(self.get_nickname(d['msg_from']))
         notice.group_name = group.group_name
         notice.avatar_src = self.get_avatar_src(d['msg_from'])
         notice.grp_msg = message
@@ -83,7 +243,7 @@ class Command(BaseCommand):
     def format_repo_share_msg(self, notice):
         d = json.loads(notice.detail)
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
+        repo = self.get_repo(repo_id)
         path = d['path']
         org_id = d.get('org_id', None)
         if path == '/':
@@ -100,7 +260,7 @@ class Command(BaseCommand):
 
         repo_url = reverse('lib_view', args=[repo_id, repo.name, ''])
         notice.repo_url = repo_url
-        notice.notice_from = escape(email2nickname(d['share_from']))
+        notice.notice_from = escape(self.get_nickname(d['share_from']))
         notice.repo_name = repo.name
         notice.avatar_src = self.get_avatar_src(d['share_from'])
         notice.shared_type = shared_type
@@ -111,9 +271,9 @@ class Command(BaseCommand):
         d = json.loads(notice.detail)
 
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
+        repo = self.get_repo(repo_id)
         group_id = d['group_id']
-        group = ccnet_api.get_group(group_id)
+        group = self.get_group(group_id)
         org_id = d.get('org_id', None)
 
         path = d['path']
@@ -131,7 +291,7 @@ class Command(BaseCommand):
 
         repo_url = reverse('lib_view', args=[repo_id, repo.name, ''])
         notice.repo_url = repo_url
-        notice.notice_from = escape(email2nickname(d['share_from']))
+        notice.notice_from = escape(self.get_nickname(d['share_from']))
         notice.repo_name = repo.name
         notice.avatar_src = self.get_avatar_src(d['share_from'])
         notice.group_url = reverse('group', args=[group.id])
@@ -145,7 +305,7 @@ class Command(BaseCommand):
 
         file_name = d['file_name']
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
+        repo = self.get_repo(repo_id)
         uploaded_to = d['uploaded_to'].rstrip('/')
         file_path = uploaded_to + '/' + file_name
         file_link = reverse('view_lib_file', args=[repo_id, file_path])
@@ -166,12 +326,12 @@ class Command(BaseCommand):
         group_id = d['group_id']
         join_request_msg = d['join_request_msg']
 
-        group = ccnet_api.get_group(group_id)
+        group = self.get_group(group_id)
 
         notice.grpjoin_user_profile_url = reverse('user_profile',
                                                   args=[username])
         notice.grpjoin_group_url = HASH_URLS['GROUP_MEMBERS'] % {'group_id': group_id}
-        notice.notice_from = escape(email2nickname(username))
+        notice.notice_from = escape(self.get_nickname(username))
         notice.grpjoin_group_name = group.group_name
         notice.grpjoin_request_msg = join_request_msg
         notice.avatar_src = self.get_avatar_src(username)
@@ -182,9 +342,9 @@ class Command(BaseCommand):
         group_staff = d['group_staff']
         group_id = d['group_id']
 
-        group = ccnet_api.get_group(group_id)
+        group = self.get_group(group_id)
 
-        notice.notice_from = escape(email2nickname(group_staff))
+        notice.notice_from = escape(self.get_nickname(group_staff))
         notice.avatar_src = self.get_avatar_src(group_staff)
         notice.group_staff_profile_url = reverse('user_profile',
                                                   args=[group_staff])
@@ -209,7 +369,7 @@ class Command(BaseCommand):
         try:
             inv = Invitation.objects.get(pk=inv_id)
         except Invitation.DoesNotExist:
-            self.delete()
+            notice.delete()
             return None
 
         notice.inv_accepter = inv.accepter
@@ -218,7 +378,12 @@ class Command(BaseCommand):
         return notice
 
     def get_user_language(self, username):
-        return Profile.objects.get_user_language(username)
+        if username in self._languages:
+            return self._languages[username]
+        return settings.LANGUAGE_CODE
+
+    def get_contact_email(self, username):
+        return self._contact_emails.get(username, username)
 
     def do_action(self):
         now = datetime.datetime.now()
@@ -241,48 +406,82 @@ class Command(BaseCommand):
             logger.debug('Create new last check time: %s' % now)
             CommandsLastCheck(command_type=self.label, last_check=now).save()
 
-        email_ctx = {}
+        start = time.time()
+        notices_by_user = OrderedDict()
+        all_notices = []
         for notice in unseen_notices:
-            if notice.to_user in email_ctx:
-                email_ctx[notice.to_user] += 1
-            else:
-                email_ctx[notice.to_user] = 1
-
-        for to_user, count in email_ctx.items():
-            # save current language
-            cur_language = translation.get_language()
-
-            # get and active user language
-            user_language = self.get_user_language(to_user)
-            translation.activate(user_language)
-            logger.debug('Set language code to %s for user: %s' % (user_language, to_user))
-            self.stdout.write('[%s] Set language code to %s' % (
-                str(datetime.datetime.now()), user_language))
-
-            notices = []
-            for notice in unseen_notices:
-                logger.info('Processing unseen notice: [%s]' % (notice))
-
-                d = json.loads(notice.detail)
-
-                repo_id = d.get('repo_id', None)
-                group_id = d.get('group_id', None)
-                try:
-                    if repo_id and not seafile_api.get_repo(repo_id):
-                        notice.delete()
-                        continue
-
-                    if group_id and not ccnet_api.get_group(group_id):
-                        notice.delete()
-                        continue
-                except Exception as e:
-                    logger.error(e)
+            try:
+                notice.detail_dict = json.loads(notice.detail)
+            except ValueError as e:
+                logger.error(e)
+                continue
+
+            notices_by_user.setdefault(notice.to_user, []).append(notice)
+            all_notices.append(notice)
+
+        if not all_notices:
+            return
+
+        self.prefetch(all_notices)
+        self.write_progress('Prefetched data of %d notices to %d users in %.1fs' % (
+            len(all_notices), len(notices_by_user), time.time() - start))
+
+        template = loader.get_template('notifications/notice_email.html')
+        base_context = get_html_email_base_context()
+        sender = MailSender(self.workers)
+
+        # save current language
+        cur_language = translation.get_language()
+        try:
+            for i, (to_user, user_notices) in enumerate(notices_by_user.iteritems()):
+                notices = self.format_user_notices(user_notices)
+                if notices:
+                    # get and active user language
+                    user_language = self.get_user_language(to_user)
+                    translation.activate(user_language)
+                    logger.debug('Set language code to %s for user: %s' % (user_language, to_user))
+
+                    contact_email = self.get_contact_email(to_user)
+                    c = dict(base_context)
+                    c.update({
+                        'to_user': contact_email,  # use contact email if any
+                        'notice_count': len(user_notices),
+                        'notices': notices,
+                    })
+                    msg = EmailMessage(_('New notice on %s') % get_site_name(),
+                                       template.render(c), None, [contact_email])
+                    msg.content_subtype = "html"
+                    sender.send(msg)
+
+                if (i + 1) % PROGRESS_INTERVAL == 0:
+                    self.write_progress('Processed %d/%d users, sent %d, failed %d' % (
+                        i + 1, len(notices_by_user), sender.sent, sender.failed))
+        finally:
+            # restore current language
+            translation.activate(cur_language)
+            sender.close()
+
+        self.write_progress('Sent %d emails, %d failed, to %d users in %.1fs' % (
+            sender.sent, sender.failed, len(notices_by_user), time.time() - start))
+
+    def format_user_notices(self, user_notices):
+        notices = []
+        for notice in user_notices:
+            logger.info('Processing unseen notice: [%s]' % (notice))
+
+            d = notice.detail_dict
+            repo_id = d.get('repo_id', None)
+            group_id = d.get('group_id', None)
+            try:
+                if repo_id and not self.get_repo(repo_id):
+                    notice.delete()
                     continue
 
-                if notice.to_user != to_user:
+                if group_id and not self.get_group(group_id):
+                    notice.delete()
                     continue
 
-                elif notice.is_group_msg():
+                if notice.is_group_msg():
                     notice = self.format_group_message(notice)
 
                 elif notice.is_repo_share_msg():
@@ -305,33 +504,17 @@ class Command(BaseCommand):
 
                 elif notice.is_guest_invitation_accepted_msg():
                     notice = self.format_guest_invitation_accepted_msg(notice)
+            except Exception as e:
+                logger.error(e)
+                continue
 
-                if notice is None:
-                    continue
-
-                notices.append(notice)
-
-            if not notices:
+            if notice is None:
                 continue
 
-            contact_email = Profile.objects.get_contact_email_by_user(to_user)
-            to_user = contact_email  # use contact email if any
-            c = {
-                'to_user': to_user,
-                'notice_count': count,
-                'notices': notices,
-                }
+            notices.append(notice)
 
-            try:
-                send_html_email(_('New notice on %s') % get_site_name(),
-                                'notifications/notice_email.html', c,
-                                None, [to_user])
+        return notices
 
-                logger.info('Successfully sent email to %s' % to_user)
-                self.stdout.write('[%s] Successfully sent email to %s' % (str(datetime.datetime.now()), to_user))
-            except Exception as e:
-                logger.error('Failed to send email to %s, error detail: %s' % (to_user, e))
-                self.stderr.write('[%s] Failed to send email to %s, error detail: %s' % (str(datetime.datetime.now()), to_user, e))
-
-            # restore current language
-            translation.activate(cur_language)
+    def write_progress(self, msg):
+        logger.info(msg)
+        self.stdout.write('[%s] %s' % (str(datetime.datetime.now()), msg))
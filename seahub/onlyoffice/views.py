@@ -11,6 +11,8 @@ from seaserv import seafile_api
 
 from seahub.onlyoffice.settings import VERIFY_ONLYOFFICE_CERTIFICATE
 from seahub.utils import gen_inner_file_upload_url
+from seahub.utils.file_transfer import TransferStats, ChunkIterReader, \
+    post_file_stream, FILE_TRANSFER_CHUNK_SIZE
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -77,7 +79,8 @@ def onlyoffice_editor_callback(request):
         # Defines the link to the edited document to be saved with the document storage service.
         # The link is present when the status value is equal to 2 or 3 only.
         url = post_data.get('url')
-        onlyoffice_resp = requests.get(url, verify=VERIFY_ONLYOFFICE_CERTIFICATE)
+        onlyoffice_resp = requests.get(url, verify=VERIFY_ONLYOFFICE_CERTIFICATE,
+                stream=True)
         if not onlyoffice_resp:
             logger.error('[OnlyOffice] No response from file content url.')
             return HttpResponse('{"error": 0}')
@@ -98,15 +101,24 @@ def onlyoffice_editor_callback(request):
             logger.error('[OnlyOffice] No fileserver access token.')
             return HttpResponse('{"error": 0}')
 
-        # get file content
-        files = {
-            'file': onlyoffice_resp.content,
+        # get file size, content may be compressed when transferring
+        file_size = onlyoffice_resp.headers.get('Content-Length')
+        if file_size and not onlyoffice_resp.headers.get('Content-Encoding'):
+            file_size = int(file_size)
+        else:
+            file_size = None
+
+        # update file, pass file content from OnlyOffice to fileserver in chunks
+        fields = {
             'file_name': os.path.basename(file_path),
             'target_file': file_path,
         }
+        file_content = ChunkIterReader(
+                onlyoffice_resp.iter_content(FILE_TRANSFER_CHUNK_SIZE))
+        stats = TransferStats('OnlyOffice update file %s' % file_path)
 
-        # update file
         update_url = gen_inner_file_upload_url('update-api', update_token)
-        requests.post(update_url, files=files)
+        post_file_stream(update_url, fields, 'file', file_content, file_size,
+                stats)
 
     return HttpResponse('{"error": 0}')
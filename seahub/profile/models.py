@@ -216,7 +216,7 @@ class DetailedProfile(models.Model):
 
 
 ########## signal handlers
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete
 from .utils import refresh_cache
 
 @receiver(user_registered)
@@ -234,6 +234,31 @@ def update_profile_cache(sender, instance, **kwargs):
     """
     refresh_cache(instance.user)
 
+@receiver(post_save, sender=Profile, dispatch_uid="update_user_search_index")
+@receiver(post_delete, sender=Profile, dispatch_uid="update_user_search_index")
+def update_user_search_index(sender, instance, **kwargs):
+    from seahub.utils.user_search_index import user_search_index_changed
+    user_search_index_changed(instance.user)
+
+@receiver(post_init, sender=Profile, dispatch_uid="remember_profile_institution")
+def remember_profile_institution(sender, instance, **kwargs):
+    # read ``__dict__`` so deferred field is not loaded
+    instance._saved_institution = instance.__dict__.get('institution')
+
+@receiver(post_save, sender=Profile, dispatch_uid="update_institution_totals")
+@receiver(post_delete, sender=Profile, dispatch_uid="update_institution_totals")
+def update_institution_totals(sender, instance, **kwargs):
+    old_name = getattr(instance, '_saved_institution', None)
+    new_name = instance.__dict__.get('institution')
+    if kwargs.get('signal') is post_delete:
+        old_name, new_name = new_name, None
+    elif new_name is None or new_name == old_name:
+        return
+
+    from seahub.institutions.utils import institution_member_changed
+    institution_member_changed(instance.user, old_name, new_name)
+    instance._saved_institution = new_name
+
 @receiver(institution_deleted)
 def remove_user_for_inst_deleted(sender, **kwargs):
     inst_name = kwargs.get("inst_name", "")
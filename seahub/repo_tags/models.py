@@ -52,3 +52,15 @@ class RepoTags(models.Model):
             "tag_name": self.name,
             "tag_color": self.color,
         }
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from seahub.utils.dir_listing_cache import bump_repo_generation
+
+@receiver(post_save, sender=RepoTags, dispatch_uid="repo_tag_saved")
+@receiver(post_delete, sender=RepoTags, dispatch_uid="repo_tag_deleted")
+def invalidate_dir_listing_repo_tags(sender, instance, **kwargs):
+    bump_repo_generation(instance.repo_id)
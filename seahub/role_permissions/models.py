@@ -29,3 +29,15 @@ class AdminRole(models.Model):
     role = models.CharField(max_length=255)
 
     objects = AdminRoleManager()
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from seahub.auth.identity_cache import invalidate_user_identity
+
+@receiver(post_save, sender=AdminRole, dispatch_uid="admin_role_saved")
+@receiver(post_delete, sender=AdminRole, dispatch_uid="admin_role_deleted")
+def invalidate_admin_role_cache(sender, instance, **kwargs):
+    invalidate_user_identity(instance.email)
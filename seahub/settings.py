@@ -119,6 +119,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     'seahub.auth.middleware.AuthenticationMiddleware',
     'seahub.base.middleware.BaseMiddleware',
+    'seahub.base.middleware.UserInfoMemoMiddleware',
     'seahub.base.middleware.InfobarMiddleware',
     'seahub.password_session.middleware.CheckPasswordHash',
     'seahub.base.middleware.ForcePasswdChangeMiddleware',
@@ -271,7 +272,7 @@ STORAGE_CLASS_MAPPING_POLICY = 'USER_SELECT'
 
 # Enable or disable constance(web settings).
 ENABLE_SETTINGS_VIA_WEB = True
-CONSTANCE_BACKEND = 'constance.backends.database.DatabaseBackend'
+CONSTANCE_BACKEND = 'seahub.base.constance_backends.SnapshotDatabaseBackend'
 CONSTANCE_DATABASE_CACHE_BACKEND = 'default'
 
 AUTHENTICATION_BACKENDS = (
@@ -443,6 +444,7 @@ TEXT_PREVIEW_EXT = """ac, am, bat, c, cc, cmake, cpp, cs, css, diff, el, h, html
 
 # Common settings(file extension, storage) for avatar and group avatar.
 AVATAR_FILE_STORAGE = '' # Replace with 'seahub.base.database_storage.DatabaseStorage' if save avatar files to database
+# or 'seahub.base.database_storage.BinaryDatabaseStorage' to save them as binary, see avatar/sql/migration.md
 AVATAR_ALLOWED_FILE_EXTS = ('.jpg', '.png', '.jpeg', '.gif')
 # Avatar
 AVATAR_STORAGE_DIR = 'avatars'
@@ -477,7 +479,18 @@ if 'win32' in sys.platform:
         install_topdir = os.path.join(CCNET_CONF_PATH, '..')
 
 CACHES = {
+    # Keep hot, long-lived keys (nicknames, avatars, pinyin, ...) in process
+    # memory in front of the shared cache, see seahub/base/cache_backends.py
     'default': {
+        'BACKEND': 'seahub.base.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 300,
+        }
+    },
+
+    'shared': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
         'LOCATION': os.path.join(CACHE_DIR, 'seahub_cache'),
         'OPTIONS': {
@@ -689,6 +702,10 @@ THUMBNAIL_EXTENSION = 'png'
 THUMBNAIL_DEFAULT_SIZE = 48
 THUMBNAIL_SIZE_FOR_GRID = 192
 THUMBNAIL_SIZE_FOR_ORIGINAL = 1024
+# sizes created together, from one decoding of the image, when any
+# thumbnail of an image is requested
+THUMBNAIL_SIZES = [THUMBNAIL_DEFAULT_SIZE, 96, THUMBNAIL_SIZE_FOR_GRID,
+                   THUMBNAIL_SIZE_FOR_ORIGINAL]
 
 # size(MB) limit for generate thumbnail
 THUMBNAIL_IMAGE_SIZE_LIMIT = 30
@@ -0,0 +1,202 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Render image thumbnails in a pool of worker processes.
+
+A job is identified by ``(file_id, size)``. Concurrent requests for the same
+thumbnail, in this process, share one job; other seahub processes are kept
+from rendering it again by a marker in cache, they wait for the thumbnail
+file to show up instead.
+
+Preparing a job (checking the file and getting a fileserver token) is done in
+a small thread pool, downloading and decoding the image in the process pool,
+so neither blocks the request that submitted it. A request waiting for a
+thumbnail still queued, e.g. behind thumbnails prefetched by a dir listing,
+prepares it in its own thread instead.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, \
+    ProcessPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seaserv import seafile_api
+
+from seahub.utils import gen_inner_file_get_url, get_file_type_and_ext
+from seahub.utils.file_types import IMAGE
+from seahub.settings import THUMBNAIL_IMAGE_SIZE_LIMIT
+from seahub.thumbnail.utils import create_image_thumbnail, \
+    get_thumbnail_image_path
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Number of worker processes rendering thumbnails, 0 to render them in the
+# thread that prepares the job.
+THUMBNAIL_WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+# Seconds a request waits for its thumbnail before giving up.
+THUMBNAIL_JOB_WAIT_TIMEOUT = getattr(settings, 'THUMBNAIL_JOB_WAIT_TIMEOUT', 30)
+# Max number of thumbnails queued by one dir listing.
+THUMBNAIL_PREFETCH_LIMIT = getattr(settings, 'THUMBNAIL_PREFETCH_LIMIT', 100)
+
+THUMBNAIL_JOB_CACHE_PREFIX = 'THUMBNAIL_JOB_'
+THUMBNAIL_JOB_CACHE_TIMEOUT = 120
+
+TIMED_OUT = (False, 500)
+
+_lock = threading.RLock()
+_jobs = {}
+_executors = {}
+
+def _get_executors():
+    """Return (thread pool, process pool) of current process.
+
+    Pools are created lazily and again after fork, since gunicorn workers
+    are forked from a master which may have imported this module.
+    """
+    pid = os.getpid()
+    if _executors.get('pid') != pid:
+        _jobs.clear()
+        _executors['pid'] = pid
+        _executors['threads'] = ThreadPoolExecutor(max(THUMBNAIL_WORKERS, 1) * 2)
+        _executors['processes'] = ProcessPoolExecutor(THUMBNAIL_WORKERS) \
+            if THUMBNAIL_WORKERS > 0 else None
+
+    return _executors['threads'], _executors['processes']
+
+def can_render_in_pool(file_name, file_size=None):
+    """Whether thumbnail of ``file_name`` is rendered by the worker pool.
+
+    Videos, xmind and psd files are still handled by ``generate_thumbnail``.
+    """
+    filetype, fileext = get_file_type_and_ext(file_name)
+    if filetype != IMAGE or fileext.lower() == 'psd':
+        return False
+
+    if file_size is not None and \
+            file_size > THUMBNAIL_IMAGE_SIZE_LIMIT * 1024**2:
+        return False
+
+    return True
+
+def _job_cache_key(file_id, size):
+    return '%s%s_%s' % (THUMBNAIL_JOB_CACHE_PREFIX, file_id, size)
+
+def _wait_for_file(thumbnail_file, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(thumbnail_file):
+            return (True, 200)
+        time.sleep(0.2)
+
+    return (True, 200) if os.path.exists(thumbnail_file) else TIMED_OUT
+
+def _run_job(repo_id, file_id, path, size):
+    thumbnail_file = get_thumbnail_image_path(file_id, size)
+    if os.path.exists(thumbnail_file):
+        return (True, 200)
+
+    cache_key = _job_cache_key(file_id, size)
+    if not cache.add(cache_key, os.getpid(), THUMBNAIL_JOB_CACHE_TIMEOUT):
+        # rendered by another process
+        return _wait_for_file(thumbnail_file, THUMBNAIL_JOB_WAIT_TIMEOUT)
+
+    try:
+        token = seafile_api.get_fileserver_access_token(repo_id,
+                file_id, 'view', '', use_onetime=True)
+        if not token:
+            return (False, 500)
+
+        inner_path = gen_inner_file_get_url(token, os.path.basename(path))
+        processes = _get_executors()[1]
+        if processes is None:
+            ret = create_image_thumbnail(inner_path, file_id, size)
+        else:
+            ret = processes.submit(create_image_thumbnail, inner_path,
+                                   file_id, size).result()
+        return ret
+    except Exception as e:
+        logger.error(e)
+        return (False, 500)
+    finally:
+        cache.delete(cache_key)
+
+def submit_thumbnail_job(repo_id, file_id, path, size):
+    """Queue thumbnail of ``file_id`` for rendering, return its future.
+
+    The thumbnail may already exist, the future then resolves right away.
+    """
+    key = (file_id, int(size))
+    with _lock:
+        threads = _get_executors()[0]
+        future = _jobs.get(key)
+        if future is None:
+            future = threads.submit(_run_job, repo_id, file_id, path, int(size))
+            _jobs[key] = future
+            future.add_done_callback(lambda f: _remove_job(key, f))
+
+    return future
+
+def _remove_job(key, future):
+    with _lock:
+        if _jobs.get(key) is future:
+            del _jobs[key]
+
+def _run_queued_job_now(repo_id, file_id, path, size):
+    """Run job of ``file_id`` in this thread if it is still queued, and
+    return its new future, or None if it is already running or done.
+    """
+    key = (file_id, int(size))
+    with _lock:
+        future = _jobs.get(key)
+        if future is None or not future.cancel():
+            return None
+        future = Future()
+        _jobs[key] = future
+
+    try:
+        future.set_result(_run_job(repo_id, file_id, path, int(size)))
+    finally:
+        _remove_job(key, future)
+    return future
+
+def run_thumbnail_job(repo_id, file_id, path, size,
+                      timeout=THUMBNAIL_JOB_WAIT_TIMEOUT):
+    """Render thumbnail of ``file_id`` and wait for it at most ``timeout``
+    seconds.
+
+    Return (success, status) like ``generate_thumbnail``, status is 500 if
+    the thumbnail is not rendered in time.
+    """
+    future = submit_thumbnail_job(repo_id, file_id, path, size)
+    future = _run_queued_job_now(repo_id, file_id, path, size) or future
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        logger.warning('Thumbnail of %s not rendered in %s seconds.' %
+                       (file_id, timeout))
+        return TIMED_OUT
+    except Exception as e:
+        logger.error(e)
+        return (False, 500)
+
+def prefetch_thumbnails(repo_id, files, size):
+    """Queue thumbnails of ``files``, a list of (file_id, path, file_size),
+    which do not exist yet. Do not wait for them.
+
+    Whether a thumbnail exists is checked again by the job.
+    """
+    count = 0
+    for file_id, path, file_size in files:
+        if count >= THUMBNAIL_PREFETCH_LIMIT:
+            break
+
+        if not can_render_in_pool(os.path.basename(path), file_size):
+            continue
+
+        submit_thumbnail_job(repo_id, file_id, path, size)
+        count += 1
+
+    return count
@@ -0,0 +1,46 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+from django.core.management.base import BaseCommand, CommandError
+
+from seahub.thumbnail.store import migrate_legacy_layout, evict, get_stats, \
+    THUMBNAIL_STORE_MAX_BYTES
+
+
+class Command(BaseCommand):
+    help = "Maintain thumbnail store: migrate thumbnails of the old flat " \
+           "layout into sharded dirs, evict least recently used thumbnails " \
+           "when store is over its size limit, or show hit/miss/eviction stats."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['migrate', 'evict', 'stats'])
+        parser.add_argument('--max-bytes', type=int, default=None,
+                            help='size limit, default THUMBNAIL_STORE_MAX_BYTES')
+
+    def handle(self, *args, **options):
+        action = options['action']
+
+        if action == 'migrate':
+            moved = migrate_legacy_layout()
+            self.stdout.write('Moved %d thumbnails into sharded dirs' % moved)
+
+        elif action == 'evict':
+            max_bytes = options['max_bytes']
+            if max_bytes is None:
+                max_bytes = THUMBNAIL_STORE_MAX_BYTES
+            if not max_bytes:
+                raise CommandError('THUMBNAIL_STORE_MAX_BYTES is not set, '
+                                   'and --max-bytes is not given.')
+
+            total, count, size = evict(max_bytes)
+            self.stdout.write('Store size %d bytes, limit %d bytes, '
+                              'evicted %d thumbnails (%d bytes)' % (
+                                  total, max_bytes, count, size))
+
+        self.print_stats()
+
+    def print_stats(self):
+        stats = get_stats()
+        requests = stats['hits'] + stats['misses']
+        hit_ratio = 100.0 * stats['hits'] / requests if requests else 0
+        self.stdout.write('hits: %d, misses: %d (hit ratio %.1f%%), evictions: %d' % (
+            stats['hits'], stats['misses'], hit_ratio, stats['evictions']))
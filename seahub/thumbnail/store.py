@@ -0,0 +1,270 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""On-disk storage of thumbnails.
+
+Thumbnails are stored at ``THUMBNAIL_ROOT/<size>/<id[:2]>/<id[2:4]>/<id>``,
+so that no directory holds more than a few thousand files. Access time of a
+thumbnail is refreshed when it is served (at most every
+``THUMBNAIL_ATIME_UPDATE_INTERVAL`` seconds, since mtime is kept for
+Last-Modified), and ``evict`` removes the least recently served ones when the
+store grows larger than ``THUMBNAIL_STORE_MAX_BYTES``.
+
+Which thumbnails exist is also indexed in cache, under one key per folder,
+so a dir listing can check all its files with one cache lookup instead of a
+stat per file. Only existing thumbnails are indexed: the others are looked
+up on disk each time (one ``listdir`` per shard dir), since they may be
+created by any process. Evicting thumbnails invalidates the whole index.
+"""
+import os
+import time
+import hashlib
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.base.cache_backends import incr_counter, bump_generation
+from seahub.settings import THUMBNAIL_ROOT
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Max total size of thumbnails in bytes, 0 for no limit.
+THUMBNAIL_STORE_MAX_BYTES = getattr(settings, 'THUMBNAIL_STORE_MAX_BYTES', 0)
+# Eviction removes thumbnails until the store is this much of the max size.
+THUMBNAIL_STORE_LOW_WATERMARK = getattr(settings,
+        'THUMBNAIL_STORE_LOW_WATERMARK', 0.9)
+THUMBNAIL_ATIME_UPDATE_INTERVAL = getattr(settings,
+        'THUMBNAIL_ATIME_UPDATE_INTERVAL', 3600)
+THUMBNAIL_INDEX_TIMEOUT = getattr(settings, 'THUMBNAIL_INDEX_TIMEOUT',
+        7 * 24 * 60 * 60)
+
+INDEX_CACHE_PREFIX = 'THUMBNAIL_INDEX_'
+INDEX_GENERATION_KEY = 'THUMBNAIL_INDEX_GENERATION'
+
+STATS_CACHE_PREFIX = 'THUMBNAIL_STORE_STATS_'
+STATS_NAMES = ('hits', 'misses', 'evictions')
+# stats are counted in process, and added to the shared counters at most
+# every this many seconds
+THUMBNAIL_STATS_FLUSH_INTERVAL = getattr(settings,
+        'THUMBNAIL_STATS_FLUSH_INTERVAL', 60)
+TMP_FILE_PREFIX = '.tmp-'
+
+def get_thumbnail_path(file_id, size):
+    return os.path.join(THUMBNAIL_ROOT, str(size), file_id[:2], file_id[2:4],
+                        file_id)
+
+def thumbnail_exists(file_id, size):
+    return os.path.exists(get_thumbnail_path(file_id, size))
+
+def touch_thumbnail(path):
+    """Mark thumbnail as recently used, keep its mtime.
+    """
+    try:
+        st = os.stat(path)
+        now = time.time()
+        if now - st.st_atime > THUMBNAIL_ATIME_UPDATE_INTERVAL:
+            os.utime(path, (now, st.st_mtime))
+    except OSError as e:
+        logger.warning(e)
+
+def read_thumbnail(file_id, size):
+    """Return content of thumbnail, raise IOError if it does not exist.
+    """
+    path = get_thumbnail_path(file_id, size)
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    touch_thumbnail(path)
+    return content
+
+########## index
+def _index_key(repo_id, parent_dir, size):
+    folder = (repo_id + parent_dir).encode('utf-8')
+    return '%s%s_%s' % (INDEX_CACHE_PREFIX, size, hashlib.md5(folder).hexdigest())
+
+def invalidate_index():
+    """Called after thumbnails are removed.
+    """
+    bump_generation(cache, INDEX_GENERATION_KEY)
+
+def _scan_thumbnails(file_ids, size):
+    """Return the subset of ``file_ids`` having thumbnail on disk.
+
+    Files sharing a shard dir are looked up with one ``listdir``.
+    """
+    shards = {}
+    for file_id in file_ids:
+        shard_dir = os.path.dirname(get_thumbnail_path(file_id, size))
+        shards.setdefault(shard_dir, []).append(file_id)
+
+    existing = set()
+    for shard_dir, ids in shards.iteritems():
+        if len(ids) == 1:
+            if os.path.exists(os.path.join(shard_dir, ids[0])):
+                existing.add(ids[0])
+            continue
+
+        try:
+            names = set(os.listdir(shard_dir))
+        except OSError:
+            continue
+        existing.update([i for i in ids if i in names])
+
+    return existing
+
+def get_existing_thumbnails(repo_id, parent_dir, file_ids, size):
+    """Return the subset of ``file_ids``, files of ``parent_dir``, whose
+    thumbnail of ``size`` exists.
+    """
+    file_ids = set(file_ids)
+    if not file_ids:
+        return set()
+
+    key = _index_key(repo_id, parent_dir, size)
+    values = cache.get_many([key, INDEX_GENERATION_KEY])
+    generation = values.get(INDEX_GENERATION_KEY, 0)
+    indexed_generation, indexed = values.get(key, (None, frozenset()))
+
+    existing = file_ids & indexed if indexed_generation == generation else set()
+    unknown = file_ids - existing
+    if unknown:
+        found = _scan_thumbnails(unknown, size)
+        if found:
+            existing.update(found)
+            cache.set(key, (generation, frozenset(existing)),
+                      THUMBNAIL_INDEX_TIMEOUT)
+
+    return existing
+
+########## stats
+_pending_stats = {}
+_pending_stats_lock = threading.Lock()
+_last_stats_flush = [time.time()]
+
+def record_stat(name, n=1):
+    with _pending_stats_lock:
+        _pending_stats[name] = _pending_stats.get(name, 0) + n
+        if time.time() - _last_stats_flush[0] < THUMBNAIL_STATS_FLUSH_INTERVAL:
+            return
+    flush_stats()
+
+def flush_stats():
+    """Add stats counted in this process to the shared counters.
+    """
+    with _pending_stats_lock:
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+        _last_stats_flush[0] = time.time()
+
+    for name, n in pending.items():
+        try:
+            incr_counter(cache, STATS_CACHE_PREFIX + name, n)
+        except Exception as e:
+            logger.warning('Failed to record thumbnail stat %s: %s', name, e)
+
+atexit.register(flush_stats)
+
+def get_stats():
+    flush_stats()
+    keys = [STATS_CACHE_PREFIX + name for name in STATS_NAMES]
+    values = cache.get_many(keys)
+    return dict((name, values.get(STATS_CACHE_PREFIX + name, 0))
+                for name in STATS_NAMES)
+
+########## maintenance
+def iter_thumbnails():
+    """Yield (path, stat) of every thumbnail in store.
+    """
+    for dirpath, dirnames, filenames in os.walk(THUMBNAIL_ROOT):
+        for filename in filenames:
+            if filename.startswith(TMP_FILE_PREFIX):
+                continue
+
+            path = os.path.join(dirpath, filename)
+            try:
+                yield path, os.stat(path)
+            except OSError:
+                # removed meanwhile
+                continue
+
+def evict(max_bytes=None, low_watermark=None):
+    """Remove least recently used thumbnails if total size is over
+    ``max_bytes``.
+
+    Return (total bytes before, number of removed files, removed bytes).
+    """
+    max_bytes = THUMBNAIL_STORE_MAX_BYTES if max_bytes is None else max_bytes
+    low_watermark = low_watermark or THUMBNAIL_STORE_LOW_WATERMARK
+
+    entries = []
+    total = 0
+    for path, st in iter_thumbnails():
+        entries.append((st.st_atime, st.st_size, path))
+        total += st.st_size
+
+    if not max_bytes or total <= max_bytes:
+        return total, 0, 0
+
+    target = max_bytes * low_watermark
+    removed = []
+    removed_bytes = 0
+    entries.sort()
+    for atime, size, path in entries:
+        if total - removed_bytes <= target:
+            break
+
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(e)
+            continue
+
+        removed.append(path)
+        removed_bytes += size
+
+    removed_count = len(removed)
+    if removed_count:
+        record_stat('evictions', removed_count)
+        flush_stats()
+        invalidate_index()
+
+    return total, removed_count, removed_bytes
+
+def migrate_legacy_layout():
+    """Move thumbnails of the flat layout into sharded dirs.
+
+    Return number of moved files.
+    """
+    if not os.path.isdir(THUMBNAIL_ROOT):
+        return 0
+
+    moved = 0
+    for size in os.listdir(THUMBNAIL_ROOT):
+        size_dir = os.path.join(THUMBNAIL_ROOT, size)
+        if not size.isdigit() or not os.path.isdir(size_dir):
+            continue
+
+        for file_id in os.listdir(size_dir):
+            src = os.path.join(size_dir, file_id)
+            if len(file_id) <= 4 or not os.path.isfile(src):
+                # shard dir
+                continue
+
+            if file_id.startswith(TMP_FILE_PREFIX):
+                os.unlink(src)
+                continue
+
+            dst = get_thumbnail_path(file_id, size)
+            if os.path.exists(dst):
+                os.unlink(src)
+                continue
+
+            dst_dir = os.path.dirname(dst)
+            if not os.path.exists(dst_dir):
+                os.makedirs(dst_dir)
+            os.rename(src, dst)
+            moved += 1
+
+    return moved
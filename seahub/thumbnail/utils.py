@@ -19,8 +19,9 @@ from seaserv import get_file_id_by_path, get_repo, get_file_size, \
 from seahub.utils import gen_inner_file_get_url, get_file_type_and_ext
 from seahub.utils.file_types import VIDEO, XMIND
 from seahub.settings import THUMBNAIL_IMAGE_SIZE_LIMIT, \
-    THUMBNAIL_EXTENSION, THUMBNAIL_ROOT, THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT,\
-    ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_VIDEO_FRAME_TIME
+    THUMBNAIL_EXTENSION, THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT,\
+    ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_VIDEO_FRAME_TIME, THUMBNAIL_SIZES
+from seahub.thumbnail.store import get_thumbnail_path, TMP_FILE_PREFIX
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
@@ -99,15 +100,11 @@ def generate_thumbnail(request, repo_id, size, path):
         logger.error(e)
         return (False, 400)
 
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-    if not os.path.exists(thumbnail_dir):
-        os.makedirs(thumbnail_dir)
-
     file_id = get_file_id_by_path(repo_id, path)
     if not file_id:
         return (False, 400)
 
-    thumbnail_file = os.path.join(thumbnail_dir, file_id)
+    thumbnail_file = get_thumbnail_image_path(file_id, size)
     if os.path.exists(thumbnail_file):
         return (True, 200)
 
@@ -134,17 +131,21 @@ def generate_thumbnail(request, repo_id, size, path):
         return create_psd_thumbnails(repo, file_id, path, size,
                                            thumbnail_file, file_size)
 
-    token = seafile_api.get_fileserver_access_token(repo_id,
-            file_id, 'view', '', use_onetime=True)
+    # image thumbnails are rendered by the thumbnail worker pool, concurrent
+    # requests for the same file share one job.
+    from seahub.thumbnail.jobs import run_thumbnail_job
+    return run_thumbnail_job(repo_id, file_id, path, size)
 
-    if not token:
-        return (False, 500)
+def create_image_thumbnail(inner_path, file_id, size):
+    """Download image from fileserver and save its thumbnails of ``size``
+    and ``THUMBNAIL_SIZES``.
 
-    inner_path = gen_inner_file_get_url(token, os.path.basename(path))
+    Run in thumbnail worker processes, so it must not call seafile rpc.
+    """
     try:
         image_file = urllib2.urlopen(inner_path)
         f = StringIO(image_file.read())
-        return _create_thumbnail_common(f, thumbnail_file, size)
+        return _create_thumbnails_common(f, get_thumbnail_targets(file_id, size))
     except Exception as e:
         logger.error(e)
         return (False, 500)
@@ -178,7 +179,8 @@ def create_psd_thumbnails(repo, file_id, path, size, thumbnail_file, file_size):
     logger.debug('Extract psd image [%s](size: %s) takes: %s' % (path, file_size, (t2 - t1)))
 
     try:
-        ret = _create_thumbnail_common(tmp_img_path, thumbnail_file, size)
+        targets = get_thumbnail_targets(file_id, size)
+        ret = _create_thumbnails_common(tmp_img_path, targets)
         os.unlink(tmp_img_path)
         return ret
     except Exception as e:
@@ -204,7 +206,8 @@ def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size
     logger.debug('Create thumbnail of [%s](size: %s) takes: %s' % (path, file_size, (t2 - t1)))
 
     try:
-        ret = _create_thumbnail_common(tmp_path, thumbnail_file, size)
+        targets = get_thumbnail_targets(file_id, size)
+        ret = _create_thumbnails_common(tmp_path, targets)
         os.unlink(tmp_path)
         return ret
     except Exception as e:
@@ -212,11 +215,44 @@ def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size
         os.unlink(tmp_path)
         return (False, 500)
 
-def _create_thumbnail_common(fp, thumbnail_file, size):
-    """Common logic for creating image thumbnail.
+def get_thumbnail_targets(file_id, size):
+    """Return list of (size, path) of thumbnails to create for ``file_id``:
+    the requested ``size`` and every size of ``THUMBNAIL_SIZES`` not created
+    yet, largest first.
+    """
+    targets = {}
+    for s in set([int(size)] + list(THUMBNAIL_SIZES)):
+        path = get_thumbnail_image_path(file_id, s)
+        if s == int(size) or not os.path.exists(path):
+            targets[s] = path
+
+    return sorted(targets.items(), reverse=True)
+
+def _save_thumbnail_atomically(image, thumbnail_file):
+    """Write to a temp file in the same dir, then rename, so readers never
+    see a partially written thumbnail.
+    """
+    thumbnail_dir = os.path.dirname(thumbnail_file)
+    if not os.path.exists(thumbnail_dir):
+        os.makedirs(thumbnail_dir)
+
+    fd, tmp_file = tempfile.mkstemp(dir=thumbnail_dir, prefix=TMP_FILE_PREFIX)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, THUMBNAIL_EXTENSION)
+        os.rename(tmp_file, thumbnail_file)
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        raise
+
+def _create_thumbnails_common(fp, targets):
+    """Create thumbnails of all ``targets``, a list of (size, path) sorted by
+    size desc, decoding the image only once.
 
     `fp` can be a filename (string) or a file object.
     """
+    # only reads image header
     image = Image.open(fp)
 
     # check image memory cost size limit
@@ -227,14 +263,31 @@ def _create_thumbnail_common(fp, thumbnail_file, size):
     if image_memory_cost > THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT:
         return (False, 403)
 
+    # let jpeg decoder scale the image down by 1/2, 1/4 or 1/8 while
+    # decoding, when even the largest thumbnail is much smaller
+    max_size = targets[0][0]
+    if max_size * 2 <= max(width, height):
+        image.draft(image.mode, (max_size, max_size))
+
     if image.mode not in ["1", "L", "P", "RGB", "RGBA"]:
         image = image.convert("RGB")
 
     image = get_rotated_image(image)
-    image.thumbnail((size, size), Image.ANTIALIAS)
-    image.save(thumbnail_file, THUMBNAIL_EXTENSION)
+
+    # each size is scaled down from the previous, larger one
+    for size, thumbnail_file in targets:
+        image.thumbnail((size, size), Image.ANTIALIAS)
+        _save_thumbnail_atomically(image, thumbnail_file)
+
     return (True, 200)
 
+def _create_thumbnail_common(fp, thumbnail_file, size):
+    """Common logic for creating image thumbnail.
+
+    `fp` can be a filename (string) or a file object.
+    """
+    return _create_thumbnails_common(fp, [(size, thumbnail_file)])
+
 def extract_xmind_image(repo_id, path, size=XMIND_IMAGE_SIZE):
 
     # get inner path
@@ -252,10 +305,7 @@ def extract_xmind_image(repo_id, path, size=XMIND_IMAGE_SIZE):
     extracted_xmind_image_str = StringIO(extracted_xmind_image)
 
     # save origin xmind image to thumbnail folder
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-    if not os.path.exists(thumbnail_dir):
-        os.makedirs(thumbnail_dir)
-    local_xmind_image = os.path.join(thumbnail_dir, file_id)
+    local_xmind_image = get_thumbnail_image_path(file_id, size)
 
     try:
         ret = _create_thumbnail_common(extracted_xmind_image_str, local_xmind_image, size)
@@ -265,6 +315,4 @@ def extract_xmind_image(repo_id, path, size=XMIND_IMAGE_SIZE):
         return (False, 500)
 
 def get_thumbnail_image_path(obj_id, image_size):
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(image_size))
-    thumbnail_image_path = os.path.join(thumbnail_dir, obj_id)
-    return thumbnail_image_path
+    return get_thumbnail_path(obj_id, image_size)
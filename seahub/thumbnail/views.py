@@ -16,9 +16,11 @@ from seaserv import get_repo, get_file_id_by_path
 from seahub.auth.decorators import login_required_ajax, login_required
 from seahub.views import check_folder_permission
 from seahub.settings import THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_EXTENSION, \
-    THUMBNAIL_ROOT, ENABLE_THUMBNAIL
-from seahub.thumbnail.utils import generate_thumbnail, \
+    ENABLE_THUMBNAIL
+from seahub.thumbnail.utils import generate_thumbnail, get_thumbnail_image_path, \
     get_thumbnail_src, get_share_link_thumbnail_src
+from seahub.thumbnail.store import thumbnail_exists, read_thumbnail, \
+    record_stat
 from seahub.share.models import FileShare, check_share_link_common
 
 # Get an instance of a logger
@@ -67,7 +69,7 @@ def latest_entry(request, repo_id, size, path):
     obj_id = get_file_id_by_path(repo_id, path)
     if obj_id:
         try:
-            thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
+            thumbnail_file = get_thumbnail_image_path(obj_id, size)
             last_modified_time = os.path.getmtime(thumbnail_file)
             # convert float to datatime obj
             return datetime.datetime.fromtimestamp(last_modified_time)
@@ -108,14 +110,15 @@ def thumbnail_get(request, repo_id, size, path):
         return HttpResponse()
 
     success = True
-    thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-    if not os.path.exists(thumbnail_file):
+    if thumbnail_exists(obj_id, size):
+        record_stat('hits')
+    else:
+        record_stat('misses')
         success, status_code = generate_thumbnail(request, repo_id, size, path)
 
     if success:
         try:
-            with open(thumbnail_file, 'rb') as f:
-                thumbnail = f.read()
+            thumbnail = read_thumbnail(obj_id, size)
             return HttpResponse(content=thumbnail,
                                 content_type='image/' + THUMBNAIL_EXTENSION)
         except IOError as e:
@@ -201,7 +204,7 @@ def share_link_latest_entry(request, token, size, path):
     obj_id = get_file_id_by_path(repo_id, image_path)
     if obj_id:
         try:
-            thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
+            thumbnail_file = get_thumbnail_image_path(obj_id, size)
             last_modified_time = os.path.getmtime(thumbnail_file)
             # convert float to datatime obj
             return datetime.datetime.fromtimestamp(last_modified_time)
@@ -249,14 +252,15 @@ def share_link_thumbnail_get(request, token, size, path):
         return HttpResponse()
 
     success = True
-    thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-    if not os.path.exists(thumbnail_file):
+    if thumbnail_exists(obj_id, size):
+        record_stat('hits')
+    else:
+        record_stat('misses')
         success, status_code = generate_thumbnail(request, repo_id, size, image_path)
 
     if success:
         try:
-            with open(thumbnail_file, 'rb') as f:
-                thumbnail = f.read()
+            thumbnail = read_thumbnail(obj_id, size)
             return HttpResponse(content=thumbnail,
                                 content_type='image/' + THUMBNAIL_EXTENSION)
         except IOError as e:
@@ -56,3 +56,14 @@ class TrustedIP(models.Model):
         return {
             'ip': self.ip
         }
+
+
+########## signal handlers
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=TrustedIP, dispatch_uid="trusted_ip_saved")
+@receiver(post_delete, sender=TrustedIP, dispatch_uid="trusted_ip_deleted")
+def reload_trusted_ip_matcher(sender, instance, **kwargs):
+    from seahub.trusted_ip.utils import bump_trusted_ip_generation
+    bump_trusted_ip_generation()
@@ -0,0 +1,138 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Match client IP against trusted IPs without a database query.
+
+Trusted IPs of ``TrustedIP`` and ``TRUSTED_IP_LIST`` are compiled into sorted,
+merged intervals per address family, so that checking an IP is a binary
+search. The compiled matcher is kept per process and rebuilt when the
+generation number in cache, bumped whenever ``TrustedIP`` changes, differs
+from the one it was built with.
+"""
+import bisect
+import socket
+import time
+import binascii
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.base.cache_backends import bump_generation
+from seahub.trusted_ip.models import TrustedIP
+from seahub.settings import TRUSTED_IP_LIST
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Matcher is rebuilt at least this often, in case cache is unavailable.
+TRUSTED_IP_RELOAD_INTERVAL = getattr(settings, 'TRUSTED_IP_RELOAD_INTERVAL', 300)
+
+TRUSTED_IP_GENERATION_KEY = 'TRUSTED_IP_GENERATION'
+
+def _ip_to_int(ip):
+    """Return (family, integer value, number of bits) of ``ip``, raise
+    ValueError if it is not a valid IPv4 or IPv6 address.
+    """
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    try:
+        packed = socket.inet_pton(family, ip)
+    except (socket.error, UnicodeError, TypeError):
+        raise ValueError('Invalid IP address: %s' % ip)
+
+    return family, int(binascii.hexlify(packed), 16), len(packed) * 8
+
+def parse_ip_range(pattern):
+    """Return (family, first, last) addresses matched by ``pattern``, which
+    is an address, a CIDR like ``10.0.0.0/8`` or ``fd00::/8``, or an IPv4
+    address with trailing wildcards like ``10.1.*.*``.
+
+    Raise ValueError if ``pattern`` is invalid.
+    """
+    pattern = pattern.strip()
+    if '/' in pattern:
+        ip, prefix_len = pattern.split('/', 1)
+        try:
+            prefix_len = int(prefix_len)
+        except ValueError:
+            raise ValueError('Invalid prefix length: %s' % pattern)
+    elif '*' in pattern:
+        parts = pattern.split('.')
+        fixed = [p for p in parts if p != '*']
+        if len(parts) != 4 or parts[:len(fixed)] != fixed:
+            raise ValueError('Only trailing wildcards are supported: %s' % pattern)
+        ip = '.'.join(fixed + ['0'] * (4 - len(fixed)))
+        prefix_len = 8 * len(fixed)
+    else:
+        ip, prefix_len = pattern, None
+
+    family, value, bits = _ip_to_int(ip)
+    if prefix_len is None:
+        prefix_len = bits
+    if not 0 <= prefix_len <= bits:
+        raise ValueError('Invalid prefix length: %s' % pattern)
+
+    host_mask = (1 << (bits - prefix_len)) - 1
+    first = value & ~host_mask
+    return family, first, first | host_mask
+
+
+class TrustedIPMatcher(object):
+    """Sorted list of non-overlapping address intervals per family.
+    """
+    def __init__(self, patterns):
+        ranges = {socket.AF_INET: [], socket.AF_INET6: []}
+        for pattern in patterns:
+            try:
+                family, first, last = parse_ip_range(pattern)
+            except ValueError as e:
+                logger.warning('Ignore trusted IP: %s' % e)
+                continue
+            ranges[family].append((first, last))
+
+        self._starts = {}
+        self._ends = {}
+        for family, items in ranges.iteritems():
+            merged = []
+            for first, last in sorted(items):
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+
+            self._starts[family] = [m[0] for m in merged]
+            self._ends[family] = [m[1] for m in merged]
+
+    def match(self, ip):
+        try:
+            family, value, bits = _ip_to_int(ip)
+        except ValueError:
+            return False
+
+        if family == socket.AF_INET6 and value >> 32 == 0xffff:
+            # IPv4-mapped IPv6 address
+            family, value = socket.AF_INET, value & 0xffffffff
+
+        i = bisect.bisect_right(self._starts[family], value) - 1
+        return i >= 0 and value <= self._ends[family][i]
+
+
+_loaded = {}
+
+def get_trusted_ip_matcher():
+    generation = cache.get(TRUSTED_IP_GENERATION_KEY, 0)
+    if _loaded.get('generation') != generation or \
+            time.time() - _loaded.get('loaded_at', 0) > TRUSTED_IP_RELOAD_INTERVAL:
+        ips = list(TrustedIP.objects.values_list('ip', flat=True))
+        _loaded['matcher'] = TrustedIPMatcher(ips + list(TRUSTED_IP_LIST))
+        _loaded['generation'] = generation
+        _loaded['loaded_at'] = time.time()
+
+    return _loaded['matcher']
+
+def is_trusted_ip(ip):
+    return get_trusted_ip_matcher().match(ip)
+
+def bump_trusted_ip_generation():
+    """Called when ``TrustedIP`` changes, to rebuild matchers of all
+    processes.
+    """
+    bump_generation(cache, TRUSTED_IP_GENERATION_KEY)
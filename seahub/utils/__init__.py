@@ -919,25 +919,28 @@ def get_site_name():
     """
     return config.SITE_NAME
 
-def send_html_email(subject, con_template, con_context, from_email, to_email,
-                    reply_to=None):
-    """Send HTML email
+def get_html_email_base_context():
+    """Return context shared by all html emails.
     """
-
     # get logo path
     logo_path = LOGO_PATH
     custom_logo_file = os.path.join(MEDIA_ROOT, CUSTOM_LOGO_PATH)
     if os.path.exists(custom_logo_file):
         logo_path = CUSTOM_LOGO_PATH
 
-    base_context = {
+    return {
         'url_base': get_site_scheme_and_netloc(),
         'site_name': get_site_name(),
         'media_url': MEDIA_URL,
         'logo_path': logo_path,
     }
+
+def send_html_email(subject, con_template, con_context, from_email, to_email,
+                    reply_to=None):
+    """Send HTML email
+    """
     t = loader.get_template(con_template)
-    con_context.update(base_context)
+    con_context.update(get_html_email_base_context())
 
     headers = {}
     if IS_EMAIL_CONFIGURED:
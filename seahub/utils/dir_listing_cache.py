@@ -0,0 +1,68 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Cache of dir listings built by ``seahub.api2.endpoints.dir``.
+
+Seafile dir ids are content hashes, so a listing only changes with its
+dir id, unless starred items of the user or file tags of the library
+change. Those are counted by generation numbers, which are bumped by signal
+handlers of ``UserStarredFiles``, ``FileTags`` and ``RepoTags``, and are part
+of the cache key and ETag. File locks and thumbnails also change without any
+signal, e.g. locks expire or are set by online office, so they are not part of
+the cached listing.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.base.cache_backends import bump_generation
+from seahub.utils import normalize_cache_key
+
+# Listings also contain nicknames, which are not covered by dir id, so keep
+# them for a limited time only.
+DIR_LISTING_CACHE_TIMEOUT = getattr(settings, 'DIR_LISTING_CACHE_TIMEOUT', 600)
+
+DIR_LISTING_CACHE_PREFIX = 'DIR_LISTING_'
+STARRED_GENERATION_PREFIX = 'DIR_LISTING_STARRED_GEN_'
+REPO_GENERATION_PREFIX = 'DIR_LISTING_REPO_GEN_'
+
+def bump_starred_generation(username):
+    """Called when a starred item of ``username`` is added or removed.
+    """
+    bump_generation(cache, normalize_cache_key(username,
+                                               STARRED_GENERATION_PREFIX))
+
+def bump_repo_generation(repo_id):
+    """Called when a file tag or repo tag of ``repo_id`` changes.
+    """
+    bump_generation(cache, normalize_cache_key(repo_id, REPO_GENERATION_PREFIX))
+
+def get_generations(username, repo_id):
+    """Return (starred generation, repo generation).
+    """
+    starred_key = normalize_cache_key(username, STARRED_GENERATION_PREFIX)
+    repo_key = normalize_cache_key(repo_id, REPO_GENERATION_PREFIX)
+    gens = cache.get_many([starred_key, repo_key])
+    return gens.get(starred_key, 0), gens.get(repo_key, 0)
+
+def get_dir_listing_version(username, repo_id, dir_id, permission, *options):
+    """Return a string changing whenever the listing of ``dir_id`` for
+    ``username`` with ``options`` may change. Used as cache key and ETag.
+    """
+    starred_gen, repo_gen = get_generations(username, repo_id)
+    parts = [username, repo_id, dir_id, permission, starred_gen, repo_gen]
+    parts.extend(options)
+    return hashlib.md5(u'\n'.join([unicode(p) for p in parts]).encode('utf-8')).hexdigest()
+
+def get_dir_listing_etag(parts):
+    """Return a quoted ETag of a response built from listings of
+    ``parts``, a list of versions and other values.
+    """
+    return '"%s"' % hashlib.md5(
+        u'\n'.join([unicode(p) for p in parts]).encode('utf-8')).hexdigest()
+
+def get_cached_dir_listing(version):
+    return cache.get(DIR_LISTING_CACHE_PREFIX + version)
+
+def set_cached_dir_listing(version, listing):
+    cache.set(DIR_LISTING_CACHE_PREFIX + version, listing,
+              DIR_LISTING_CACHE_TIMEOUT)
@@ -0,0 +1,277 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Export users and groups to xlsx or csv files.
+
+Rows are generated batch by batch and written to the file as they come, so
+memory use does not grow with the number of users. Profiles and last logins
+of a batch are fetched with one query each, quota and usage rpcs of a batch
+run in a small thread pool.
+
+Exports started from web run as background jobs: the file is written to
+``EXPORT_ROOT`` and the progress kept in cache, where any process can read it
+for polling. In a cluster, ``EXPORT_ROOT`` should be on shared storage.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from seaserv import seafile_api, ccnet_api
+
+from seahub.base.models import UserLastLogin
+from seahub.base.templatetags.seahub_tags import tsstr_sec
+from seahub.constants import GUEST_USER, DEFAULT_USER
+from seahub.profile.models import Profile
+from seahub.utils import is_pro_version
+from seahub.utils.file_size import get_file_size_unit
+from seahub.utils.ms_excel import write_rows
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+EXPORT_ROOT = getattr(settings, 'EXPORT_ROOT',
+                      os.path.join(settings.CACHE_DIR, 'seahub-exports'))
+EXPORT_BATCH_SIZE = getattr(settings, 'EXPORT_BATCH_SIZE', 500)
+# Number of threads calling quota/usage rpcs.
+EXPORT_QUOTA_WORKERS = getattr(settings, 'EXPORT_QUOTA_WORKERS', 4)
+# Seconds a request waits for its export before showing progress instead.
+EXPORT_WAIT_TIMEOUT = getattr(settings, 'EXPORT_WAIT_TIMEOUT', 10)
+# Exported files are removed after this many seconds.
+EXPORT_FILE_TIMEOUT = getattr(settings, 'EXPORT_FILE_TIMEOUT', 60 * 60)
+
+EXPORT_JOB_CACHE_PREFIX = 'EXPORT_JOB_'
+EXPORT_FORMATS = ('xlsx', 'csv')
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+########## users
+def get_all_users():
+    return ccnet_api.get_emailusers('DB', -1, -1) + \
+        ccnet_api.get_emailusers('LDAPImport', -1, -1)
+
+def get_user_export_head(is_pro=None):
+    if is_pro is None:
+        is_pro = is_pro_version()
+
+    if is_pro:
+        return [_("Email"), _("Name"), _("Contact Email"), _("Status"), _("Role"),
+                _("Space Usage") + "(MB)", _("Space Quota") + "(MB)",
+                _("Create At"), _("Last Login"), _("Admin"), _("LDAP(imported)"),]
+    else:
+        return [_("Email"), _("Name"), _("Contact Email"), _("Status"),
+                _("Space Usage") + "(MB)", _("Space Quota") + "(MB)",
+                _("Create At"), _("Last Login"), _("Admin"), _("LDAP(imported)"),]
+
+def get_email_to_org_id():
+    """Return dict of org user email to org id, with one rpc per org
+    instead of one per user.
+    """
+    email_to_org_id = {}
+    for org in ccnet_api.get_all_orgs(-1, -1) or []:
+        for org_user in ccnet_api.get_org_emailusers(org.url_prefix, -1, -1):
+            email_to_org_id.setdefault(org_user.email, org.org_id)
+
+    return email_to_org_id
+
+def get_quota_usage(email, org_id=None):
+    """Return (space usage, space quota) of ``email``, (-1, -1) on error.
+    """
+    try:
+        if org_id is not None:
+            return (seafile_api.get_org_user_quota_usage(org_id, email),
+                    seafile_api.get_org_user_quota(org_id, email))
+        else:
+            return (seafile_api.get_user_self_usage(email),
+                    seafile_api.get_user_quota(email))
+    except Exception as e:
+        logger.error(e)
+        return -1, -1
+
+def _size_in_mb(size):
+    if size > 0:
+        try:
+            return round(float(size) / get_file_size_unit('MB'), 2)
+        except Exception as e:
+            logger.error(e)
+            return '--'
+    return ''
+
+def _get_role_name(role):
+    if not role or role == DEFAULT_USER:
+        return _('Default')
+    if role == GUEST_USER:
+        return _('Guest')
+    return role
+
+def iter_user_rows(users, is_pro=None, batch_size=None):
+    """Yield export row of every user in ``users``.
+    """
+    if is_pro is None:
+        is_pro = is_pro_version()
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+
+    email_to_org_id = get_email_to_org_id()
+    executor = ThreadPoolExecutor(EXPORT_QUOTA_WORKERS)
+    try:
+        for i in range(0, len(users), batch_size):
+            batch = users[i:i + batch_size]
+            emails = [u.email for u in batch]
+
+            profiles = dict((p.user, p) for p in
+                            Profile.objects.filter(user__in=emails))
+            last_logins = dict((l.username, l.last_login) for l in
+                               UserLastLogin.objects.filter(username__in=emails))
+            quota_usages = executor.map(
+                lambda e: get_quota_usage(e, email_to_org_id.get(e)), emails)
+
+            for user, (space_usage, space_quota) in zip(batch, quota_usages):
+                profile = profiles.get(user.email)
+                name = profile.nickname if profile else ''
+                contact_email = profile.contact_email if profile else ''
+
+                status = _('Active') if user.is_active else _('Inactive')
+                create_at = tsstr_sec(user.ctime) if user.ctime else ''
+                last_login = last_logins.get(user.email)
+                last_login = last_login.strftime("%Y-%m-%d %H:%M:%S") if \
+                    last_login else ''
+
+                is_admin = _('Yes') if user.is_staff else ''
+                ldap_import = _('Yes') if user.source == 'LDAPImport' else ''
+
+                row = [user.email, name, contact_email, status,
+                       _size_in_mb(space_usage), _size_in_mb(space_quota),
+                       create_at, last_login, is_admin, ldap_import]
+                if is_pro:
+                    row.insert(4, _get_role_name(user.role))
+
+                yield row
+    finally:
+        executor.shutdown(wait=False)
+
+########## groups
+def get_all_groups():
+    return ccnet_api.get_all_groups(-1, -1)
+
+def get_group_export_head():
+    return [_("Name"), _("Creator"), _("Create At")]
+
+def iter_group_rows(groups):
+    for grp in groups:
+        create_at = tsstr_sec(grp.timestamp) if grp.timestamp else ''
+        yield [grp.group_name, grp.creator_name, create_at]
+
+########## export
+EXPORTS = {
+    # name: (get items, head, rows)
+    'users': (get_all_users, get_user_export_head, iter_user_rows),
+    'groups': (get_all_groups, get_group_export_head, iter_group_rows),
+}
+
+def export_to_file(name, path, file_format='xlsx', progress=None):
+    """Export all users or groups (``name``) to ``path``.
+
+    ``progress`` is called with (done, total) every batch.
+    Return number of exported rows.
+    """
+    get_items, get_head, iter_rows = EXPORTS[name]
+    items = get_items()
+    total = len(items)
+
+    def rows():
+        for i, row in enumerate(iter_rows(items)):
+            if progress and i % EXPORT_BATCH_SIZE == 0:
+                progress(i, total)
+            yield row
+
+    return write_rows(path, name, get_head(), rows(), file_format)
+
+########## background jobs
+_lock = threading.Lock()
+_executor = {}
+
+def _get_executor():
+    pid = os.getpid()
+    with _lock:
+        if _executor.get('pid') != pid:
+            _executor['pid'] = pid
+            _executor['executor'] = ThreadPoolExecutor(1)
+        return _executor['executor']
+
+def _job_cache_key(job_id):
+    return EXPORT_JOB_CACHE_PREFIX + job_id
+
+def get_export_job(job_id, username):
+    """Return state of job ``job_id`` started by ``username``, or None.
+    """
+    if not job_id or not job_id.isalnum():
+        return None
+
+    job = cache.get(_job_cache_key(job_id))
+    if not job or job['username'] != username:
+        return None
+
+    return job
+
+def _update_job(job, **kwargs):
+    job.update(kwargs)
+    cache.set(_job_cache_key(job['id']), job, EXPORT_FILE_TIMEOUT)
+
+def remove_expired_files():
+    if not os.path.isdir(EXPORT_ROOT):
+        return
+
+    now = time.time()
+    for filename in os.listdir(EXPORT_ROOT):
+        path = os.path.join(EXPORT_ROOT, filename)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_FILE_TIMEOUT:
+                os.unlink(path)
+        except OSError as e:
+            logger.warning(e)
+
+def _run_job(job, language):
+    translation.activate(language)
+    try:
+        remove_expired_files()
+        if not os.path.isdir(EXPORT_ROOT):
+            os.makedirs(EXPORT_ROOT)
+
+        count = export_to_file(job['name'], job['path'], job['format'],
+                progress=lambda done, total: _update_job(job, done=done,
+                                                         total=total))
+        _update_job(job, status=STATUS_DONE, done=count, total=count)
+    except Exception as e:
+        logger.error(e)
+        _update_job(job, status=STATUS_FAILED)
+    finally:
+        translation.deactivate()
+        connection.close()
+
+def start_export_job(name, username, file_format='xlsx'):
+    """Export ``name`` in background, return the job.
+    """
+    job_id = uuid.uuid4().hex
+    job = {
+        'id': job_id,
+        'name': name,
+        'username': username,
+        'format': file_format,
+        'status': STATUS_RUNNING,
+        'done': 0,
+        'total': 0,
+        'path': os.path.join(EXPORT_ROOT, '%s.%s' % (job_id, file_format)),
+        'filename': '%s.%s' % (name, file_format),
+    }
+    _update_job(job)
+    job['future'] = _get_executor().submit(_run_job, dict(job),
+                                           translation.get_language())
+    return job
@@ -0,0 +1,157 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Cache of file contents read from fileserver, keyed by file id.
+
+File ids are hashes of file contents, so a cached content never becomes
+stale. Contents are kept as files under ``FILE_CONTENT_CACHE_DIR``, sharded
+by the first two characters of the id, together with the encoding detected
+when the content was first decoded. Reading a cached file updates its mtime,
+and the least recently read files are removed when the total size exceeds
+``FILE_CONTENT_CACHE_MAX_SIZE``. In a cluster, the directory may be shared.
+"""
+import os
+import re
+import errno
+import logging
+import tempfile
+import threading
+import urllib2
+
+from django.conf import settings
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+FILE_CONTENT_CACHE_DIR = getattr(settings, 'FILE_CONTENT_CACHE_DIR',
+        os.path.join(settings.CACHE_DIR, 'seahub-file-content'))
+# Total size of cached contents, in bytes. 0 disables the cache.
+FILE_CONTENT_CACHE_MAX_SIZE = getattr(settings, 'FILE_CONTENT_CACHE_MAX_SIZE',
+                                      512 * 1024 * 1024)
+# Larger files are not cached.
+FILE_CONTENT_CACHE_MAX_OBJECT_SIZE = getattr(settings,
+        'FILE_CONTENT_CACHE_MAX_OBJECT_SIZE', 5 * 1024 * 1024)
+
+OBJ_ID_RE = re.compile(r'^[0-9a-f]{40}$')
+
+def _get_path(obj_id):
+    if not obj_id or not OBJ_ID_RE.match(obj_id):
+        return None
+    return os.path.join(FILE_CONTENT_CACHE_DIR, obj_id[:2], obj_id)
+
+def get_content_cache_id(repo, obj_id):
+    """Return id to cache content of ``obj_id`` by, or None if it should not
+    be cached. Contents of encrypted libraries are not stored on disk.
+    """
+    if not repo or repo.encrypted:
+        return None
+    return obj_id
+
+def get_cached_file_content(obj_id):
+    """Return (content, encoding) of ``obj_id``, or (None, None) if it is
+    not cached. Encoding is None if it was not detected.
+    """
+    path = _get_path(obj_id)
+    if not path or FILE_CONTENT_CACHE_MAX_SIZE <= 0:
+        return None, None
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path, None)
+    except (IOError, OSError):
+        return None, None
+
+    encoding, _, content = data.partition('\n')
+    return content, encoding or None
+
+def cache_file_content(obj_id, content, encoding=None):
+    path = _get_path(obj_id)
+    if not path or FILE_CONTENT_CACHE_MAX_SIZE <= 0 or \
+            len(content) > FILE_CONTENT_CACHE_MAX_OBJECT_SIZE:
+        return
+
+    shard_dir = os.path.dirname(path)
+    try:
+        try:
+            # only readable by seahub, contents are served as previews
+            os.makedirs(shard_dir, 0700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        # write to a temp file and rename, so readers never see partial file
+        fd, tmp_path = tempfile.mkstemp(dir=shard_dir, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write('%s\n' % (encoding or ''))
+            f.write(content)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+        logger.warning('Failed to cache file content %s: %s' % (obj_id, e))
+        return
+
+    _account(len(content))
+
+def read_file_content(obj_id, get_url):
+    """Return raw content of ``obj_id`` from cache, or read it from the
+    fileserver url ``get_url()`` returns and cache it.
+
+    Raise ``urllib2.URLError`` on failure.
+    """
+    content, encoding = get_cached_file_content(obj_id)
+    if content is None:
+        content = urllib2.urlopen(get_url()).read()
+        cache_file_content(obj_id, content)
+
+    return content
+
+########## eviction
+_lock = threading.Lock()
+_written = {'size': 0, 'total': None}
+
+def _account(size):
+    """Count bytes written, and evict when the cache may be over budget.
+
+    The total size is only measured by scanning the directory, which is done
+    the first time and after every tenth of the budget is written.
+    """
+    with _lock:
+        _written['size'] += size
+        if _written['total'] is not None and \
+                _written['size'] < FILE_CONTENT_CACHE_MAX_SIZE / 10:
+            return
+        _written['size'] = 0
+
+    _written['total'] = evict_file_contents()
+
+def evict_file_contents(max_size=None):
+    """Remove least recently read contents until their total size is at
+    most 90% of ``max_size``. Return total size left.
+    """
+    if max_size is None:
+        max_size = FILE_CONTENT_CACHE_MAX_SIZE
+
+    files = []
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(FILE_CONTENT_CACHE_DIR):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    if total <= max_size:
+        return total
+
+    files.sort()
+    for mtime, size, path in files:
+        if total <= max_size * 0.9:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError as e:
+            logger.warning(e)
+
+    return total
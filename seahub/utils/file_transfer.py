@@ -0,0 +1,176 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Helpers to pass file content between fileserver and office servers in
+chunks, instead of loading the whole file into memory.
+"""
+import time
+import uuid
+import logging
+import tempfile
+
+import requests
+from django.conf import settings
+from django.utils.encoding import smart_str
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+FILE_TRANSFER_CHUNK_SIZE = getattr(settings, 'FILE_TRANSFER_CHUNK_SIZE', 64 * 1024)
+# Content of unknown size is spooled to a temp file, which stays in memory
+# until it grows larger than this.
+FILE_TRANSFER_SPOOL_MAX_MEMORY = getattr(settings,
+        'FILE_TRANSFER_SPOOL_MAX_MEMORY', 4 * 1024 * 1024)
+
+
+class TransferStats(object):
+    """Count bytes and time of a transfer, and log them when finished.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.bytes = 0
+        self.start = time.time()
+        self.first_byte_time = None
+
+    def add(self, n):
+        if self.first_byte_time is None:
+            self.first_byte_time = time.time() - self.start
+        self.bytes += n
+
+    def finish(self, error=None):
+        cost = time.time() - self.start
+        logger.info('[File transfer] %s: %s bytes in %.3fs (first byte %.3fs)%s' % (
+            self.name, self.bytes, cost, self.first_byte_time or 0,
+            ', failed: %s' % error if error else ''))
+
+
+class ChunkIterReader(object):
+    """File-like object reading from an iterable of byte chunks.
+    """
+    def __init__(self, iterable):
+        self._iter = iter(iterable)
+        self._buf = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            try:
+                chunk = next(self._iter)
+            except StopIteration:
+                break
+            if chunk:
+                self._buf += chunk
+
+        if size < 0:
+            data, self._buf = self._buf, b''
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+def iter_file_chunks(fileobj, stats=None, chunk_size=None):
+    """Yield content of ``fileobj`` chunk by chunk, then close it.
+
+    The next chunk is only read after the previous one has been consumed, so
+    a slow reader slows down the source as well.
+    """
+    chunk_size = chunk_size or FILE_TRANSFER_CHUNK_SIZE
+    error = None
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            if stats:
+                stats.add(len(chunk))
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if hasattr(fileobj, 'close'):
+            fileobj.close()
+        if stats:
+            stats.finish(error)
+
+
+def spool_file(fileobj, chunk_size=None):
+    """Copy ``fileobj`` of unknown size to a temp file.
+
+    Return the temp file (rewound) and its size.
+    """
+    chunk_size = chunk_size or FILE_TRANSFER_CHUNK_SIZE
+    tmp_file = tempfile.SpooledTemporaryFile(max_size=FILE_TRANSFER_SPOOL_MAX_MEMORY)
+    size = 0
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        tmp_file.write(chunk)
+        size += len(chunk)
+
+    tmp_file.seek(0)
+    return tmp_file, size
+
+
+class MultipartFileStream(object):
+    """Multipart/form-data body whose file part is read from ``fileobj``
+    while it is being sent.
+
+    Fields are encoded the same way as ``requests.post(files={...})`` does
+    with plain values, which is what fileserver's upload/update api expects.
+    """
+    def __init__(self, fields, file_field, fileobj, file_size,
+                 stats=None, chunk_size=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self._stats = stats
+        self._chunk_size = chunk_size or FILE_TRANSFER_CHUNK_SIZE
+
+        self._parts = []
+        for name, value in fields.items():
+            self._parts.append(self._part_header(name) + smart_str(value) + b'\r\n')
+
+        self._file_header = self._part_header(file_field)
+        self._fileobj = fileobj
+        self._file_size = file_size
+        self._tail = b'\r\n--%s--\r\n' % self.boundary
+
+        self._len = sum(len(p) for p in self._parts) + \
+            len(self._file_header) + file_size + len(self._tail)
+        self._reader = ChunkIterReader(self._iter_body())
+
+    def _part_header(self, name):
+        name = smart_str(name)
+        return b'--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n\r\n' % (
+            self.boundary, name, name)
+
+    def _iter_body(self):
+        for part in self._parts:
+            yield part
+        yield self._file_header
+        for chunk in iter_file_chunks(self._fileobj, self._stats, self._chunk_size):
+            yield chunk
+        yield self._tail
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return self._iter_body()
+
+    def read(self, size=-1):
+        return self._reader.read(size)
+
+
+def post_file_stream(url, fields, file_field, fileobj, file_size=None,
+                     stats=None, **kwargs):
+    """Post ``fileobj`` to ``url`` as multipart/form-data without loading it
+    into memory. ``file_size`` is needed for Content-Length, content of
+    unknown size is spooled to a temp file first.
+    """
+    if file_size is None:
+        fileobj, file_size = spool_file(fileobj)
+
+    body = MultipartFileStream(fields, file_field, fileobj, file_size, stats)
+    headers = kwargs.pop('headers', {})
+    headers['Content-Type'] = body.content_type
+    headers['Content-Length'] = str(len(body))
+    return requests.post(url, data=body, headers=headers, **kwargs)
@@ -1,6 +1,7 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 from __future__ import unicode_literals
 
+import re
 import json
 
 from functools import wraps
@@ -44,3 +45,26 @@ def int_param(request, key):
         return int(v)
     except ValueError:
         raise BadRequestException()
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+def parse_range(header, size):
+    """Parse a ``Range`` header of a single byte range, return (start, end)
+    with ``end`` exclusive, or None if the header is absent or not
+    supported. Raise ``ValueError`` if the range is not satisfiable.
+    """
+    m = RANGE_RE.match((header or '').strip())
+    if not m or m.groups() == ('', ''):
+        return None
+
+    first, last = m.groups()
+    if not first:
+        # last ``last`` bytes
+        start, end = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+
+    if start >= size or start >= end:
+        raise ValueError('Range not satisfiable: %s' % header)
+
+    return start, end
@@ -1,4 +1,6 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import csv
+import codecs
 import logging
 import openpyxl
 
@@ -32,3 +34,35 @@ def write_xls(sheet_name, head, data_list):
             c.value = row[col_num]
 
     return wb
+
+def write_rows(path, sheet_name, head, rows, file_format='xlsx'):
+    """Write ``head`` and ``rows``, an iterable, to file ``path`` row by row,
+    without keeping them in memory.
+
+    ``file_format`` is 'xlsx' or 'csv'. Return number of written rows.
+    """
+    count = 0
+    if file_format == 'csv':
+        with open(path, 'wb') as f:
+            # BOM, so that excel detects utf-8
+            f.write(codecs.BOM_UTF8)
+            writer = csv.writer(f)
+            writer.writerow([_csv_cell(v) for v in head])
+            for row in rows:
+                writer.writerow([_csv_cell(v) for v in row])
+                count += 1
+        return count
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    ws.append(head)
+    for row in rows:
+        ws.append(row)
+        count += 1
+    wb.save(path)
+    return count
+
+def _csv_cell(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
@@ -0,0 +1,48 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Snapshots of library lists returned by ``/api2/repos/``.
+
+A library list is summarized as a dict mapping an entry key (how the library
+is listed, e.g. owned or shared by a group, and its id) to the state of the
+entry (head commit id and permission). The token of a list is a hash of its
+snapshot, it is used as ETag and as the ``since`` argument of delta
+requests, which are answered by comparing with the snapshot kept in cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.utils import normalize_cache_key
+
+REPO_LIST_SNAPSHOT_TIMEOUT = getattr(settings, 'REPO_LIST_SNAPSHOT_TIMEOUT',
+                                     24 * 60 * 60)
+
+REPO_LIST_SNAPSHOT_PREFIX = 'REPO_LIST_SNAPSHOT_'
+
+def get_repo_list_token(username, snapshot, *options):
+    """Return a token changing whenever ``snapshot`` of the list of
+    ``username`` with ``options`` changes.
+    """
+    parts = [username] + list(options)
+    parts.extend(['%s=%s' % (k, v) for k, v in sorted(snapshot.iteritems())])
+    return hashlib.md5(u'\n'.join([unicode(p) for p in parts]).encode('utf-8')).hexdigest()
+
+def _snapshot_cache_key(username, token):
+    return normalize_cache_key(username,
+                               '%s%s_' % (REPO_LIST_SNAPSHOT_PREFIX, token))
+
+def get_repo_list_snapshot(username, token):
+    return cache.get(_snapshot_cache_key(username, token))
+
+def set_repo_list_snapshot(username, token, snapshot):
+    cache.set(_snapshot_cache_key(username, token), snapshot,
+              REPO_LIST_SNAPSHOT_TIMEOUT)
+
+def diff_repo_list_snapshots(old, new):
+    """Return (added, removed, changed) entry keys of ``new`` compared with
+    ``old``.
+    """
+    added = [k for k in new if k not in old]
+    removed = [k for k in old if k not in new]
+    changed = [k for k in new if k in old and old[k] != new[k]]
+    return added, removed, changed
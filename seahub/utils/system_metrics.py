@@ -0,0 +1,92 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Snapshots of system wide metrics for the admin dashboards.
+
+Counting users, libraries, files and storage takes a handful of rpcs, and
+the statistics charts query seafevents on every redraw. Here each metric is
+computed by a function, and its result kept in cache together with the time
+it was computed, so reading it is a single cache get.
+
+A snapshot older than ``SYSTEM_METRICS_REFRESH_INTERVAL`` is still returned,
+while a background thread computes a new one (stale-while-revalidate), and
+only one process refreshes a snapshot at a time. A snapshot is computed
+within the request only when there is none, or it is older than
+``SYSTEM_METRICS_MAX_AGE``.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Snapshots older than this are refreshed in background.
+SYSTEM_METRICS_REFRESH_INTERVAL = getattr(settings,
+        'SYSTEM_METRICS_REFRESH_INTERVAL', 5 * 60)
+# Snapshots older than this are not returned any more.
+SYSTEM_METRICS_MAX_AGE = getattr(settings, 'SYSTEM_METRICS_MAX_AGE',
+                                 24 * 60 * 60)
+
+SYSTEM_METRICS_CACHE_PREFIX = 'SYSTEM_METRICS_'
+# Seconds a refresh may take before another process may start one.
+REFRESH_LOCK_TIMEOUT = 10 * 60
+
+_lock = threading.Lock()
+_executor = {}
+
+def _get_executor():
+    pid = os.getpid()
+    with _lock:
+        if _executor.get('pid') != pid:
+            _executor['pid'] = pid
+            _executor['executor'] = ThreadPoolExecutor(1)
+        return _executor['executor']
+
+def _cache_key(name):
+    return SYSTEM_METRICS_CACHE_PREFIX + hashlib.md5(name).hexdigest()
+
+def _refresh(name, compute):
+    value = compute()
+    cache.set(_cache_key(name), {'value': value, 'computed_at': time.time()},
+              SYSTEM_METRICS_MAX_AGE)
+    return value
+
+def _refresh_in_background(name, compute):
+    lock_key = _cache_key(name) + '_LOCK'
+    if not cache.add(lock_key, 1, REFRESH_LOCK_TIMEOUT):
+        # being refreshed by another thread or process
+        return
+
+    def run():
+        try:
+            _refresh(name, compute)
+        except Exception as e:
+            logger.error(e)
+        finally:
+            cache.delete(lock_key)
+            connection.close()
+
+    _get_executor().submit(run)
+
+def get_metrics(name, compute):
+    """Return snapshot of metrics ``name``, which ``compute()`` returns.
+    """
+    snapshot = cache.get(_cache_key(name))
+    if snapshot is None:
+        return _refresh(name, compute)
+
+    if time.time() - snapshot['computed_at'] > SYSTEM_METRICS_REFRESH_INTERVAL:
+        _refresh_in_background(name, compute)
+
+    return snapshot['value']
+
+def clear_metrics(name):
+    """Drop snapshot of metrics ``name``, e.g. after license is updated.
+    """
+    cache.delete(_cache_key(name))
@@ -0,0 +1,322 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Line diff of two file versions, with time and size budgets.
+
+Lines are mapped to integers first, so comparing lines is comparing ints.
+After stripping common head and tail, lines appearing exactly once on both
+sides are matched by patience sorting and used as anchors, the gaps between
+anchors are diffed with Myers' algorithm. When the time budget is used up,
+or a gap needs too many edits, the gap is shown as replaced as a whole.
+Files larger than the size budget are only matched by anchors.
+
+Results are lists of opcodes as ``difflib.SequenceMatcher.get_opcodes``
+returns, which are cached by file ids, and turned into rows of the html
+table only when rendered.
+"""
+import time
+import bisect
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.utils.htmldiff import HtmlDiff
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Seconds spent on diffing one file before falling back to coarse diff.
+TEXT_DIFF_TIME_BUDGET = getattr(settings, 'TEXT_DIFF_TIME_BUDGET', 2)
+# Files with more lines than this are only diffed by unique lines.
+TEXT_DIFF_MAX_LINES = getattr(settings, 'TEXT_DIFF_MAX_LINES', 100000)
+# Gaps needing more edits than this are shown as replaced.
+TEXT_DIFF_MAX_EDIT_DISTANCE = getattr(settings, 'TEXT_DIFF_MAX_EDIT_DISTANCE', 2000)
+# Number of table rows rendered at most.
+TEXT_DIFF_MAX_ROWS = getattr(settings, 'TEXT_DIFF_MAX_ROWS', 20000)
+TEXT_DIFF_CACHE_TIMEOUT = getattr(settings, 'TEXT_DIFF_CACHE_TIMEOUT',
+                                  7 * 24 * 60 * 60)
+
+TEXT_DIFF_CACHE_PREFIX = 'TEXT_DIFF_'
+# opcodes lists longer than this are not cached
+TEXT_DIFF_CACHE_MAX_OPCODES = 10000
+# gaps are searched for anchors at most this deep
+MAX_ANCHOR_DEPTH = 8
+
+def _hash_lines(a, b):
+    ids = {}
+    return ([ids.setdefault(line, len(ids)) for line in a],
+            [ids.setdefault(line, len(ids)) for line in b])
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Return longest increasing list of (i, j), where a[i] == b[j] and
+    both are unique in their range.
+    """
+    a_pos = {}
+    for i in xrange(alo, ahi):
+        a_pos[a[i]] = -1 if a[i] in a_pos else i
+
+    b_pos = {}
+    for j in xrange(blo, bhi):
+        if a_pos.get(b[j], -1) >= 0:
+            b_pos[b[j]] = -1 if b[j] in b_pos else j
+
+    pairs = [(a_pos[b[j]], j) for j in xrange(blo, bhi)
+             if b_pos.get(b[j]) == j]
+
+    # patience sorting: longest increasing subsequence on i
+    tails, tail_idx, prev = [], [], [None] * len(pairs)
+    for n, (i, j) in enumerate(pairs):
+        k = bisect.bisect_left(tails, i)
+        if k > 0:
+            prev[n] = tail_idx[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_idx.append(n)
+        else:
+            tails[k] = i
+            tail_idx[k] = n
+
+    result = []
+    n = tail_idx[-1] if tail_idx else None
+    while n is not None:
+        result.append(pairs[n])
+        n = prev[n]
+
+    result.reverse()
+    return result
+
+def _myers(a, alo, ahi, b, blo, bhi, deadline):
+    """Return matched (i, j) of a shortest edit script, or None if it needs
+    more than ``TEXT_DIFF_MAX_EDIT_DISTANCE`` edits or ``deadline`` passes.
+    """
+    n, m = ahi - alo, bhi - blo
+    max_d = min(n + m, TEXT_DIFF_MAX_EDIT_DISTANCE)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+
+    for d in xrange(max_d + 1):
+        if time.time() > deadline:
+            return None
+
+        # v[k] for k in [-d - 1, d + 1], read when going back
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in xrange(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+
+            if x >= n and y >= m:
+                return _myers_matches(trace, n, m, alo, blo)
+
+    return None
+
+def _myers_matches(trace, x, y, alo, blo):
+    matches = []
+    for d in xrange(len(trace) - 1, -1, -1):
+        snap = trace[d]
+        k = x - y
+        if k == -d or (k != d and snap[k - 1 + d + 1] < snap[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = snap[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+
+        while x > prev_x and y > prev_y and x > 0 and y > 0:
+            x -= 1
+            y -= 1
+            matches.append((alo + x, blo + y))
+        x, y = prev_x, prev_y
+
+    matches.reverse()
+    return matches
+
+def _diff(a, alo, ahi, b, blo, bhi, deadline, matches, depth=0):
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        matches.append((alo, blo))
+        alo += 1
+        blo += 1
+
+    suffix = []
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        suffix.append((ahi, bhi))
+
+    if alo < ahi and blo < bhi:
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi) \
+            if depth < MAX_ANCHOR_DEPTH else []
+        if anchors:
+            for i, j in anchors:
+                _diff(a, alo, i, b, blo, j, deadline, matches, depth + 1)
+                matches.append((i, j))
+                alo, blo = i + 1, j + 1
+            _diff(a, alo, ahi, b, blo, bhi, deadline, matches, depth + 1)
+        else:
+            matches.extend(_myers(a, alo, ahi, b, blo, bhi, deadline) or [])
+
+    matches.extend(reversed(suffix))
+
+def diff_lines(a, b, time_budget=None):
+    """Return opcodes turning list of lines ``a`` into ``b``.
+    """
+    if time_budget is None:
+        time_budget = TEXT_DIFF_TIME_BUDGET
+    if len(a) > TEXT_DIFF_MAX_LINES or len(b) > TEXT_DIFF_MAX_LINES:
+        time_budget = 0
+
+    ha, hb = _hash_lines(a, b)
+    matches = []
+    _diff(ha, 0, len(ha), hb, 0, len(hb), time.time() + time_budget, matches)
+
+    opcodes = []
+    i = j = 0
+    for mi, mj in matches + [(len(a), len(b))]:
+        if i < mi and j < mj:
+            opcodes.append(('replace', i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(('delete', i, mi, j, j))
+        elif j < mj:
+            opcodes.append(('insert', i, i, j, mj))
+
+        if mi < len(a):
+            if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == mi:
+                tag, i1, i2, j1, j2 = opcodes.pop()
+                opcodes.append(('equal', i1, mi + 1, j1, mj + 1))
+            else:
+                opcodes.append(('equal', mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+
+    return opcodes
+
+def group_opcodes(opcodes, n=3):
+    """Return groups of ``opcodes`` with up to ``n`` lines of context, as
+    ``difflib.SequenceMatcher.get_grouped_opcodes`` does.
+    """
+    codes = list(opcodes)
+    if not codes:
+        return []
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    nn = n + n
+    groups = []
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == 'equal' and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        groups.append(group)
+
+    return groups
+
+def get_diff_opcodes(a, b, old_file_id=None, new_file_id=None, *options):
+    """Return opcodes of ``a`` and ``b``, cached by file ids and ``options``
+    if ids are given. File ids are content hashes, so the result never
+    becomes stale.
+    """
+    if not (old_file_id and new_file_id):
+        return diff_lines(a, b)
+
+    key = TEXT_DIFF_CACHE_PREFIX + hashlib.md5(u'\n'.join(
+        [unicode(p) for p in (old_file_id, new_file_id) + options]).encode(
+            'utf-8')).hexdigest()
+    opcodes = cache.get(key)
+    if opcodes is None:
+        opcodes = diff_lines(a, b)
+        if len(opcodes) <= TEXT_DIFF_CACHE_MAX_OPCODES:
+            cache.set(key, opcodes, TEXT_DIFF_CACHE_TIMEOUT)
+
+    return opcodes
+
+def _mark(text, key):
+    return '\0%s%s\1' % (key, text or ' ')
+
+def _changed_pair(old, new):
+    """Return old and new line marked as ``_mdiff`` does for an intraline
+    change.
+    """
+    prefix = 0
+    max_prefix = min(len(old), len(new))
+    while prefix < max_prefix and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    max_suffix = max_prefix - prefix
+    while suffix < max_suffix and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+    if old_mid and new_mid:
+        old_key = new_key = '^'
+    else:
+        old_key, new_key = '-', '+'
+
+    if old_mid:
+        old = old[:prefix] + _mark(old_mid, old_key) + old[len(old) - suffix:]
+    if new_mid:
+        new = new[:prefix] + _mark(new_mid, new_key) + new[len(new) - suffix:]
+
+    return old, new
+
+def iter_diff_lines(a, b, opcodes):
+    """Yield (from line, to line, changed) of ``opcodes``, where lines are
+    (line number, text) as ``htmldiff._mdiff`` yields.
+    """
+    blank = ('', '\n')
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            for i, j in zip(xrange(i1, i2), xrange(j1, j2)):
+                yield (i + 1, a[i]), (j + 1, b[j]), False
+            continue
+
+        for k in xrange(max(i2 - i1, j2 - j1)):
+            i, j = i1 + k, j1 + k
+            if i < i2 and j < j2:
+                old, new = _changed_pair(a[i], b[j])
+                yield (i + 1, old), (j + 1, new), True
+            elif i < i2:
+                yield (i + 1, _mark(a[i], '-')), blank, True
+            else:
+                yield blank, (j + 1, _mark(b[j], '+')), True
+
+
+class BudgetHtmlDiff(HtmlDiff):
+    """``HtmlDiff`` rendering rows of opcodes from ``diff_lines``, instead
+    of running ndiff.
+    """
+    def iter_table_rows(self, fromlines, tolines, opcodes, context=False,
+                        numlines=5):
+        """Yield html rows of the table ``make_table`` returns.
+        """
+        self._make_prefix()
+        fromlines, tolines = self._tab_newline_replace(fromlines, tolines)
+
+        if context:
+            groups = group_opcodes(opcodes, numlines)
+        else:
+            groups = [opcodes]
+
+        fmt = '            <tr>%s%s</tr>\n'
+        for n, group in enumerate(groups):
+            if n > 0:
+                yield '        </tbody>        \n        <tbody>\n'
+            for fromdata, todata, flag in iter_diff_lines(fromlines, tolines,
+                                                          group):
+                yield fmt % (self._format_line(0, flag, *fromdata),
+                             self._format_line(1, flag, *todata))
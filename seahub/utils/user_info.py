@@ -0,0 +1,163 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""Resolve nickname, contact email and avatar url of many users at once.
+
+``email2nickname``/``email2contact_email``/``api_avatar_url`` do one cache
+get (and one query on miss) per email, which adds up quickly in list
+endpoints. The functions here look up a whole set of emails with one
+``cache.get_many`` and one ``Profile`` query for the misses, and write the
+results back with the same cache keys, so both ways share the cache.
+
+When ``UserInfoMemoMiddleware`` is enabled, results are also memoized for
+the lifetime of the current request.
+"""
+import logging
+from threading import local
+
+from django.core.cache import cache
+
+from seahub.profile.models import Profile
+from seahub.profile.settings import NICKNAME_CACHE_TIMEOUT, \
+    NICKNAME_CACHE_PREFIX, CONTACT_CACHE_TIMEOUT, CONTACT_CACHE_PREFIX
+from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
+from seahub.avatar.util import avatar_urls, get_default_avatar_url
+from seahub.utils import normalize_cache_key
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+_request_memo = local()
+
+def _get_memo():
+    return getattr(_request_memo, 'memo', None)
+
+def start_request_memo():
+    _request_memo.memo = {}
+
+def end_request_memo():
+    _request_memo.memo = None
+
+def _resolve(emails, memo_prefix, resolve_func):
+    """Look up ``emails`` in request memo, then call ``resolve_func`` with
+    the rest and memoize what it returns.
+    """
+    emails = set([e for e in emails if e])
+    memo = _get_memo()
+
+    result = {}
+    missing = set()
+    for email in emails:
+        if memo is not None and (memo_prefix, email) in memo:
+            result[email] = memo[(memo_prefix, email)]
+        else:
+            missing.add(email)
+
+    if missing:
+        resolved = resolve_func(missing)
+        result.update(resolved)
+        if memo is not None:
+            for email, value in resolved.iteritems():
+                memo[(memo_prefix, email)] = value
+
+    return result
+
+def _get_many_from_cache(emails, prefix):
+    key_to_email = dict([(normalize_cache_key(e, prefix), e) for e in emails])
+    cached = cache.get_many(key_to_email.keys())
+
+    result = {}
+    for key, value in cached.iteritems():
+        if value and value.strip():
+            result[key_to_email[key]] = value.strip()
+
+    return result
+
+def _get_profiles(emails):
+    profiles = {}
+    for p in Profile.objects.filter(user__in=emails):
+        profiles[p.user] = p
+    return profiles
+
+def _nicknames_from_cache_or_db(emails):
+    result = _get_many_from_cache(emails, NICKNAME_CACHE_PREFIX)
+
+    misses = emails - set(result.keys())
+    if misses:
+        profiles = _get_profiles(misses)
+        to_cache = {}
+        for email in misses:
+            p = profiles.get(email)
+            if p is not None and p.nickname and p.nickname.strip():
+                nickname = p.nickname.strip()
+            else:
+                nickname = email.split('@')[0]
+
+            result[email] = nickname
+            to_cache[normalize_cache_key(email, NICKNAME_CACHE_PREFIX)] = nickname
+
+        cache.set_many(to_cache, NICKNAME_CACHE_TIMEOUT)
+
+    return result
+
+def _contact_emails_from_cache_or_db(emails):
+    result = _get_many_from_cache(emails, CONTACT_CACHE_PREFIX)
+
+    misses = emails - set(result.keys())
+    if misses:
+        profiles = _get_profiles(misses)
+        to_cache = {}
+        for email in misses:
+            p = profiles.get(email)
+            if p is not None and p.contact_email:
+                contact_email = p.contact_email
+            else:
+                contact_email = email
+
+            result[email] = contact_email
+            to_cache[normalize_cache_key(email, CONTACT_CACHE_PREFIX)] = contact_email
+
+        cache.set_many(to_cache, CONTACT_CACHE_TIMEOUT)
+
+    return result
+
+def emails2nicknames(emails):
+    """Return a dict of email -> nickname, same as ``email2nickname``.
+    """
+    return _resolve(emails, 'nickname', _nicknames_from_cache_or_db)
+
+def emails2contact_emails(emails):
+    """Return a dict of email -> contact email, same as
+    ``email2contact_email``.
+    """
+    return _resolve(emails, 'contact_email', _contact_emails_from_cache_or_db)
+
+def emails2avatar_urls(emails, size=AVATAR_DEFAULT_SIZE):
+    """Return a dict of email -> avatar url, same as ``api_avatar_url``.
+    """
+    def resolve_func(emails):
+        try:
+            return avatar_urls(emails, size)
+        except Exception as e:
+            logger.error(e)
+            return dict([(email, get_default_avatar_url()) for email in emails])
+
+    return _resolve(emails, 'avatar_url_%s' % size, resolve_func)
+
+def get_users_info(emails, avatar_size=AVATAR_DEFAULT_SIZE, with_avatar=True):
+    """Return a dict of email -> {'email', 'name', 'contact_email',
+    'avatar_url'}, the bulk version of ``get_user_common_info``.
+    """
+    emails = set([e for e in emails if e])
+    nicknames = emails2nicknames(emails)
+    contact_emails = emails2contact_emails(emails)
+    urls = emails2avatar_urls(emails, avatar_size) if with_avatar else {}
+
+    users_info = {}
+    for email in emails:
+        users_info[email] = {
+            'email': email,
+            'name': nicknames.get(email, ''),
+            'contact_email': contact_emails.get(email, ''),
+            'avatar_url': urls.get(email, ''),
+        }
+
+    return users_info
@@ -0,0 +1,300 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""In-process index for searching users by nickname and contact email.
+
+Searching ``Profile`` with ``icontains`` scans the whole table on every
+keystroke of the share dialog. The index keeps nickname, contact email and
+pinyin of nickname of every profile in memory, with a posting list of entry
+ids per trigram, so a search only checks the entries having the rarest
+trigram of the query. Queries shorter than three characters match the
+beginning of words instead.
+
+Every process builds its own index in a background thread on first use,
+searching the database until it is built. Saving or deleting a ``Profile``
+bumps a generation number in cache and records the changed user under it,
+other processes then reload only those users. If too many changes are
+missing, e.g. the cache was cleared, or the index is older than
+``USER_SEARCH_INDEX_REBUILD_INTERVAL``, it is rebuilt in background, while
+the old one is still searched.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from seahub.base.cache_backends import bump_generation
+from seahub.cconvert import CConvert
+from seahub.profile.models import Profile
+
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# More changes than this since last refresh cause a full rebuild.
+USER_SEARCH_INDEX_MAX_CHANGES = getattr(settings,
+        'USER_SEARCH_INDEX_MAX_CHANGES', 1000)
+# Index is rebuilt at least this often, to drop removed entries.
+USER_SEARCH_INDEX_REBUILD_INTERVAL = getattr(settings,
+        'USER_SEARCH_INDEX_REBUILD_INTERVAL', 24 * 60 * 60)
+
+USER_SEARCH_INDEX_GENERATION_KEY = 'USER_SEARCH_INDEX_GENERATION'
+USER_SEARCH_INDEX_CHANGE_PREFIX = 'USER_SEARCH_INDEX_CHANGE_'
+
+# start of text, after a separator, or any non-ascii character
+WORD_START_RE = re.compile(r'(?:^|(?<=[\s.@_\-+]))\S|[^\x00-\x7f]', re.U)
+
+_cc = {}
+_pinyin_memo = {}
+
+def get_pinyin(text):
+    """Return pinyin of chinese characters in ``text``, or '' if it is all
+    ascii.
+    """
+    try:
+        text.encode('ascii')
+        return ''
+    except UnicodeError:
+        pass
+
+    if 'cc' not in _cc:
+        cc = CConvert()
+        cc.spliter = ''
+        _cc['cc'] = cc
+
+    pinyin = []
+    for c in text:
+        py = _pinyin_memo.get(c)
+        if py is None:
+            py = _cc['cc'].convert(c) if ord(c) >= 128 else c
+            _pinyin_memo[c] = py
+        pinyin.append(py)
+
+    return u''.join(pinyin).lower()
+
+
+class UserSearchIndex(object):
+    """Users searchable by substring of nickname, contact email or pinyin
+    of nickname, case insensitive.
+    """
+    def __init__(self, profiles=()):
+        # entry id -> (email, searchable text), or None if removed
+        self._entries = []
+        self._ids = {}
+        self._postings = {}
+        for email, nickname, contact_email in profiles:
+            self.add(email, nickname, contact_email)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _grams(self, texts):
+        grams = set()
+        for text in texts:
+            grams.update([text[i:i + 3] for i in xrange(len(text) - 2)])
+            for m in WORD_START_RE.finditer(text):
+                start = m.start()
+                grams.add(u'^' + text[start:start + 1])
+                grams.add(u'^' + text[start:start + 2])
+
+        return grams
+
+    def add(self, email, nickname, contact_email):
+        """Add or replace user ``email``.
+        """
+        self.remove(email)
+
+        nickname = (nickname or u'').lower()
+        texts = [t for t in (nickname, (contact_email or u'').lower(),
+                             get_pinyin(nickname)) if t]
+        if not texts:
+            return
+
+        entry_id = len(self._entries)
+        self._entries.append((email, u'\n'.join(texts)))
+        self._ids[email] = entry_id
+        postings = self._postings
+        for gram in self._grams(texts):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('I')
+            posting.append(entry_id)
+
+    def remove(self, email):
+        entry_id = self._ids.pop(email, None)
+        if entry_id is not None:
+            self._entries[entry_id] = None
+
+    def search(self, q, limit=10, emails=None):
+        """Return at most ``limit`` users matching ``q``, only those in
+        ``emails`` if it is given.
+        """
+        q = q.lower().strip()
+        if not q or '\n' in q:
+            return []
+
+        if len(q) < 3:
+            # any user with a word starting with ``q``
+            posting = self._postings.get(u'^' + q, ())
+            verify = False
+        else:
+            grams = [q[i:i + 3] for i in range(len(q) - 2)]
+            postings = [self._postings.get(g, ()) for g in grams]
+            posting = min(postings, key=len)
+            verify = len(q) > 3
+
+        result = []
+        for entry_id in posting:
+            entry = self._entries[entry_id]
+            if entry is None:
+                continue
+
+            email, text = entry
+            if emails is not None and email not in emails:
+                continue
+            if verify and q not in text:
+                continue
+
+            result.append(email)
+            if len(result) >= limit:
+                break
+
+        return result
+
+
+_lock = threading.Lock()
+_loaded = {}
+_executor = {}
+
+def _get_executor():
+    pid = os.getpid()
+    with _lock:
+        if _executor.get('pid') != pid:
+            _executor['pid'] = pid
+            _executor['executor'] = ThreadPoolExecutor(1)
+            # building thread is not forked along
+            _loaded['building'] = False
+        return _executor['executor']
+
+def _load_profiles(emails=None):
+    profiles = Profile.objects.all()
+    if emails is not None:
+        profiles = profiles.filter(user__in=emails)
+
+    return profiles.values_list('user', 'nickname', 'contact_email').iterator()
+
+def _get_changed_emails(old_generation, generation):
+    """Return users changed after ``old_generation``, or None if they are
+    not all known.
+    """
+    if not isinstance(old_generation, (int, long)) or \
+            not isinstance(generation, (int, long)) or \
+            not 0 < generation - old_generation <= USER_SEARCH_INDEX_MAX_CHANGES:
+        return None
+
+    keys = ['%s%d' % (USER_SEARCH_INDEX_CHANGE_PREFIX, g) for g in
+            range(old_generation + 1, generation + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+
+    return set(changes.values())
+
+def _build_index():
+    # Start generations here, so the next change is applied incrementally,
+    # from current time, as ``bump_generation`` does.
+    cache.add(USER_SEARCH_INDEX_GENERATION_KEY, int(time.time() * 1000), None)
+    # changes made while loading are applied again later
+    generation = cache.get(USER_SEARCH_INDEX_GENERATION_KEY)
+    start = time.time()
+    index = UserSearchIndex(_load_profiles())
+    with _lock:
+        _loaded['index'] = index
+        _loaded['generation'] = generation
+        _loaded['built_at'] = time.time()
+    logger.info('Built user search index of %d users in %.2fs' %
+                (len(index), time.time() - start))
+
+def _build_in_background():
+    executor = _get_executor()
+    with _lock:
+        if _loaded.get('building'):
+            return
+        _loaded['building'] = True
+
+    def run():
+        try:
+            _build_index()
+        except Exception as e:
+            logger.error(e)
+        finally:
+            with _lock:
+                _loaded['building'] = False
+            connection.close()
+
+    executor.submit(run)
+
+def get_user_search_index():
+    """Return index of this process, or None if it is not built yet.
+    """
+    generation = cache.get(USER_SEARCH_INDEX_GENERATION_KEY)
+    with _lock:
+        index = _loaded.get('index')
+        old_generation = _loaded.get('generation')
+        built_at = _loaded.get('built_at', 0)
+
+    if index is None or \
+            time.time() - built_at >= USER_SEARCH_INDEX_REBUILD_INTERVAL:
+        _build_in_background()
+        return index
+
+    if generation == old_generation:
+        return index
+
+    changed = _get_changed_emails(old_generation, generation)
+    if changed is None:
+        _build_in_background()
+        return index
+
+    profiles = list(_load_profiles(changed))
+    with _lock:
+        if _loaded.get('index') is index and \
+                _loaded.get('generation') == old_generation:
+            for email in changed:
+                index.remove(email)
+            for email, nickname, contact_email in profiles:
+                index.add(email, nickname, contact_email)
+            _loaded['generation'] = generation
+
+    return index
+
+def _search_profiles(q, limit, emails=None):
+    profiles = Profile.objects.filter(Q(nickname__icontains=q) |
+                                      Q(contact_email__icontains=q))
+    if emails is not None:
+        profiles = profiles.filter(user__in=emails)
+
+    return list(profiles.values_list('user', flat=True)[:limit])
+
+def search_users(q, limit=10, emails=None):
+    """Return at most ``limit`` users whose nickname, contact email or
+    pinyin of nickname contains ``q``.
+    """
+    index = get_user_search_index()
+    if index is None:
+        # index is being built, pinyin is not searched meanwhile
+        return _search_profiles(q, limit, emails)
+
+    return index.search(q, limit, emails)
+
+def user_search_index_changed(email):
+    """Called when profile of ``email`` is saved or deleted.
+    """
+    generation = bump_generation(cache, USER_SEARCH_INDEX_GENERATION_KEY)
+    cache.set('%s%d' % (USER_SEARCH_INDEX_CHANGE_PREFIX, generation), email,
+              USER_SEARCH_INDEX_REBUILD_INTERVAL)
@@ -1,6 +1,7 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 # encoding: utf-8
 import hashlib
+import calendar
 import os
 import stat
 import json
@@ -9,12 +10,15 @@ import logging
 import posixpath
 
 from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
 from django.contrib import messages
 from django.http import HttpResponse, Http404, \
-    HttpResponseRedirect
+    HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render, redirect
-from django.utils.http import urlquote
+from django.utils.cache import get_conditional_response, \
+    patch_cache_control
+from django.utils.http import urlquote, http_date
 from django.utils.html import escape
 from django.utils.translation import ugettext as _
 from django.views.decorators.http import condition
@@ -27,6 +31,7 @@ from seaserv import get_repo, get_commits, \
 from pysearpc import SearpcError
 
 from seahub.avatar.util import get_avatar_file_storage
+from seahub.base.database_storage import BinaryDatabaseStorage
 from seahub.auth.decorators import login_required
 from seahub.auth import login as auth_login
 from seahub.auth import get_backends
@@ -49,6 +54,7 @@ from seahub.utils.repo import get_library_storages, parse_repo_perm
 from seahub.utils.file_op import check_file_lock
 from seahub.utils.timeutils import utc_to_local
 from seahub.utils.auth import get_login_bg_image_path
+from seahub.utils.http import parse_range
 from seahub.views.modules import MOD_PERSONAL_WIKI, enable_mod_for_user, \
     disable_mod_for_user
 import seahub.settings as settings
@@ -1160,11 +1166,20 @@ def latest_entry(request, filename):
         logger.error(e)
         return None
 
-@condition(last_modified_func=latest_entry)
+# Files larger than this are read from database chunk by chunk.
+IMAGE_VIEW_CHUNK_SIZE = 256 * 1024
+
 def image_view(request, filename):
     if AVATAR_FILE_STORAGE is None:
         raise Http404
 
+    if isinstance(storage, BinaryDatabaseStorage):
+        return _binary_image_view(request, filename)
+
+    return _image_view(request, filename)
+
+@condition(last_modified_func=latest_entry)
+def _image_view(request, filename):
     # read file from cache, if hit
     filename_md5 = hashlib.md5(filename).hexdigest()
     cache_key = 'image_view__%s' % filename_md5
@@ -1185,6 +1200,80 @@ def image_view(request, filename):
         response['Content-Encoding'] = content_encoding
     return response
 
+def _iter_blob_chunks(sha1, first_chunk, start, end):
+    yield first_chunk
+    for offset in xrange(start + IMAGE_VIEW_CHUNK_SIZE, end,
+                         IMAGE_VIEW_CHUNK_SIZE):
+        try:
+            yield storage.read_blob(sha1, offset,
+                                    min(IMAGE_VIEW_CHUNK_SIZE, end - offset))
+        except ObjectDoesNotExist as e:
+            # deleted while being sent, the response is cut short
+            logger.warning(e)
+            return
+
+def _binary_image_view(request, filename):
+    """Serve file of ``BinaryDatabaseStorage``, with the SHA-1 of its
+    content as ETag, and a single byte range if requested.
+
+    Urls with ``?v=<sha1>`` always point to the same content, so they can be
+    cached by browsers for good.
+    """
+    info = storage.get_file_info(filename)
+    if info is None:
+        raise Http404
+
+    sha1, size, mtime = info
+    etag = '"%s"' % sha1
+    last_modified = calendar.timegm(mtime.utctimetuple()) if mtime else None
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range or if_range == etag:
+            try:
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */%d' % size
+                return response
+
+        start, end = byte_range or (0, size)
+        content_type, content_encoding = mimetypes.guess_type(filename)
+        # content may be deleted after its info is read
+        try:
+            if end - start <= IMAGE_VIEW_CHUNK_SIZE:
+                content = storage.read_blob(sha1) if byte_range is None else \
+                    storage.read_blob(sha1, start, end - start)
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                first_chunk = storage.read_blob(sha1, start,
+                                                IMAGE_VIEW_CHUNK_SIZE)
+                response = StreamingHttpResponse(
+                    _iter_blob_chunks(sha1, first_chunk, start, end),
+                    content_type=content_type)
+        except ObjectDoesNotExist:
+            raise Http404
+
+        response['Content-Length'] = end - start
+        response['Accept-Ranges'] = 'bytes'
+        if byte_range is not None:
+            response.status_code = 206
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end - 1,
+                                                             size)
+        response['Content-Disposition'] = 'inline; filename=%s' % filename
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if request.GET.get('v') == sha1:
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=365 * 24 * 60 * 60)
+    return response
+
 def custom_css_view(request):
     file_content = config.CUSTOM_CSS
     response = HttpResponse(content=file_content, content_type='text/css')
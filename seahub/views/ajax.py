@@ -35,9 +35,9 @@ from seahub.signals import upload_file_successful
 from seahub.views import get_unencry_rw_repos_by_user, \
     get_diff, check_folder_permission
 from seahub.group.utils import is_group_member, is_group_admin_or_owner, \
-    get_group_member_info
+    get_group_member_info, clear_user_group_ids_cache
 import seahub.settings as settings
-from seahub.settings import ENABLE_THUMBNAIL, THUMBNAIL_ROOT, \
+from seahub.settings import ENABLE_THUMBNAIL, \
     THUMBNAIL_DEFAULT_SIZE, SHOW_TRAFFIC, MEDIA_URL, ENABLE_VIDEO_THUMBNAIL
 from seahub.utils import check_filename_with_rename, EMPTY_SHA1, \
     gen_block_get_url, \
@@ -52,6 +52,7 @@ from seahub.utils.repo import get_locked_files_by_dir, get_repo_owner, \
 from seahub.utils.error_msg import file_type_error_msg, file_size_error_msg
 from seahub.base.accounts import User
 from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.thumbnail.store import thumbnail_exists
 from seahub.share.utils import is_repo_admin
 from seahub.base.templatetags.seahub_tags import translate_seahub_time, \
     email2nickname, tsstr_sec
@@ -393,9 +394,7 @@ def list_lib_dir(request, repo_id):
                 # if thumbnail has already been created, return its src.
                 # Then web browser will use this src to get thumbnail instead of
                 # recreating it.
-                thumbnail_file_path = os.path.join(THUMBNAIL_ROOT, str(size), f.obj_id)
-                thumbnail_exist = os.path.exists(thumbnail_file_path)
-                if thumbnail_exist:
+                if thumbnail_exists(f.obj_id, size):
                     file_path = posixpath.join(path, f.obj_name)
                     src = get_thumbnail_src(repo_id, size, file_path)
                     f_['encoded_thumbnail_src'] = urlquote(src)
@@ -1355,6 +1354,7 @@ def ajax_group_members_import(request, group_id):
         try:
             seaserv.ccnet_threaded_rpc.group_add_member(group_id,
                 username, email)
+            clear_user_group_ids_cache(email)
             member_info = get_group_member_info(request, group_id, email)
             result['success'].append(member_info)
         except SearpcError as e:
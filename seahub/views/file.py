@@ -17,6 +17,7 @@ import re
 import mimetypes
 import urlparse
 import datetime
+import itertools
 
 from django.core import signing
 from django.core.cache import cache
@@ -54,17 +55,20 @@ from seahub.wiki.models import Wiki, WikiDoesNotExist, WikiPageMissing
 from seahub.utils import render_error, is_org_context, \
     get_file_type_and_ext, gen_file_get_url, gen_file_share_link, \
     render_permission_error, is_pro_version, is_textual_file, \
-    mkstemp, EMPTY_SHA1, HtmlDiff, gen_inner_file_get_url, \
+    mkstemp, EMPTY_SHA1, gen_inner_file_get_url, \
     user_traffic_over_limit, get_file_audit_events_by_path, \
     generate_file_audit_event_type, FILE_AUDIT_ENABLED, \
     get_conf_text_ext, HAS_OFFICE_CONVERTER, PREVIEW_FILEEXT, \
-    normalize_file_path, get_service_url, OFFICE_PREVIEW_MAX_SIZE, \
-    normalize_cache_key
+    normalize_file_path, get_service_url, OFFICE_PREVIEW_MAX_SIZE
 from seahub.utils.ip import get_remote_ip
 from seahub.utils.timeutils import utc_to_local
 from seahub.utils.file_types import (IMAGE, PDF, SVG,
         DOCUMENT, SPREADSHEET, AUDIO, MARKDOWN, TEXT, VIDEO, DRAW, XMIND, CTABLE, CDOC)
 from seahub.utils.star import is_file_starred
+from seahub.utils.file_content_cache import get_content_cache_id, \
+    get_cached_file_content, cache_file_content
+from seahub.utils.text_diff import BudgetHtmlDiff, get_diff_opcodes, \
+    TEXT_DIFF_MAX_ROWS
 from seahub.utils.http import json_response, \
         BadRequestException, RequestForbbiddenException
 from seahub.utils.file_op import check_file_lock, \
@@ -161,15 +165,19 @@ def gen_path_link(path, repo_name):
 
     return zipped
 
-def get_file_content(file_type, raw_path, file_enc):
+def get_file_content(file_type, raw_path, file_enc, obj_id=None):
     """Get textual file content, including txt/markdown/seaf.
     """
-    return repo_file_get(raw_path, file_enc) if is_textual_file(
+    return repo_file_get(raw_path, file_enc, obj_id) if is_textual_file(
         file_type=file_type) else ('', '', '')
 
-def repo_file_get(raw_path, file_enc):
+def repo_file_get(raw_path, file_enc, obj_id=None):
     """
     Get file content and encoding.
+
+    Content of ``obj_id`` is read from file content cache if possible.
+    ``raw_path`` may be a function returning the url, called only if the
+    content is not cached.
     """
     err = ''
     file_content = ''
@@ -177,46 +185,63 @@ def repo_file_get(raw_path, file_enc):
     if file_enc != 'auto':
         encoding = file_enc
 
-    try:
-        file_response = urllib2.urlopen(raw_path)
-        content = file_response.read()
-    except urllib2.HTTPError as e:
-        logger.error(e)
-        err = _(u'HTTPError: failed to open file online')
-        return err, '', None
-    except urllib2.URLError as e:
-        logger.error(e)
-        err = _(u'URLError: failed to open file online')
-        return err, '', None
+    content, cached_encoding = get_cached_file_content(obj_id)
+    is_cached = content is not None
+    if not is_cached:
+        if callable(raw_path):
+            raw_path = raw_path()
+            if not raw_path:
+                return _(u'Unable to view file'), '', None
+        try:
+            file_response = urllib2.urlopen(raw_path)
+            content = file_response.read()
+        except urllib2.HTTPError as e:
+            logger.error(e)
+            err = _(u'HTTPError: failed to open file online')
+            return err, '', None
+        except urllib2.URLError as e:
+            logger.error(e)
+            err = _(u'URLError: failed to open file online')
+            return err, '', None
+
+    if encoding:
+        try:
+            u_content = content.decode(encoding)
+        except UnicodeDecodeError:
+            err = _(u'The encoding you chose is not proper.')
+            return err, '', encoding
     else:
-        if encoding:
+        # try the encoding detected last time first
+        try_list = FILE_ENCODING_TRY_LIST
+        if cached_encoding:
+            try_list = [cached_encoding] + \
+                [enc for enc in FILE_ENCODING_TRY_LIST if enc != cached_encoding]
+        for enc in try_list:
             try:
-                u_content = content.decode(encoding)
-            except UnicodeDecodeError:
-                err = _(u'The encoding you chose is not proper.')
-                return err, '', encoding
-        else:
-            for enc in FILE_ENCODING_TRY_LIST:
-                try:
-                    u_content = content.decode(enc)
-                    encoding = enc
-                    break
-                except UnicodeDecodeError:
-                    if enc != FILE_ENCODING_TRY_LIST[-1]:
-                        continue
-                    else:
-                        encoding = chardet.detect(content)['encoding']
-                        if encoding:
-                            try:
-                                u_content = content.decode(encoding)
-                            except UnicodeDecodeError:
-                                err = _(u'Unknown file encoding')
-                                return err, '', ''
-                        else:
+                u_content = content.decode(enc)
+                encoding = enc
+                break
+            except (UnicodeDecodeError, LookupError):
+                if enc != try_list[-1]:
+                    continue
+                else:
+                    encoding = chardet.detect(content)['encoding']
+                    if encoding:
+                        try:
+                            u_content = content.decode(encoding)
+                        except UnicodeDecodeError:
                             err = _(u'Unknown file encoding')
                             return err, '', ''
+                    else:
+                        err = _(u'Unknown file encoding')
+                        return err, '', ''
+
+    if obj_id and (not is_cached or (file_enc == 'auto' and
+                                     encoding != cached_encoding)):
+        cache_file_content(obj_id, content,
+                           encoding if file_enc == 'auto' else cached_encoding)
 
-        file_content = u_content
+    file_content = u_content
 
     return err, file_content, encoding
 
@@ -246,13 +271,13 @@ def get_file_view_path_and_perm(request, repo_id, obj_id, path,
         inner_url = gen_inner_file_get_url(token, filename)
         return (outer_url, inner_url, user_perm)
 
-def handle_textual_file(request, filetype, raw_path, ret_dict):
+def handle_textual_file(request, filetype, raw_path, ret_dict, obj_id=None):
     # encoding option a user chose
     file_enc = request.GET.get('file_enc', 'auto')
     if not file_enc in FILE_ENCODING_LIST:
         file_enc = 'auto'
     err, file_content, encoding = get_file_content(filetype,
-                                                   raw_path, file_enc)
+                                                   raw_path, file_enc, obj_id)
     file_encoding_list = FILE_ENCODING_LIST
     if encoding and encoding not in FILE_ENCODING_LIST:
         file_encoding_list.append(encoding)
@@ -621,7 +646,7 @@ def view_lib_file(request, repo_id, path):
             file_enc = 'auto'
 
         error_msg, file_content, encoding = get_file_content(filetype,
-                inner_path, file_enc)
+                inner_path, file_enc, get_content_cache_id(repo, file_id))
         if error_msg:
             return_dict['err'] = error_msg
             return render(request, template, return_dict)
@@ -661,7 +686,7 @@ def view_lib_file(request, repo_id, path):
             file_enc = 'auto'
 
         error_msg, file_content, encoding = get_file_content(filetype,
-                inner_path, file_enc)
+                inner_path, file_enc, get_content_cache_id(repo, file_id))
         if error_msg:
             return_dict['err'] = error_msg
             return render(request, 'view_file_base.html', return_dict)
@@ -964,7 +989,8 @@ def view_history_file_common(request, repo_id, ret_dict):
 
             """Choose different approach when dealing with different type of file."""
             if is_textual_file(file_type=filetype):
-                handle_textual_file(request, filetype, inner_path, ret_dict)
+                handle_textual_file(request, filetype, inner_path, ret_dict,
+                                    get_content_cache_id(repo, obj_id))
             elif filetype == DOCUMENT:
                 handle_document(inner_path, obj_id, fileext, ret_dict)
             elif filetype == SPREADSHEET:
@@ -1257,7 +1283,8 @@ def view_shared_file(request, fileshare):
         """Choose different approach when dealing with different type of file."""
         inner_path = gen_inner_file_get_url(access_token, filename)
         if is_textual_file(file_type=filetype):
-            handle_textual_file(request, filetype, inner_path, ret_dict)
+            handle_textual_file(request, filetype, inner_path, ret_dict,
+                                get_content_cache_id(repo, obj_id))
         elif filetype == DOCUMENT:
             handle_document(inner_path, obj_id, fileext, ret_dict)
         elif filetype == SPREADSHEET:
@@ -1441,7 +1468,8 @@ def view_file_via_shared_dir(request, fileshare):
 
         """Choose different approach when dealing with different type of file."""
         if is_textual_file(file_type=filetype):
-            handle_textual_file(request, filetype, inner_path, ret_dict)
+            handle_textual_file(request, filetype, inner_path, ret_dict,
+                                get_content_cache_id(repo, obj_id))
         elif filetype == DOCUMENT:
             handle_document(inner_path, obj_id, fileext, ret_dict)
         elif filetype == SPREADSHEET:
@@ -1675,7 +1703,8 @@ def file_edit(request, repo_id):
             file_enc = request.GET.get('file_enc', 'auto')
             if not file_enc in FILE_ENCODING_LIST:
                 file_enc = 'auto'
-            err, file_content, encoding = repo_file_get(inner_path, file_enc)
+            err, file_content, encoding = repo_file_get(inner_path, file_enc,
+                    get_content_cache_id(repo, obj_id))
             if encoding and encoding not in FILE_ENCODING_LIST:
                 file_encoding_list.append(encoding)
     else:
@@ -1819,12 +1848,14 @@ def download_file(request, repo_id, obj_id):
     return HttpResponseRedirect(redirect_url)
 
 ########## text diff
-def get_file_content_by_commit_and_path(request, repo_id, commit_id, path, file_enc):
-    try:
-        obj_id = seafserv_threaded_rpc.get_file_id_by_commit_and_path( \
-                                        repo_id, commit_id, path)
-    except:
-        return None, 'bad path'
+def get_file_content_by_commit_and_path(request, repo_id, commit_id, path,
+                                        file_enc, obj_id=None):
+    if obj_id is None:
+        try:
+            obj_id = seafserv_threaded_rpc.get_file_id_by_commit_and_path( \
+                                            repo_id, commit_id, path)
+        except:
+            return None, 'bad path'
 
     if not obj_id or obj_id == EMPTY_SHA1:
         return '', None
@@ -1845,7 +1876,8 @@ def get_file_content_by_commit_and_path(request, repo_id, commit_id, path, file_
         inner_path = gen_inner_file_get_url(token, filename)
 
         try:
-            err, file_content, encoding = repo_file_get(inner_path, file_enc)
+            err, file_content, encoding = repo_file_get(inner_path, file_enc,
+                    get_content_cache_id(seafile_api.get_repo(repo_id), obj_id))
         except Exception as e:
             return None, 'error when read file from fileserver: %s' % e
         return file_content, err
@@ -1876,24 +1908,40 @@ def text_diff(request, repo_id):
 
     path = path.encode('utf-8')
 
+    try:
+        current_file_id = seafserv_threaded_rpc.get_file_id_by_commit_and_path(
+            repo.id, current_commit.id, path)
+        prev_file_id = seafserv_threaded_rpc.get_file_id_by_commit_and_path(
+            repo.id, prev_commit.id, path)
+    except:
+        return render_error(request, 'bad path')
+
     current_content, err = get_file_content_by_commit_and_path(request, \
-                                    repo_id, current_commit.id, path, file_enc)
+            repo_id, current_commit.id, path, file_enc, current_file_id)
     if err:
         return render_error(request, err)
 
     prev_content, err = get_file_content_by_commit_and_path(request, \
-                                    repo_id, prev_commit.id, path, file_enc)
+            repo_id, prev_commit.id, path, file_enc, prev_file_id)
     if err:
         return render_error(request, err)
 
     is_new_file = False
+    is_truncated = False
     diff_result_table = ''
     if prev_content == '' and current_content == '':
         is_new_file = True
     else:
-        diff = HtmlDiff()
-        diff_result_table = diff.make_table(prev_content.splitlines(),
-                                        current_content.splitlines(), True)
+        prev_lines = prev_content.splitlines()
+        current_lines = current_content.splitlines()
+        # diff is cached by file ids, rows are only rendered up to the limit
+        opcodes = get_diff_opcodes(prev_lines, current_lines, prev_file_id,
+                                   current_file_id, file_enc)
+        rows = BudgetHtmlDiff().iter_table_rows(prev_lines, current_lines,
+                                                opcodes, True)
+        rows = list(itertools.islice(rows, TEXT_DIFF_MAX_ROWS + 1))
+        is_truncated = len(rows) > TEXT_DIFF_MAX_ROWS
+        diff_result_table = ''.join(rows[:TEXT_DIFF_MAX_ROWS])
 
     zipped = gen_path_link(path, repo.name)
 
@@ -1907,6 +1955,7 @@ def text_diff(request, repo_id):
         'current_commit': current_commit,
         'prev_commit': prev_commit,
         'diff_result_table': diff_result_table,
+        'is_truncated': is_truncated,
         'is_new_file': is_new_file,
         'referer': referer,
     })
@@ -2152,7 +2201,7 @@ def view_media_file_via_share_link(request):
         return render_error(request, 'File does not exist')
 
     # read file from cache, if hit
-    err_msg, file_content = get_file_content_from_cache(file_id, repo_id, shared_file_name)
+    err_msg, file_content = get_file_content_from_cache(repo, file_id, shared_file_name)
 
     if err_msg:
         return render_error(request, err_msg)
@@ -2221,25 +2270,19 @@ def view_media_file_via_public_wiki(request):
     return HttpResponseRedirect(dl_or_raw_url)
 
 
-def get_file_content_from_cache(file_id, repo_id, file_name):
-    err_msg = ''
-    file_content = ''
-
-    cache_key = normalize_cache_key(file_id)
-    # read file from cache, if hit
-    file_content = cache.get(cache_key)
-    if not file_content:
-        # otherwise, read file from database and update cache
-        access_token = seafile_api.get_fileserver_access_token(repo_id,
+def get_file_content_from_cache(repo, file_id, file_name):
+    """Return (error message, content) of ``file_id``, from file content
+    cache if possible.
+    """
+    def get_raw_path():
+        # get a token only if file is not in file content cache
+        access_token = seafile_api.get_fileserver_access_token(repo.id,
                 file_id, 'view', '', use_onetime=False)
-
         if not access_token:
-            err_msg = 'Unable to view file'
-            return err_msg, file_content
-
-        file_raw_path = gen_inner_file_get_url(access_token, file_name)
+            return None
+        return gen_inner_file_get_url(access_token, file_name)
 
-        err_msg, file_content, encode = repo_file_get(file_raw_path, 'auto')
-        cache.set(cache_key, file_content, 24 * 60 * 60)
+    err_msg, file_content, encode = repo_file_get(get_raw_path, 'auto',
+            get_content_cache_id(repo, file_id))
 
     return err_msg, file_content
@@ -16,7 +16,8 @@ from django.db.models import Q
 from django.conf import settings as dj_settings
 from django.core.urlresolvers import reverse
 from django.contrib import messages
-from django.http import HttpResponse, Http404, HttpResponseRedirect, HttpResponseNotAllowed
+from django.http import HttpResponse, Http404, HttpResponseRedirect, \
+    HttpResponseNotAllowed, FileResponse
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
 from django.utils.translation import ugettext as _
@@ -27,20 +28,23 @@ from seaserv import ccnet_threaded_rpc, seafserv_threaded_rpc, \
     seafile_api, get_group, get_group_members, ccnet_api, \
     get_related_users_by_org_repo
 from pysearpc import SearpcError
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 from seahub.base.accounts import User
 from seahub.base.models import UserLastLogin
 from seahub.base.decorators import sys_staff_required, require_POST
 from seahub.base.sudo_mode import update_sudo_mode_ts
-from seahub.base.templatetags.seahub_tags import tsstr_sec, email2nickname, \
+from seahub.base.templatetags.seahub_tags import email2nickname, \
     email2contact_email
 from seahub.auth import authenticate
 from seahub.auth.decorators import login_required, login_required_ajax
+from seahub.auth.identity_cache import invalidate_user_identity
 from seahub.constants import GUEST_USER, DEFAULT_USER, DEFAULT_ADMIN, \
         SYSTEM_ADMIN, DAILY_ADMIN, AUDIT_ADMIN, HASH_URLS, DEFAULT_ORG
 from seahub.institutions.models import (Institution, InstitutionAdmin,
                                         InstitutionQuota)
-from seahub.institutions.utils import get_institution_space_usage
+from seahub.institutions.utils import get_institution_space_usage, \
+    update_user_quota
 from seahub.invitations.models import Invitation
 from seahub.role_permissions.utils import get_available_roles, \
         get_available_admin_roles
@@ -59,6 +63,8 @@ from seahub.utils.rpc import mute_seafile_api
 from seahub.utils.sysinfo import get_platform_name
 from seahub.utils.mail import send_html_email_with_dj_template
 from seahub.utils.ms_excel import write_xls
+from seahub.utils.export import start_export_job, get_export_job, \
+    EXPORT_FORMATS, EXPORT_WAIT_TIMEOUT, STATUS_DONE, STATUS_FAILED
 from seahub.utils.user_permissions import get_basic_user_roles, \
         get_user_role, get_basic_admin_roles
 from seahub.utils.auth import get_login_bg_image_path
@@ -395,134 +401,70 @@ def sys_user_admin(request):
             'institutions': institutions,
         })
 
-@login_required
-@sys_staff_required
-def sys_useradmin_export_excel(request):
-    """ Export all users from database to excel
+def _export_response(request, name):
+    """Start exporting ``name`` ('users' or 'groups') in background, or
+    return the file/progress of the job given by ``job_id``.
     """
-
     next = request.META.get('HTTP_REFERER', None)
     if not next:
         next = SITE_ROOT
 
-    try:
-        users = ccnet_api.get_emailusers('DB', -1, -1) + \
-                ccnet_api.get_emailusers('LDAPImport', -1, -1)
-    except Exception as e:
-        logger.error(e)
-        messages.error(request, _(u'Failed to export Excel'))
-        return HttpResponseRedirect(next)
-
-    if is_pro_version():
-        is_pro = True
-    else:
-        is_pro = False
-
-    if is_pro:
-        head = [_("Email"), _("Name"), _("Contact Email"), _("Status"), _("Role"),
-                _("Space Usage") + "(MB)", _("Space Quota") + "(MB)",
-                _("Create At"), _("Last Login"), _("Admin"), _("LDAP(imported)"),]
+    username = request.user.username
+    job_id = request.GET.get('job_id', '')
+    if job_id:
+        job = get_export_job(job_id, username)
     else:
-        head = [_("Email"), _("Name"), _("Contact Email"), _("Status"),
-                _("Space Usage") + "(MB)", _("Space Quota") + "(MB)",
-                _("Create At"), _("Last Login"), _("Admin"), _("LDAP(imported)"),]
-
-    # only operate 100 users for every `for` loop
-    looped = 0
-    limit = 100
-    data_list = []
-
-    while looped < len(users):
-
-        current_users = users[looped:looped+limit]
-
-        last_logins = UserLastLogin.objects.filter(username__in=[x.email \
-                for x in current_users])
-        user_profiles = Profile.objects.filter(user__in=[x.email \
-                for x in current_users])
-
-        for user in current_users:
-            # populate name and contact email
-            user.contact_email = ''
-            user.name = ''
-            for profile in user_profiles:
-                if profile.user == user.email:
-                    user.contact_email = profile.contact_email
-                    user.name = profile.nickname
+        file_format = request.GET.get('format', 'xlsx')
+        if file_format not in EXPORT_FORMATS:
+            file_format = 'xlsx'
 
-            # populate space usage and quota
-            MB = get_file_size_unit('MB')
-
-            _populate_user_quota_usage(user)
-            if user.space_usage > 0:
-                try:
-                    space_usage_MB = round(float(user.space_usage) / MB, 2)
-                except Exception as e:
-                    logger.error(e)
-                    space_usage_MB = '--'
-            else:
-                space_usage_MB = ''
-
-            if user.space_quota > 0:
-                try:
-                    space_quota_MB = round(float(user.space_quota) / MB, 2)
-                except Exception as e:
-                    logger.error(e)
-                    space_quota_MB = '--'
-            else:
-                space_quota_MB = ''
-
-            # populate user last login time
-            user.last_login = None
-            for last_login in last_logins:
-                if last_login.username == user.email:
-                    user.last_login = last_login.last_login
+        job = start_export_job(name, username, file_format)
+        # small exports are downloaded right away
+        try:
+            job['future'].result(EXPORT_WAIT_TIMEOUT)
+        except FuturesTimeoutError:
+            pass
+        job = get_export_job(job['id'], username)
 
-            if user.is_active:
-                status = _('Active')
-            else:
-                status = _('Inactive')
-
-            create_at = tsstr_sec(user.ctime) if user.ctime else ''
-            last_login = user.last_login.strftime("%Y-%m-%d %H:%M:%S") if \
-                user.last_login else ''
-
-            is_admin = _('Yes') if user.is_staff else ''
-            ldap_import = _('Yes') if user.source == 'LDAPImport' else ''
-
-            if is_pro:
-                if user.role:
-                    if user.role == GUEST_USER:
-                        role = _('Guest')
-                    elif user.role == DEFAULT_USER:
-                        role = _('Default')
-                    else:
-                        role = user.role
-                else:
-                    role = _('Default')
+    if not job or job['status'] == STATUS_FAILED:
+        messages.error(request, _(u'Failed to export Excel'))
+        return HttpResponseRedirect(next)
 
-                row = [user.email, user.name, user.contact_email, status, role,
-                        space_usage_MB, space_quota_MB, create_at,
-                        last_login, is_admin, ldap_import]
-            else:
-                row = [user.email, user.name, user.contact_email, status,
-                        space_usage_MB, space_quota_MB, create_at,
-                        last_login, is_admin, ldap_import]
+    if job['status'] == STATUS_DONE:
+        try:
+            f = open(job['path'], 'rb')
+        except IOError as e:
+            logger.error(e)
+            messages.error(request, _(u'Failed to export Excel'))
+            return HttpResponseRedirect(next)
 
-            data_list.append(row)
+        content_type = 'text/csv' if job['format'] == 'csv' else \
+            'application/ms-excel'
+        response = FileResponse(f, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename=%s' % \
+            job['filename']
+        return response
 
-        # update `looped` value when `for` loop finished
-        looped += limit
+    if request.is_ajax():
+        content_type = 'application/json; charset=utf-8'
+        result = {
+            'job_id': job['id'],
+            'status': job['status'],
+            'done': job['done'],
+            'total': job['total'],
+        }
+        return HttpResponse(json.dumps(result), content_type=content_type)
 
-    wb = write_xls('users', head, data_list)
-    if not wb:
-        messages.error(request, _(u'Failed to export Excel'))
-        return HttpResponseRedirect(next)
+    return render(request, 'sysadmin/export_progress.html', {
+        'job': job,
+    })
 
-    response = HttpResponse(content_type='application/ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=users.xlsx'
-    wb.save(response)
-    return response
+@login_required
+@sys_staff_required
+def sys_useradmin_export_excel(request):
+    """ Export all users from database to excel
+    """
+    return _export_response(request, 'users')
 
 @login_required
 @sys_staff_required
@@ -866,7 +808,7 @@ def user_set_quota(request, email):
         org = ccnet_api.get_orgs_by_user(email)
         try:
             if not org:
-                seafile_api.set_user_quota(email, space_quota)
+                update_user_quota(email, space_quota)
             else:
                 org_id = org[0].org_id
                 org_quota_mb = seafserv_threaded_rpc.get_org_quota(org_id) / get_file_size_unit('MB')
@@ -1263,34 +1205,7 @@ def user_add(request):
 def sys_group_admin_export_excel(request):
     """ Export all groups to excel
     """
-
-    next = request.META.get('HTTP_REFERER', None)
-    if not next:
-        next = SITE_ROOT
-
-    try:
-        groups = ccnet_threaded_rpc.get_all_groups(-1, -1)
-    except Exception as e:
-        logger.error(e)
-        messages.error(request, _(u'Failed to export Excel'))
-        return HttpResponseRedirect(next)
-
-    head = [_("Name"), _("Creator"), _("Create At")]
-    data_list = []
-    for grp in groups:
-        create_at = tsstr_sec(grp.timestamp) if grp.timestamp else ''
-        row = [grp.group_name, grp.creator_name, create_at]
-        data_list.append(row)
-
-    wb = write_xls('groups', head, data_list)
-    if not wb:
-        messages.error(request, _(u'Failed to export Excel'))
-        return HttpResponseRedirect(next)
-
-    response = HttpResponse(content_type='application/ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=groups.xlsx'
-    wb.save(response)
-    return response
+    return _export_response(request, 'groups')
 
 @login_required
 @sys_staff_required
@@ -1470,6 +1385,7 @@ def sys_org_remove(request, org_id):
     users = ccnet_threaded_rpc.get_org_emailusers(org.url_prefix, -1, -1)
     for u in users:
         ccnet_threaded_rpc.remove_org_user(org_id, u.email)
+        invalidate_user_identity(u.email)
 
     groups = ccnet_threaded_rpc.get_org_groups(org.org_id, -1, -1)
     for g in groups:
@@ -2099,7 +2015,7 @@ def batch_add_user(request):
                     space_quota_mb = int(row[4])
                     if space_quota_mb >= 0:
                         space_quota = int(space_quota_mb) * get_file_size_unit('MB')
-                        seafile_api.set_user_quota(username, space_quota)
+                        update_user_quota(username, space_quota)
                 except Exception as e:
                     logger.error(e)
 
@@ -3,7 +3,6 @@
 import os
 import re
 import stat
-import urllib2
 import logging
 import posixpath
 
@@ -18,6 +17,8 @@ from seahub.utils.slugify import slugify
 from seahub.utils import gen_file_get_url, get_file_type_and_ext, \
     gen_inner_file_get_url, get_site_scheme_and_netloc
 from seahub.utils.file_types import IMAGE
+from seahub.utils.file_content_cache import get_content_cache_id, \
+    read_file_content
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
 from models import WikiPageMissing, WikiDoesNotExist, GroupWiki, PersonalWiki
 
@@ -88,20 +89,23 @@ def get_group_wiki_repo(group, username):
             return repo
     raise WikiDoesNotExist
     
+def get_wiki_page_content(repo, dirent):
+    """Return content of page ``dirent``, from file content cache if
+    possible.
+    """
+    return read_file_content(get_content_cache_id(repo, dirent.obj_id),
+            lambda: get_inner_file_url(repo, dirent.obj_id, dirent.obj_name))
+
 def get_personal_wiki_page(username, page_name):
     repo = get_personal_wiki_repo(username)
     dirent = get_wiki_dirent(repo.id, page_name)
-    url = get_inner_file_url(repo, dirent.obj_id, dirent.obj_name)
-    file_response = urllib2.urlopen(url)
-    content = file_response.read()
+    content = get_wiki_page_content(repo, dirent)
     return content, repo, dirent
 
 def get_group_wiki_page(username, group, page_name):
     repo = get_group_wiki_repo(group, username)
     dirent = get_wiki_dirent(repo.id, page_name)
-    url = get_inner_file_url(repo, dirent.obj_id, dirent.obj_name)
-    file_response = urllib2.urlopen(url)
-    content = file_response.read()
+    content = get_wiki_page_content(repo, dirent)
     return content, repo, dirent
 
 def get_wiki_pages(repo):
@@ -5,7 +5,6 @@ import os
 import json
 import logging
 import urllib2
-import requests
 import hashlib
 import urlparse
 import posixpath
@@ -13,7 +12,7 @@ import datetime
 
 from rest_framework.views import APIView
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.core.cache import cache
 
 from pysearpc import SearpcError
@@ -23,6 +22,8 @@ from seahub.base.accounts import User, ANONYMOUS_EMAIL
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.utils import gen_inner_file_get_url, \
     gen_inner_file_upload_url, is_pro_version
+from seahub.utils.file_transfer import TransferStats, iter_file_chunks, \
+    post_file_stream
 from seahub.settings import SITE_ROOT
 
 from seahub.wopi.utils import get_file_info_by_token
@@ -352,13 +353,21 @@ class WOPIFilesContentsView(APIView):
         inner_path = gen_inner_file_get_url(fileserver_token, file_name)
 
         try:
-            file_content = urllib2.urlopen(inner_path).read()
+            file_resp = urllib2.urlopen(inner_path)
         except urllib2.URLError as e:
             logger.error(e)
             return HttpResponse(json.dumps({}), status=500,
                                 content_type=json_content_type)
 
-        return HttpResponse(file_content, content_type="application/octet-stream")
+        stats = TransferStats('WOPI get file %s' % file_path)
+        response = StreamingHttpResponse(iter_file_chunks(file_resp, stats),
+                content_type="application/octet-stream")
+
+        content_length = file_resp.info().getheader('Content-Length')
+        if content_length:
+            response['Content-Length'] = content_length
+
+        return response
 
     @access_token_check
     def post(self, request, file_id, format=None):
@@ -370,8 +379,6 @@ class WOPIFilesContentsView(APIView):
         file_path= info_dict['file_path']
 
         try:
-            file_obj = request.read()
-
             # get file update url
             fake_obj_id = {'online_office_update': True,}
             token = seafile_api.get_fileserver_access_token(repo_id,
@@ -383,13 +390,19 @@ class WOPIFilesContentsView(APIView):
 
             update_url = gen_inner_file_upload_url('update-api', token)
 
-            # update file
-            files = {
-                'file': file_obj,
+            # update file, read request body while sending it to fileserver
+            try:
+                file_size = int(request.META.get('CONTENT_LENGTH'))
+            except (TypeError, ValueError):
+                file_size = None
+
+            fields = {
                 'file_name': os.path.basename(file_path),
                 'target_file': file_path,
             }
-            requests.post(update_url, files=files)
+            stats = TransferStats('WOPI update file %s' % file_path)
+            post_file_stream(update_url, fields, 'file', request, file_size,
+                    stats)
         except Exception as e:
             logger.error(e)
             return HttpResponse(json.dumps({}), status=500,
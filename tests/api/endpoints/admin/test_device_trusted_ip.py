@@ -74,3 +74,17 @@ class DeviceAccessibleIpSetting(BaseTestCase):
         ip_list = [{'ip': '111.1.*.2'}, {'ip': '111.1.*.*'}, {'ip': '111.*.*.2'}]
         new_ip_list = sorted(ip_list, cmp = cmp_ip)
         assert new_ip_list == [ip_list[0], ip_list[1], ip_list[2]]
+
+        ip_list = [{'ip': '10.0.0.0/8'}, {'ip': 'fd00::/8'}, {'ip': '111.1.*.2'}]
+        new_ip_list = sorted(ip_list, cmp = cmp_ip)
+        assert new_ip_list == [ip_list[2], ip_list[0], ip_list[1]]
+
+    @patch('seahub.api2.permissions.IsProVersion.has_permission')
+    def test_can_post_cidr(self, mock_IsProVersion):
+        mock_IsProVersion.return_value= True
+        for ip in ('10.0.0.0/8', 'fd00::/8', '2001:db8::1'):
+            resp = self.client.post(self.url, {'ipaddress': ip})
+            assert resp.status_code == 201
+
+        resp = self.client.post(self.url, {'ipaddress': '10.0.0.0/33'})
+        assert resp.status_code == 400
@@ -1,4 +1,5 @@
 import json
+from mock import patch
 from django.core.urlresolvers import reverse
 from seahub.test_utils import BaseTestCase
 from tests.common.utils import randstring
@@ -30,6 +31,29 @@ class AdminLibrariesTest(BaseTestCase):
         assert json_resp['name'] == searched_args
         assert searched_args in json_resp['repos'][0]['name']
 
+    def test_can_search_by_name_with_page(self):
+        self.login_as(self.admin)
+        url = self.libraries_url + '?name=%s&page=1&per_page=1' % \
+            self.repo.repo_name
+        resp = self.client.get(url)
+
+        json_resp = json.loads(resp.content)
+        assert len(json_resp['repos']) == 1
+        assert json_resp['repos'][0]['owner'] == self.user.username
+        assert json_resp['page_info']['current_page'] == 1
+
+    def test_can_search_by_owner(self):
+        self.login_as(self.admin)
+        url = self.libraries_url + '?owner=%s' % self.user.username
+        with patch('seahub.api2.endpoints.admin.libraries.seafile_api.get_repo_owner') as mock_get_owner:
+            resp = self.client.get(url)
+
+        json_resp = json.loads(resp.content)
+        assert self.repo.id in [r['id'] for r in json_resp['repos']]
+        assert json_resp['repos'][0]['owner'] == self.user.username
+        # owner is known, no need to look it up per library
+        assert not mock_get_owner.called
+
     def test_get_with_invalid_user_permission(self):
         self.login_as(self.user)
         resp = self.client.get(self.libraries_url)
@@ -12,6 +12,7 @@ from seahub.utils.timeutils import datetime_to_isoformat_timestr
 class FileOperationsInfoText(BaseTestCase):
     def setUp(self):
         self.login_as(self.admin)
+        self.clear_cache()
 
     @patch("seahub.api2.endpoints.admin.statistics.EVENTS_ENABLED")
     @patch("seahub.api2.endpoints.admin.statistics.is_pro_version")
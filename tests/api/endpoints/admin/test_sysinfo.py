@@ -9,6 +9,7 @@ class SysinfoTest(BaseTestCase):
 
     def setUp(self):
         self.login_as(self.admin)
+        self.clear_cache()
 
     def tearDown(self):
         self.remove_repo()
@@ -52,3 +53,16 @@ class SysinfoTest(BaseTestCase):
         assert len(json_resp) == 16
         assert json_resp['license_maxusers'] == 500
         assert json_resp['license_to'] == test_user
+
+    @patch('seahub.api2.endpoints.admin.sysinfo.is_pro_version')
+    def test_get_sysinfo_from_snapshot(self, mock_is_pro_version):
+        mock_is_pro_version.return_value = False
+
+        url = reverse('api-v2.1-sysinfo')
+        resp = self.client.get(url)
+        assert json.loads(resp.content)['is_pro'] is False
+
+        mock_is_pro_version.return_value = True
+        resp = self.client.get(url)
+        assert json.loads(resp.content)['is_pro'] is False
+        assert mock_is_pro_version.call_count == 1
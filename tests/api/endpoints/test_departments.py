@@ -0,0 +1,57 @@
+# Copyright (c) 2011-2016 Seafile Ltd.
+# -*- coding: utf-8 -*-
+import json
+import pytest
+pytestmark = pytest.mark.django_db
+
+from mock import patch
+from django.core.urlresolvers import reverse
+
+from seahub.test_utils import BaseTestCase
+from seahub.group.utils import get_user_group_ids, clear_user_group_ids_cache
+
+
+class DepartmentsTest(BaseTestCase):
+
+    def setUp(self):
+        self.login_as(self.user)
+        self.url = reverse('api-v2.1-all-departments')
+
+    def tearDown(self):
+        self.remove_group()
+        self.clear_cache()
+
+    @patch('seahub.api2.endpoints.departments.ccnet_api.list_all_departments')
+    def test_can_list_departments_of_user(self, mock_list_all_departments):
+        mock_list_all_departments.return_value = [self.group]
+
+        resp = self.client.get(self.url)
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert len(json_resp) == 1
+        assert json_resp[0]['id'] == self.group.id
+        assert json_resp[0]['name'] == self.group.group_name
+        assert json_resp[0]['avatar_url']
+
+    @patch('seahub.api2.endpoints.departments.ccnet_api.list_all_departments')
+    def test_skip_departments_user_not_in(self, mock_list_all_departments):
+        mock_list_all_departments.return_value = [self.group]
+
+        self.logout()
+        self.login_as(self.admin)
+
+        resp = self.client.get(self.url)
+        self.assertEqual(200, resp.status_code)
+        assert json.loads(resp.content) == []
+
+    def test_user_group_ids_cache(self):
+        username = self.user.username
+        assert self.group.id in get_user_group_ids(username)
+
+        with patch('seahub.group.utils.ccnet_api.get_groups') as mock_get_groups:
+            get_user_group_ids(username)
+            assert not mock_get_groups.called
+
+            mock_get_groups.return_value = []
+            clear_user_group_ids_cache(username)
+            assert get_user_group_ids(username) == set()
@@ -11,7 +11,7 @@ from seahub.test_utils import BaseTestCase
 from seahub.utils import check_filename_with_rename
 
 from tests.common.utils import randstring
-from seahub.settings import THUMBNAIL_ROOT
+from seahub.thumbnail.utils import get_thumbnail_image_path
 
 try:
     from seahub.settings import LOCAL_PRO_DEV_ENV
@@ -267,10 +267,10 @@ class DirViewTest(BaseTestCase):
 
         # prepare thumbnail
         size = 48
-        thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
+        thumbnail_file = get_thumbnail_image_path(file_id, size)
+        thumbnail_dir = os.path.dirname(thumbnail_file)
         if not os.path.exists(thumbnail_dir):
             os.makedirs(thumbnail_dir)
-        thumbnail_file = os.path.join(thumbnail_dir, file_id)
 
         with open(thumbnail_file, 'w'):
             pass
@@ -286,6 +286,41 @@ class DirViewTest(BaseTestCase):
         assert json_resp['dirent_list'][0]['name'] == image_file_name
         assert image_file_name in json_resp['dirent_list'][0]['encoded_thumbnail_src']
 
+    def test_get_not_modified(self):
+
+        self.login_as(self.user)
+
+        resp = self.client.get(self.url + '?t=f')
+        self.assertEqual(200, resp.status_code)
+        etag = resp['ETag']
+        assert etag
+
+        resp = self.client.get(self.url + '?t=f', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+
+        # other type of listing
+        resp = self.client.get(self.url + '?t=d', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+
+        # star file
+        resp = self.client.post(reverse('starredfiles'), {'repo_id': self.repo.id, 'p': self.file_path})
+        self.assertEqual(201, resp.status_code)
+
+        resp = self.client.get(self.url + '?t=f', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        assert resp['ETag'] != etag
+        json_resp = json.loads(resp.content)
+        assert json_resp['dirent_list'][0]['starred'] == True
+
+        # add file
+        etag = resp['ETag']
+        seafile_api.post_empty_file(self.repo_id, '/', randstring(6),
+                self.user_name)
+        resp = self.client.get(self.url + '?t=f', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert len(json_resp['dirent_list']) == 2
+
     def test_get_dir_with_invalid_perm(self):
         # login as admin, then get dir info in user's repo
         self.login_as(self.admin)
@@ -14,6 +14,15 @@ class GroupMembersTest(BaseTestCase):
     def tearDown(self):
         self.remove_group()
 
+    def test_can_list(self):
+        resp = self.client.get(self.endpoint)
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert len(json_resp) == 1
+        assert json_resp[0]['email'] == self.user.username
+        assert json_resp[0]['role'] == 'Owner'
+        assert json_resp[0]['avatar_url'] != ''
+
     def test_can_add(self):
         # add admin to group
         resp = self.client.post(self.endpoint, {
@@ -228,6 +228,62 @@ class NewReposApiTest(BaseTestCase):
         # do some file operation
 
 
+class ReposChangesTest(BaseTestCase):
+    def setUp(self):
+        self.login_as(self.user)
+        self.url = reverse('api2-repos') + '?type=mine'
+
+    def test_not_modified(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(200, resp.status_code)
+        etag = resp['ETag']
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, resp.status_code)
+
+        # new commit in library
+        self.create_file(repo_id=self.repo.id, parent_dir='/',
+                         filename='test.txt', username=self.user.username)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, resp.status_code)
+        assert resp['ETag'] != etag
+
+    def test_since(self):
+        resp = self.client.get(self.url)
+        token = resp['ETag'].strip('"')
+
+        resp = self.client.get(self.url + '&since=' + token)
+        json_resp = json.loads(resp.content)
+        assert json_resp['reset'] is False
+        assert json_resp['added'] == []
+        assert json_resp['changed'] == []
+        assert json_resp['removed'] == []
+
+        new_repo_id = self.create_repo(name='test-repo-2', desc='',
+                                       username=self.user.username,
+                                       passwd=None)
+        self.create_file(repo_id=self.repo.id, parent_dir='/',
+                         filename='test.txt', username=self.user.username)
+
+        resp = self.client.get(self.url + '&since=' + token)
+        json_resp = json.loads(resp.content)
+        assert [r['id'] for r in json_resp['added']] == [new_repo_id]
+        assert [r['id'] for r in json_resp['changed']] == [self.repo.id]
+        assert json_resp['removed'] == []
+        token = json_resp['token']
+
+        self.remove_repo(new_repo_id)
+        resp = self.client.get(self.url + '&since=' + token)
+        json_resp = json.loads(resp.content)
+        assert json_resp['removed'] == [{'type': 'repo', 'id': new_repo_id}]
+
+    def test_since_unknown_token(self):
+        resp = self.client.get(self.url + '&since=unknown')
+        json_resp = json.loads(resp.content)
+        assert json_resp['reset'] is True
+        assert self.repo.id in [r['id'] for r in json_resp['added']]
+
+
 # Uncomment following to test api performance.
 # class ReposApiTest2(BaseTestCase):
 #     def setUp(self):
@@ -4,7 +4,8 @@ import time
 from django.core.urlresolvers import reverse
 from django.test import override_settings
 
-from seahub.api2.throttling import SimpleRateThrottle
+from seahub.api2.throttling import SimpleRateThrottle, UserRateThrottle, \
+    local_buckets, get_reject_counts
 from seahub.test_utils import BaseTestCase
 
 
@@ -13,6 +14,7 @@ class ThrottingsTest(BaseTestCase):
     def setUp(self):
         # clear cache between every test case to avoid cache issue in throtting
         self.clear_cache()
+        local_buckets.clear()
 
         self.login_as(self.user)
 
@@ -29,6 +31,8 @@ class ThrottingsTest(BaseTestCase):
 
             time.sleep(0.1)
 
+        assert get_reject_counts(['user'])['user'] == 2
+
     @override_settings(REST_FRAMEWORK_THROTTING_WHITELIST=['127.0.0.1'])
     @patch.object(SimpleRateThrottle, 'get_rate')
     def test_whitelist(self, mock_get_rate):
@@ -39,3 +43,26 @@ class ThrottingsTest(BaseTestCase):
             assert res.status_code == 200
 
             time.sleep(0.1)
+
+    @patch.object(SimpleRateThrottle, 'get_rate')
+    def test_previous_window_is_weighted(self, mock_get_rate):
+        mock_get_rate.return_value = '10/minute'
+
+        now = [int(time.time() // 60) * 60.0]
+
+        class Throttle(UserRateThrottle):
+            timer = staticmethod(lambda: now[0])
+
+        class Request(object):
+            user = self.user
+            META = {}
+
+        for i in range(10):
+            assert Throttle().allow_request(Request(), None)
+        assert not Throttle().allow_request(Request(), None)
+
+        # half of the previous window is still in the period
+        now[0] += 90
+        local_buckets.clear()
+        results = [Throttle().allow_request(Request(), None) for i in range(6)]
+        assert results == [True] * 5 + [False]
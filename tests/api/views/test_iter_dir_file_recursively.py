@@ -0,0 +1,52 @@
+from seaserv import seafile_api
+
+from seahub.api2.views import iter_dir_file_recursively
+from seahub.test_utils import BaseTestCase
+from tests.common.utils import randstring
+
+
+class IterDirFileRecursivelyTest(BaseTestCase):
+
+    def setUp(self):
+        self.username = self.user.username
+        self.sub_folder_name = randstring(6)
+        seafile_api.post_dir(self.repo.id, self.folder,
+                self.sub_folder_name, self.username)
+
+    def tearDown(self):
+        self.remove_repo()
+
+    def test_can_walk_all(self):
+        dirent_list = list(iter_dir_file_recursively(self.username,
+            self.repo.id, '/'))
+
+        assert len(dirent_list) == 3
+        assert dirent_list[0]['type'] == 'dir'
+        assert dirent_list[1]['type'] == 'dir'
+        assert dirent_list[1]['name'] == self.sub_folder_name
+        assert dirent_list[1]['parent_dir'] == self.folder
+        assert dirent_list[2]['type'] == 'file'
+        assert dirent_list[2]['modifier_email'] == self.username
+        assert 'modifier_name' in dirent_list[2]
+
+    def test_dirent_type(self):
+        dirent_list = list(iter_dir_file_recursively(self.username,
+            self.repo.id, '/', dirent_type='dir'))
+
+        assert len(dirent_list) == 2
+        for dirent in dirent_list:
+            assert dirent['type'] == 'dir'
+
+    def test_max_depth(self):
+        dirent_list = list(iter_dir_file_recursively(self.username,
+            self.repo.id, '/', max_depth=1))
+
+        assert len(dirent_list) == 2
+        for dirent in dirent_list:
+            assert dirent['parent_dir'] == '/'
+
+    def test_max_entries(self):
+        dirent_list = list(iter_dir_file_recursively(self.username,
+            self.repo.id, '/', max_entries=1))
+
+        assert len(dirent_list) == 1
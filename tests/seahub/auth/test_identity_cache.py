@@ -0,0 +1,78 @@
+from mock import patch
+from django.test import RequestFactory
+
+from seahub.api2.models import TokenV2
+from seahub.auth.identity_cache import get_cached_user, get_cached_token, \
+    get_user_with_cache, invalidate_user_identity
+from seahub.base.accounts import User
+from seahub.base.middleware import BaseMiddleware
+from seahub.role_permissions.models import AdminRole
+from seahub.test_utils import BaseTestCase
+
+
+class IdentityCacheTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+
+    def test_get_user_with_cache(self):
+        assert get_cached_user(self.user.username) is None
+
+        user = get_user_with_cache(self.user.username)
+        assert user.username == self.user.username
+
+        cached_user = get_cached_user(self.user.username)
+        assert cached_user.username == self.user.username
+        assert cached_user.is_active == user.is_active
+        assert cached_user.is_staff == user.is_staff
+
+        invalidate_user_identity(self.user.username)
+        assert get_cached_user(self.user.username) is None
+
+    def test_user_not_exists(self):
+        with self.assertRaises(User.DoesNotExist):
+            get_user_with_cache('not-exist@test.com')
+
+    def test_invalidate_when_user_saved(self):
+        user = get_user_with_cache(self.user.username)
+        assert get_cached_user(self.user.username) is not None
+
+        user.is_active = False
+        user.save()
+        assert get_cached_user(self.user.username) is None
+
+    def test_invalidate_when_admin_role_changed(self):
+        get_user_with_cache(self.admin.username)
+        assert get_cached_user(self.admin.username) is not None
+
+        AdminRole.objects.add_admin_role(self.admin.username, 'audit_admin')
+        assert get_cached_user(self.admin.username) is None
+
+    def test_invalidate_when_token_deleted(self):
+        token = TokenV2.objects.get_or_create_token(self.user.username,
+                'windows', 'fake_device_id', 'fake_device_name', '4.1.0',
+                'windows 10', '127.0.0.1')
+
+        assert get_cached_token(TokenV2, token.key).key == token.key
+
+        token.delete()
+        with self.assertRaises(TokenV2.DoesNotExist):
+            get_cached_token(TokenV2, token.key)
+
+    @patch('seahub.base.middleware.MULTI_TENANCY', True)
+    @patch('seahub.base.middleware.CLOUD_MODE', True)
+    @patch('seaserv.ccnet_api.get_orgs_by_user')
+    def test_org_of_request_user(self, mock_get_orgs_by_user):
+        org = type('Org', (object, ), {'org_id': 1, 'org_name': 'org',
+            'url_prefix': 'org', 'creator': self.user.username, 'ctime': 0,
+            'is_staff': True})()
+        mock_get_orgs_by_user.return_value = [org]
+
+        # the second request gets org from cache
+        for i in range(2):
+            request = RequestFactory().get('/')
+            request.user = self.user
+            BaseMiddleware().process_request(request)
+            assert request.user.org.org_id == 1
+            assert request.user.org.is_staff is True
+
+        assert mock_get_orgs_by_user.call_count == 1
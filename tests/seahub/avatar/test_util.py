@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.cache import cache
+from mock import patch
+
+from seahub.avatar.models import Avatar, AvatarIndex
+from seahub.avatar.util import avatar_urls, get_avatar_infos, \
+    get_default_avatar_url, get_cache_key
+from seahub.test_utils import BaseTestCase
+
+
+class GetAvatarInfosTest(BaseTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_default_avatar(self):
+        infos = get_avatar_infos([self.user.username], 80)
+        assert infos[self.user.username] == (get_default_avatar_url(), True, None)
+
+        key = get_cache_key(self.user.username, 80, 'api_avatar_url')
+        assert cache.get(key) == (get_default_avatar_url(), True, None)
+
+    def test_read_from_index(self):
+        date_uploaded = datetime.datetime(2018, 1, 1)
+        AvatarIndex.objects.create(emailuser=self.user.username, size=80,
+                                   url='/media/avatars/a.png',
+                                   date_uploaded=date_uploaded)
+
+        with patch.object(Avatar.objects, 'filter') as mock_filter:
+            urls = avatar_urls([self.user.username, self.admin.username], 80)
+
+        assert urls[self.user.username] == '/media/avatars/a.png'
+        assert urls[self.admin.username] == get_default_avatar_url()
+        assert mock_filter.call_args[1]['emailuser__in'] == [self.admin.username]
+
+    def test_index_cleared_when_avatar_deleted(self):
+        AvatarIndex.objects.create(emailuser=self.user.username, size=80,
+                                   url='/media/avatars/a.png',
+                                   date_uploaded=datetime.datetime.now())
+        avatar = Avatar(emailuser=self.user.username, primary=True)
+        avatar.save()
+        assert AvatarIndex.objects.filter(emailuser=self.user.username).count() == 0
@@ -1,7 +1,10 @@
+import hashlib
+
 from django.conf import settings
 from django.db import connection
 
-from seahub.base.database_storage import DatabaseStorage
+from seahub.base.database_storage import DatabaseStorage, \
+    BinaryDatabaseStorage
 from seahub.test_utils import BaseTestCase
 
 
@@ -52,3 +55,47 @@ class DatabaseStorageTest(BaseTestCase):
         storage._save('name', open(__file__))
 
         assert storage.modified_time('name') is not None
+
+
+class BinaryDatabaseStorageTest(BaseTestCase):
+    def setUp(self):
+        connection.cursor().execute('''CREATE TABLE IF NOT EXISTS `avatar_uploaded_file` (`filename` TEXT NOT NULL, `filename_md5` CHAR(32) NOT NULL PRIMARY KEY, `sha1` CHAR(40) NOT NULL, `size` INTEGER NOT NULL, `mtime` datetime NOT NULL);''')
+        connection.cursor().execute('''CREATE TABLE IF NOT EXISTS `avatar_uploaded_blob` (`sha1` CHAR(40) NOT NULL PRIMARY KEY, `data` MEDIUMBLOB NOT NULL);''')
+        self.storage = BinaryDatabaseStorage(options={
+            'table': 'avatar_uploaded_file',
+            'blob_table': 'avatar_uploaded_blob',
+            'base_url': '%simage-view/' % settings.SITE_ROOT,
+        })
+
+    def tearDown(self):
+        connection.cursor().execute("DROP TABLE `avatar_uploaded_file`;")
+        connection.cursor().execute("DROP TABLE `avatar_uploaded_blob`;")
+
+    def _count_blobs(self):
+        cursor = connection.cursor()
+        cursor.execute('SELECT COUNT(*) FROM `avatar_uploaded_blob`')
+        return cursor.fetchone()[0]
+
+    def test_save_and_open(self):
+        content = open(__file__, 'rb').read()
+        self.storage.save_data('name', content)
+
+        assert self.storage.open('name').read() == content
+        assert self.storage.size('name') == len(content)
+        assert self.storage.read_blob(hashlib.sha1(content).hexdigest(),
+                                      3, 5) == content[3:8]
+
+    def test_same_content_saved_once(self):
+        self.storage.save_data('name1', 'abc')
+        self.storage.save_data('name2', 'abc')
+        assert self._count_blobs() == 1
+
+        self.storage.delete('name1')
+        assert self._count_blobs() == 1
+        self.storage.delete('name2')
+        assert self._count_blobs() == 0
+
+    def test_url(self):
+        self.storage.save_data('name', 'abc')
+        assert self.storage.url('name').endswith(
+            'image-view/name?v=' + hashlib.sha1('abc').hexdigest())
@@ -0,0 +1,108 @@
+import pickle
+import shutil
+import tempfile
+import threading
+
+from mock import patch
+from django.test import TestCase
+from django.core.cache.backends.filebased import FileBasedCache
+
+from seahub.base.cache_backends import TieredCache, incr_counter
+
+SHARED_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+class TieredCacheTest(TestCase):
+
+    def new_cache(self, **options):
+        options.setdefault('SHARED_CACHE', SHARED_CACHE)
+        options.setdefault('GENERATION_CHECK_INTERVAL', 0)
+        return TieredCache('', {'OPTIONS': options})
+
+    def setUp(self):
+        self.cache = self.new_cache()
+        self.cache.clear()
+
+    def test_get_set(self):
+        self.cache.set('NICKNAME_foo', 'foo')
+        assert self.cache.get('NICKNAME_foo') == 'foo'
+        assert self.cache.get('NICKNAME_foo') == 'foo'
+
+        self.cache.set('other_key', [1, 2])
+        assert self.cache.get('other_key') == [1, 2]
+        assert self.cache.get('not_exists', 'default') == 'default'
+
+        stats = self.cache.get_stats()
+        assert stats['NICKNAME_']['local_hits'] == 1
+        assert stats['other']['misses'] == 1
+
+    def test_invalidate_across_processes(self):
+        other = self.new_cache()
+
+        self.cache.set('NICKNAME_foo', 'foo')
+        assert other.get('NICKNAME_foo') == 'foo'
+
+        self.cache.set('NICKNAME_foo', 'bar')
+        assert other.get('NICKNAME_foo') == 'bar'
+
+        self.cache.delete('NICKNAME_foo')
+        assert other.get('NICKNAME_foo') is None
+
+    def test_local_hit_survives_unrelated_set(self):
+        other = self.new_cache()
+
+        self.cache.set('NICKNAME_a', 'a')
+        assert other.get('NICKNAME_a') == 'a'
+
+        # fills of missing keys, by another process and by this one
+        self.cache.set('NICKNAME_b', 'b')
+        other.set('NICKNAME_c', 'c')
+        self.cache.set_many({'NICKNAME_d': 'd'})
+        # overwrite of an unrelated key
+        self.cache.set('NICKNAME_b', 'bb')
+
+        assert other.get('NICKNAME_a') == 'a'
+        assert other.get_stats()['NICKNAME_']['local_hits'] == 1
+
+    def test_get_many(self):
+        self.cache.set_many({'NICKNAME_foo': 'foo', 'other_key': 'bar'})
+
+        assert self.cache.get_many(['NICKNAME_foo', 'other_key', 'none']) == \
+            {'NICKNAME_foo': 'foo', 'other_key': 'bar'}
+
+    def test_lru_eviction(self):
+        cache = self.new_cache(LOCAL_MAX_ENTRIES=2)
+        for i in range(3):
+            cache.set('CHAR2PINYIN_%s' % i, i)
+        for i in range(3):
+            assert cache.get('CHAR2PINYIN_%s' % i) == i
+
+        assert len(cache._local) == 2
+        assert cache.get_stats()['CHAR2PINYIN_']['evictions'] >= 1
+
+    def test_incr_counter_on_file_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = FileBasedCache(cache_dir, {})
+            assert incr_counter(cache, 'counter') == 1
+            assert incr_counter(cache, 'counter', 2) == 3
+            # only existing counters are updated without initial value
+            assert incr_counter(cache, 'missing', initial=None) is None
+            assert cache.get('missing') is None
+            # counters never expire by default, the expiry is stored first
+            with open(cache._key_to_file('counter'), 'rb') as f:
+                assert pickle.load(f) is None
+
+            # no scan of the whole cache dir on each increment
+            with patch.object(cache, '_cull') as cull:
+                threads = [threading.Thread(target=incr_counter,
+                                            args=(cache, 'counter'))
+                           for i in range(10)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                assert not cull.called
+            assert cache.get('counter') == 13
+        finally:
+            shutil.rmtree(cache_dir)
@@ -0,0 +1,37 @@
+from mock import patch
+
+from seahub.base import constance_backends
+from seahub.base.constance_backends import SnapshotDatabaseBackend
+from seahub.test_utils import BaseTestCase
+
+
+class SnapshotDatabaseBackendTest(BaseTestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.backend = SnapshotDatabaseBackend()
+
+    def test_get_set(self):
+        assert self.backend.get('SITE_NAME') is None
+
+        self.backend.set('SITE_NAME', 'foo')
+        assert self.backend.get('SITE_NAME') == 'foo'
+        assert dict(self.backend.mget(['SITE_NAME', 'SITE_TITLE'])) == \
+            {'SITE_NAME': 'foo'}
+
+    def test_read_from_snapshot(self):
+        self.backend.set('SITE_NAME', 'foo')
+        self.backend.get('SITE_NAME')
+
+        with patch.object(SnapshotDatabaseBackend, '_load_snapshot') as load:
+            for i in range(10):
+                assert self.backend.get('SITE_NAME') == 'foo'
+            assert load.call_count == 0
+
+    @patch.object(constance_backends, 'CONSTANCE_SNAPSHOT_CHECK_INTERVAL', 0)
+    def test_reload_after_set_by_other_process(self):
+        other = SnapshotDatabaseBackend()
+        assert other.get('SITE_NAME') is None
+
+        self.backend.set('SITE_NAME', 'foo')
+        assert other.get('SITE_NAME') == 'foo'
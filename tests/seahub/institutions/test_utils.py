@@ -0,0 +1,56 @@
+from mock import patch
+
+from seahub.institutions.models import Institution, InstitutionQuota
+from seahub.institutions.utils import get_institution_space_usage, \
+    get_institution_available_quota, update_user_quota
+from seahub.profile.models import Profile
+from seahub.test_utils import BaseTestCase
+
+USAGES = {}
+QUOTAS = {}
+
+
+class InstitutionTotalsTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+        self.inst = Institution.objects.create(name='inst_test')
+        InstitutionQuota.objects.create(institution=self.inst, quota=100)
+        for email in (self.user.username, self.admin.username):
+            p = Profile.objects.add_or_update(email, '')
+            p.institution = self.inst.name
+            p.save()
+
+        USAGES.clear()
+        USAGES.update({self.user.username: 10, self.admin.username: 20})
+        QUOTAS.clear()
+        QUOTAS.update({self.user.username: 30, self.admin.username: 40})
+
+        patcher = patch('seahub.institutions.utils.seafile_api')
+        self.mock_api = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_api.get_user_self_usage.side_effect = USAGES.get
+        self.mock_api.get_user_quota.side_effect = QUOTAS.get
+
+    def test_totals_are_cached(self):
+        assert get_institution_space_usage(self.inst) == 30
+        assert get_institution_available_quota(self.inst) == 30
+
+        assert get_institution_space_usage(self.inst) == 30
+        assert self.mock_api.get_user_self_usage.call_count == 2
+
+    def test_update_user_quota(self):
+        assert get_institution_available_quota(self.inst) == 30
+
+        update_user_quota(self.user.username, 50)
+        self.mock_api.set_user_quota.assert_called_once_with(
+            self.user.username, 50)
+        assert get_institution_available_quota(self.inst) == 10
+
+    def test_member_leaves(self):
+        assert get_institution_space_usage(self.inst) == 30
+
+        p = Profile.objects.get_profile_by_user(self.admin.username)
+        p.institution = ''
+        p.save()
+        assert get_institution_space_usage(self.inst) == 10
+        assert get_institution_available_quota(self.inst) == 70
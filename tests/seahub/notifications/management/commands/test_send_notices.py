@@ -91,6 +91,17 @@ class CommandTest(BaseTestCase):
         self.assertEqual(len(mail.outbox), 1)
         assert mail.outbox[0].to[0] == 'contact@foo.com'
 
+    def test_send_one_email_per_user(self):
+        self.assertEqual(len(mail.outbox), 0)
+        for to_user in (self.user.username, self.user.username, 'a@a.com'):
+            UserNotification.objects.add_repo_share_msg(
+                to_user, repo_share_msg_to_json('bar@bar.com', self.repo.id, '/', None))
+
+        call_command('send_notices', workers=2)
+        self.assertEqual(len(mail.outbox), 2)
+        assert sorted([m.to[0] for m in mail.outbox]) == sorted(
+            ['a@a.com', self.user.username])
+
     def test_send_file_comment_notice(self):
         self.assertEqual(len(mail.outbox), 0)
 
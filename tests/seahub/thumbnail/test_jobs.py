@@ -0,0 +1,71 @@
+import threading
+
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail import jobs
+
+
+class ThumbnailJobsTest(BaseTestCase):
+
+    def setUp(self):
+        self.clear_cache()
+        self.file_id = 'a' * 40
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def fake_run_job(self, repo_id, file_id, path, size):
+        self.calls.append((file_id, size))
+        self.started.set()
+        self.release.wait(5)
+        return (True, 200)
+
+    def test_same_thumbnail_shares_one_job(self):
+        with patch.object(jobs, '_run_job', self.fake_run_job):
+            f1 = jobs.submit_thumbnail_job(self.repo.id, self.file_id, '/a.jpg', 48)
+            f2 = jobs.submit_thumbnail_job(self.repo.id, self.file_id, '/a.jpg', '48')
+            f3 = jobs.submit_thumbnail_job(self.repo.id, self.file_id, '/a.jpg', 96)
+            self.release.set()
+
+            assert f1 is f2
+            assert f1 is not f3
+            assert f1.result(5) == (True, 200)
+            assert f3.result(5) == (True, 200)
+
+        assert sorted(self.calls) == [(self.file_id, 48), (self.file_id, 96)]
+
+    def test_timed_out(self):
+        with patch.object(jobs, '_run_job', self.fake_run_job):
+            jobs.submit_thumbnail_job(self.repo.id, self.file_id, '/a.jpg', 48)
+            self.started.wait(5)
+            resp = jobs.run_thumbnail_job(self.repo.id, self.file_id,
+                                          '/a.jpg', 48, timeout=0.1)
+            self.release.set()
+
+        assert resp == (False, 500)
+
+    def test_queued_job_is_run_by_request(self):
+        # keep all threads busy, as prefetched thumbnails do
+        threads = jobs._get_executors()[0]
+        for i in range(threads._max_workers):
+            threads.submit(self.release.wait, 5)
+
+        with patch.object(jobs, '_run_job', lambda *args: (True, 200)):
+            resp = jobs.run_thumbnail_job(self.repo.id, self.file_id,
+                                          '/a.jpg', 48, timeout=1)
+            self.release.set()
+
+        assert resp == (True, 200)
+
+    def test_prefetch_skips_non_images(self):
+        with patch.object(jobs, '_run_job', self.fake_run_job):
+            self.release.set()
+            count = jobs.prefetch_thumbnails(self.repo.id, [
+                (self.file_id, '/a.jpg', 100),
+                ('b' * 40, '/b.txt', 100),
+                ('c' * 40, '/c.psd', 100),
+                ('d' * 40, '/d.png', 1024**3),
+            ], 48)
+
+        assert count == 1
@@ -0,0 +1,118 @@
+import os
+import time
+import shutil
+import tempfile
+
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail import store
+
+
+class ThumbnailStoreTest(BaseTestCase):
+
+    def setUp(self):
+        store.flush_stats()
+        self.clear_cache()
+        self.root = tempfile.mkdtemp()
+        self.patcher = patch.object(store, 'THUMBNAIL_ROOT', self.root)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, path, size, atime=None):
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write('x' * size)
+        if atime:
+            os.utime(path, (atime, atime))
+
+    def test_sharded_path(self):
+        file_id = 'abcdef' + '0' * 34
+        assert store.get_thumbnail_path(file_id, 48) == \
+            os.path.join(self.root, '48', 'ab', 'cd', file_id)
+
+    def test_migrate_legacy_layout(self):
+        file_id = 'a' * 40
+        # flat layout used before sharding
+        legacy_path = os.path.join(self.root, '48', file_id)
+        self.write(legacy_path, 10)
+
+        assert store.migrate_legacy_layout() == 1
+        assert store.thumbnail_exists(file_id, 48)
+        assert not os.path.exists(legacy_path)
+        # nothing left to move
+        assert store.migrate_legacy_layout() == 0
+
+    def test_evict_least_recently_used(self):
+        now = time.time()
+        old_id, new_id = 'a' * 40, 'b' * 40
+        self.write(store.get_thumbnail_path(old_id, 48), 100, now - 1000)
+        self.write(store.get_thumbnail_path(new_id, 48), 100, now)
+
+        total, count, size = store.evict(max_bytes=150)
+
+        assert (total, count, size) == (200, 1, 100)
+        assert not store.thumbnail_exists(old_id, 48)
+        assert store.thumbnail_exists(new_id, 48)
+        assert store.get_stats()['evictions'] == 1
+
+    def test_stats_are_flushed_periodically(self):
+        store.record_stat('hits')
+        store.record_stat('hits')
+        assert store.cache.get(store.STATS_CACHE_PREFIX + 'hits') is None
+
+        with patch.object(store, 'THUMBNAIL_STATS_FLUSH_INTERVAL', 0):
+            store.record_stat('hits')
+        assert store.cache.get(store.STATS_CACHE_PREFIX + 'hits') == 3
+        assert store.get_stats()['hits'] == 3
+
+    def test_evict_under_limit(self):
+        self.write(store.get_thumbnail_path('a' * 40, 48), 100)
+
+        assert store.evict(max_bytes=1000) == (100, 0, 0)
+
+    def test_read_thumbnail_refreshes_atime(self):
+        file_id = 'a' * 40
+        path = store.get_thumbnail_path(file_id, 48)
+        self.write(path, 10, time.time() - 100000)
+        mtime = os.stat(path).st_mtime
+
+        assert store.read_thumbnail(file_id, 48) == 'x' * 10
+        assert os.stat(path).st_atime > time.time() - 10
+        assert os.stat(path).st_mtime == mtime
+
+    def test_get_existing_thumbnails(self):
+        repo_id = self.repo.id
+        # two files in one shard, one in another
+        ids = ['aa' + 'a' * 38, 'aa' + 'b' * 38, 'bb' + 'c' * 38]
+        self.write(store.get_thumbnail_path(ids[0], 48), 10)
+        self.write(store.get_thumbnail_path(ids[2], 48), 10)
+
+        assert store.get_existing_thumbnails(repo_id, '/', ids, 48) == \
+            set([ids[0], ids[2]])
+
+        # existing ones are answered by the index of the folder now
+        with patch.object(store, '_scan_thumbnails') as scan:
+            scan.return_value = set()
+            assert store.get_existing_thumbnails(repo_id, '/', ids, 48) == \
+                set([ids[0], ids[2]])
+            scan.assert_called_once_with(set([ids[1]]), 48)
+
+        # created by any process
+        self.write(store.get_thumbnail_path(ids[1], 48), 10)
+        assert store.get_existing_thumbnails(repo_id, '/', ids, 48) == set(ids)
+
+    def test_evict_invalidates_index(self):
+        file_id = 'a' * 40
+        self.write(store.get_thumbnail_path(file_id, 48), 100)
+        assert store.get_existing_thumbnails(self.repo.id, '/', [file_id], 48) == \
+            set([file_id])
+
+        store.evict(max_bytes=50)
+
+        assert store.get_existing_thumbnails(self.repo.id, '/', [file_id], 48) == \
+            set()
@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail.utils import _create_thumbnails_common, \
+    get_thumbnail_targets
+
+
+class CreateThumbnailsTest(BaseTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.tmp_dir, 'a.jpg')
+        Image.new('RGB', (2000, 1000), (255, 0, 0)).save(self.image_path, 'JPEG')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_create_all_sizes_in_one_pass(self):
+        targets = [(s, os.path.join(self.tmp_dir, str(s), 'file_id'))
+                   for s in (1024, 192, 96, 48)]
+
+        assert _create_thumbnails_common(self.image_path, targets) == (True, 200)
+
+        for size, path in targets:
+            assert Image.open(path).size == (size, size / 2)
+            # no temp file left behind
+            assert os.listdir(os.path.dirname(path)) == ['file_id']
+
+    def test_get_thumbnail_targets(self):
+        targets = get_thumbnail_targets('a' * 40, 120)
+        sizes = [s for s, _ in targets]
+
+        assert 120 in sizes
+        assert sizes == sorted(sizes, reverse=True)
@@ -0,0 +1,48 @@
+from django.test import override_settings
+
+from seahub.test_utils import BaseTestCase
+from seahub.trusted_ip.models import TrustedIP
+from seahub.trusted_ip.utils import parse_ip_range, TrustedIPMatcher, \
+    is_trusted_ip
+
+
+class ParseIpRangeTest(BaseTestCase):
+    def test_parse(self):
+        assert parse_ip_range('1.2.3.4')[1:] == (0x01020304, 0x01020304)
+        assert parse_ip_range('1.2.*.*')[1:] == (0x01020000, 0x0102ffff)
+        assert parse_ip_range('10.0.0.0/8')[1:] == (0x0a000000, 0x0affffff)
+        assert parse_ip_range('fd00::/8')[1:] == (0xfd << 120, (0xfe << 120) - 1)
+
+    def test_invalid(self):
+        for pattern in ('1.*.3.4', '1.2.3.4/33', '1.2.3', 'abc', '::1/129'):
+            with self.assertRaises(ValueError):
+                parse_ip_range(pattern)
+
+
+class TrustedIPMatcherTest(BaseTestCase):
+    def test_match(self):
+        matcher = TrustedIPMatcher(['10.0.0.0/8', '10.1.*.*', '11.0.0.0/8',
+                                    '192.168.1.5', 'fd00::/8', 'invalid'])
+
+        assert matcher.match('10.2.3.4')
+        assert matcher.match('11.255.255.255')
+        assert matcher.match('192.168.1.5')
+        assert matcher.match('fd12::1')
+        assert matcher.match('::ffff:10.0.0.1')
+
+        assert not matcher.match('9.255.255.255')
+        assert not matcher.match('12.0.0.0')
+        assert not matcher.match('192.168.1.6')
+        assert not matcher.match('fe80::1')
+        assert not matcher.match('invalid')
+
+    @override_settings(ENABLE_LIMIT_IPADDRESS=True)
+    def test_reload_after_change(self):
+        self.clear_cache()
+        assert not is_trusted_ip('123.1.2.3')
+
+        TrustedIP.objects.get_or_create('123.1.0.0/16')
+        assert is_trusted_ip('123.1.2.3')
+
+        TrustedIP.objects.delete('123.1.0.0/16')
+        assert not is_trusted_ip('123.1.2.3')
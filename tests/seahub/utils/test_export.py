@@ -0,0 +1,52 @@
+import os
+import csv
+import shutil
+import tempfile
+
+import openpyxl
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils.export import export_to_file, iter_user_rows, \
+    get_all_users
+
+
+class ExportTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_export_users_xlsx(self):
+        path = os.path.join(self.tmp_dir, 'users.xlsx')
+        progress = []
+        count = export_to_file('users', path, 'xlsx',
+                               lambda done, total: progress.append(total))
+
+        ws = openpyxl.load_workbook(path).active
+        emails = [row[0].value for row in ws.rows][1:]
+        assert len(emails) == count
+        assert self.user.username in emails
+        assert progress[0] == count
+
+    def test_export_groups_csv(self):
+        path = os.path.join(self.tmp_dir, 'groups.csv')
+        export_to_file('groups', path, 'csv')
+
+        with open(path, 'rb') as f:
+            rows = list(csv.reader(f))
+        assert self.group.group_name in [row[0] for row in rows[1:]]
+
+    @patch('seahub.utils.export.get_quota_usage')
+    def test_iter_user_rows(self, mock_get_quota_usage):
+        mock_get_quota_usage.return_value = (10 ** 6, -2)
+        users = get_all_users()
+
+        rows = list(iter_user_rows(users, is_pro=False, batch_size=1))
+        assert len(rows) == len(users)
+        assert mock_get_quota_usage.call_count == len(users)
+
+        row = [r for r in rows if r[0] == self.user.username][0]
+        # space usage and quota
+        assert row[4:6] == [1.0, '']
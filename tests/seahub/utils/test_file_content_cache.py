@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+from mock import patch, MagicMock
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils import file_content_cache
+from seahub.utils.file_content_cache import get_cached_file_content, \
+    cache_file_content, read_file_content, evict_file_contents
+from seahub.views.file import repo_file_get
+
+OBJ_ID = 'a' * 40
+
+
+class FileContentCacheTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patcher = patch.object(file_content_cache,
+                                    'FILE_CONTENT_CACHE_DIR', self.tmp_dir)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_file_content(self):
+        assert get_cached_file_content(OBJ_ID) == (None, None)
+
+        cache_file_content(OBJ_ID, 'line 1\nline 2', 'utf-8')
+        assert get_cached_file_content(OBJ_ID) == ('line 1\nline 2', 'utf-8')
+        assert os.path.exists(os.path.join(self.tmp_dir, 'aa', OBJ_ID))
+
+    def test_invalid_obj_id(self):
+        cache_file_content('../etc', 'x')
+        assert get_cached_file_content('../etc') == (None, None)
+        assert get_cached_file_content(None) == (None, None)
+
+    def test_max_object_size(self):
+        with patch.object(file_content_cache,
+                          'FILE_CONTENT_CACHE_MAX_OBJECT_SIZE', 3):
+            cache_file_content(OBJ_ID, 'abcd')
+        assert get_cached_file_content(OBJ_ID) == (None, None)
+
+    def test_read_file_content(self):
+        get_url = MagicMock(return_value='http://fileserver/files/x')
+        with patch('urllib2.urlopen') as mock_urlopen:
+            mock_urlopen.return_value.read.return_value = 'content'
+            assert read_file_content(OBJ_ID, get_url) == 'content'
+            assert read_file_content(OBJ_ID, get_url) == 'content'
+
+        assert get_url.call_count == 1
+        assert mock_urlopen.call_count == 1
+
+    def test_evict_least_recently_read(self):
+        old_id, new_id = '1' * 40, '2' * 40
+        cache_file_content(old_id, 'x' * 100)
+        cache_file_content(new_id, 'y' * 100)
+        old_path = os.path.join(self.tmp_dir, '11', old_id)
+        os.utime(old_path, (1, 1))
+
+        evict_file_contents(150)
+        assert get_cached_file_content(old_id) == (None, None)
+        assert get_cached_file_content(new_id)[0] == 'y' * 100
+
+    def test_repo_file_get_stores_encoding(self):
+        with patch('seahub.views.file.urllib2.urlopen') as mock_urlopen:
+            mock_urlopen.return_value.read.return_value = u'中文'.encode('gbk')
+            err, content, encoding = repo_file_get('http://x', 'auto', OBJ_ID)
+            assert content == u'中文'
+
+            err, content, encoding2 = repo_file_get('http://x', 'auto', OBJ_ID)
+
+        assert mock_urlopen.call_count == 1
+        assert encoding2 == encoding
+        assert get_cached_file_content(OBJ_ID)[1] == encoding
+
+    def test_repo_file_get_gets_url_only_on_miss(self):
+        get_url = MagicMock(return_value='http://x')
+        with patch('seahub.views.file.urllib2.urlopen') as mock_urlopen:
+            mock_urlopen.return_value.read.return_value = 'content'
+            assert repo_file_get(get_url, 'auto', OBJ_ID)[1] == u'content'
+            assert repo_file_get(get_url, 'auto', OBJ_ID)[1] == u'content'
+
+            # evicted meanwhile
+            os.remove(os.path.join(self.tmp_dir, 'aa', OBJ_ID))
+            assert repo_file_get(get_url, 'auto', OBJ_ID)[1] == u'content'
+
+        assert get_url.call_count == 2
+        assert mock_urlopen.call_count == 2
@@ -0,0 +1,46 @@
+import io
+
+from django.test import SimpleTestCase
+
+from seahub.utils.file_transfer import ChunkIterReader, MultipartFileStream, \
+    TransferStats, iter_file_chunks, spool_file
+
+
+class FileTransferTest(SimpleTestCase):
+
+    def test_iter_file_chunks(self):
+        stats = TransferStats('test')
+        chunks = list(iter_file_chunks(io.BytesIO(b'a' * 10), stats, chunk_size=4))
+
+        assert chunks == [b'aaaa', b'aaaa', b'aa']
+        assert stats.bytes == 10
+
+    def test_chunk_iter_reader(self):
+        reader = ChunkIterReader(iter([b'ab', b'', b'cde']))
+
+        assert reader.read(1) == b'a'
+        assert reader.read(3) == b'bcd'
+        assert reader.read() == b'e'
+        assert reader.read() == b''
+
+    def test_spool_file(self):
+        tmp_file, size = spool_file(io.BytesIO(b'a' * 10))
+
+        assert size == 10
+        assert tmp_file.read() == b'a' * 10
+
+    def test_multipart_file_stream(self):
+        body = MultipartFileStream({'target_file': '/a.docx'}, 'file',
+                io.BytesIO(b'content'), 7)
+
+        data = b''
+        while True:
+            chunk = body.read(5)
+            if not chunk:
+                break
+            data += chunk
+
+        assert len(data) == len(body)
+        assert b'name="target_file"; filename="target_file"\r\n\r\n/a.docx\r\n' in data
+        assert b'name="file"; filename="file"\r\n\r\ncontent\r\n' in data
+        assert data.endswith(b'--%s--\r\n' % body.boundary)
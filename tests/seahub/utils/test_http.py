@@ -0,0 +1,20 @@
+import pytest
+
+from seahub.utils.http import parse_range
+from seahub.test_utils import BaseTestCase
+
+
+class ParseRangeTest(BaseTestCase):
+    def test_parse_range(self):
+        assert parse_range(None, 100) is None
+        assert parse_range('bytes=0-9', 100) == (0, 10)
+        assert parse_range('bytes=90-', 100) == (90, 100)
+        assert parse_range('bytes=-10', 100) == (90, 100)
+        assert parse_range('bytes=50-200', 100) == (50, 100)
+
+        # multiple ranges are not supported
+        assert parse_range('bytes=0-1,5-6', 100) is None
+
+    def test_not_satisfiable(self):
+        with pytest.raises(ValueError):
+            parse_range('bytes=100-', 100)
@@ -0,0 +1,40 @@
+import time
+
+from mock import patch, Mock
+
+from seahub.utils import system_metrics
+from seahub.utils.system_metrics import get_metrics, clear_metrics
+from seahub.test_utils import BaseTestCase
+
+
+class GetMetricsTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+
+    def test_computed_once(self):
+        compute = Mock(return_value={'count': 1})
+        assert get_metrics('test', compute) == {'count': 1}
+        assert get_metrics('test', compute) == {'count': 1}
+        assert compute.call_count == 1
+
+        clear_metrics('test')
+        get_metrics('test', compute)
+        assert compute.call_count == 2
+
+    @patch.object(system_metrics, '_get_executor')
+    def test_stale_refreshed_in_background(self, mock_get_executor):
+        compute = Mock(return_value=1)
+        get_metrics('test', compute)
+
+        compute.return_value = 2
+        now = time.time() + system_metrics.SYSTEM_METRICS_REFRESH_INTERVAL + 1
+        with patch.object(system_metrics.time, 'time', return_value=now):
+            # stale snapshot is returned, and refreshed only once
+            assert get_metrics('test', compute) == 1
+            assert get_metrics('test', compute) == 1
+
+        assert mock_get_executor.return_value.submit.call_count == 1
+        run = mock_get_executor.return_value.submit.call_args[0][0]
+        with patch.object(system_metrics, 'connection'):
+            run()
+        assert get_metrics('test', compute) == 2
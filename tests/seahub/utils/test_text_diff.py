@@ -0,0 +1,66 @@
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils.text_diff import diff_lines, group_opcodes, \
+    get_diff_opcodes, BudgetHtmlDiff
+
+
+def apply_opcodes(a, b, opcodes):
+    result = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+        result.extend(b[j1:j2])
+    return result
+
+
+class DiffLinesTest(BaseTestCase):
+    def test_diff(self):
+        a = ['a', 'b', 'c', 'd', 'e']
+        b = ['a', 'c', 'x', 'd', 'e', 'f']
+        opcodes = diff_lines(a, b)
+
+        assert apply_opcodes(a, b, opcodes) == b
+        assert opcodes == [('equal', 0, 1, 0, 1), ('delete', 1, 2, 1, 1),
+                           ('equal', 2, 3, 1, 2), ('insert', 3, 3, 2, 3),
+                           ('equal', 3, 5, 3, 5), ('insert', 5, 5, 5, 6)]
+
+    def test_diff_empty(self):
+        assert diff_lines([], []) == []
+        assert diff_lines([], ['a']) == [('insert', 0, 0, 0, 1)]
+
+    def test_fallback_when_out_of_time(self):
+        a = ['x', 'y'] * 50
+        b = ['y', 'x', 'x'] * 30
+        opcodes = diff_lines(a, b, time_budget=0)
+
+        assert apply_opcodes(a, b, opcodes) == b
+        assert opcodes == [('replace', 0, len(a), 0, len(b))]
+
+    def test_group_opcodes(self):
+        a = list('abcdefghijklmnop')
+        b = list('abcdefgXhijklmnop')
+        groups = group_opcodes(diff_lines(a, b), 2)
+
+        assert groups == [[('equal', 5, 7, 5, 7), ('insert', 7, 7, 7, 8),
+                           ('equal', 7, 9, 8, 10)]]
+
+    def test_cached_by_file_ids(self):
+        a, b = ['a'], ['b']
+        opcodes = get_diff_opcodes(a, b, '1' * 40, '2' * 40)
+
+        with patch('seahub.utils.text_diff.diff_lines') as mock_diff:
+            assert get_diff_opcodes(a, b, '1' * 40, '2' * 40) == opcodes
+            assert not mock_diff.called
+
+
+class BudgetHtmlDiffTest(BaseTestCase):
+    def test_rows(self):
+        a = ['same', 'old <b>', 'removed']
+        b = ['same', 'new <b>']
+        rows = list(BudgetHtmlDiff().iter_table_rows(a, b, diff_lines(a, b)))
+
+        assert len(rows) == 3
+        assert '<td>same</td>' in rows[0]
+        assert 'class=diff-chg>old&nbsp;&lt;b&gt;</td>' in rows[1]
+        assert 'class=diff-sub>removed</td>' in rows[2]
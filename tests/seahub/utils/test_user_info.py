@@ -0,0 +1,53 @@
+from seahub.test_utils import BaseTestCase
+
+from seahub.profile.models import Profile
+from seahub.utils.user_info import emails2nicknames, emails2contact_emails, \
+    get_users_info, start_request_memo, end_request_memo
+
+
+class UserInfoTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+
+    def test_emails2nicknames(self):
+        Profile.objects.add_or_update(self.user.username, ' foo bar ')
+
+        nicknames = emails2nicknames([self.user.username, self.admin.username, ''])
+        assert len(nicknames) == 2
+        assert nicknames[self.user.username] == 'foo bar'
+        assert nicknames[self.admin.username] == self.admin.username.split('@')[0]
+
+    def test_emails2contact_emails(self):
+        p = Profile.objects.add_or_update(self.user.username, 'foo')
+        p.contact_email = 'contact@foo.com'
+        p.save()
+
+        contact_emails = emails2contact_emails([self.user.username, self.admin.username])
+        assert contact_emails[self.user.username] == 'contact@foo.com'
+        assert contact_emails[self.admin.username] == self.admin.username
+
+    def test_get_users_info(self):
+        users_info = get_users_info([self.user.username])
+
+        info = users_info[self.user.username]
+        assert info['email'] == self.user.username
+        assert info['name'] == self.user.username.split('@')[0]
+        assert info['contact_email'] == self.user.username
+        assert info['avatar_url'] != ''
+
+    def test_request_memo(self):
+        start_request_memo()
+        try:
+            assert emails2nicknames([self.user.username])[self.user.username] == \
+                self.user.username.split('@')[0]
+
+            Profile.objects.add_or_update(self.user.username, 'foo')
+            self.clear_cache()
+
+            # still the memoized value within the same request
+            assert emails2nicknames([self.user.username])[self.user.username] == \
+                self.user.username.split('@')[0]
+        finally:
+            end_request_memo()
+
+        assert emails2nicknames([self.user.username])[self.user.username] == 'foo'
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from mock import patch
+
+from seahub.profile.models import Profile
+from seahub.test_utils import BaseTestCase
+from seahub.utils import user_search_index
+from seahub.utils.user_search_index import UserSearchIndex, search_users
+
+
+class UserSearchIndexTest(BaseTestCase):
+    def setUp(self):
+        self.index = UserSearchIndex([
+            ('a@test.com', u'Carl Smith', u'new_mail@test.com'),
+            ('b@test.com', u'张三', None),
+        ])
+
+    def test_search_substring(self):
+        assert self.index.search(u'arl smi') == ['a@test.com']
+        assert self.index.search(u'CARL') == ['a@test.com']
+        assert self.index.search(u'mail@test') == ['a@test.com']
+        assert self.index.search(u'carla') == []
+
+    def test_search_word_prefix(self):
+        assert self.index.search(u'sm') == ['a@test.com']
+        assert self.index.search(u'三') == ['b@test.com']
+        assert self.index.search(u'it') == []
+
+    def test_search_pinyin(self):
+        assert self.index.search(u'zhangsan') == ['b@test.com']
+
+    def test_search_with_limits(self):
+        assert self.index.search(u'carl', emails=set(['b@test.com'])) == []
+
+    def test_add_and_remove(self):
+        self.index.add('a@test.com', u'Bob', None)
+        assert self.index.search(u'carl') == []
+        assert self.index.search(u'bob') == ['a@test.com']
+
+        self.index.remove('a@test.com')
+        assert self.index.search(u'bob') == []
+
+    def test_profile_change_is_searchable(self):
+        self.clear_cache()
+        user_search_index._build_index()
+        assert self.admin.email not in search_users(u'Ursula')
+
+        with patch.object(user_search_index, '_build_in_background') as build:
+            Profile.objects.add_or_update(self.admin.email, nickname='Ursula')
+            assert search_users(u'ursula') == [self.admin.email]
+
+            Profile.objects.add_or_update(self.admin.email, nickname='Vera')
+            assert search_users(u'ursula') == []
+
+            # changes are applied to the index, not rebuilt
+            assert not build.called
+
+    def test_search_database_while_building(self):
+        Profile.objects.add_or_update(self.admin.email, nickname='Ursula')
+
+        with patch.dict(user_search_index._loaded, {'index': None}), \
+                patch.object(user_search_index, '_build_in_background') as build:
+            assert search_users(u'ursula') == [self.admin.email]
+            assert build.called
@@ -1,4 +1,7 @@
 import os
+import json
+import time
+import threading
 import openpyxl
 from io import BytesIO
 from mock import patch
@@ -8,7 +11,10 @@ from post_office.models import Email
 from seahub.base.accounts import User
 from seahub.options.models import (UserOptions, KEY_FORCE_PASSWD_CHANGE)
 from seahub.test_utils import BaseTestCase
-from seahub.utils.ms_excel import write_xls as real_write_xls
+from seahub.utils.ms_excel import write_xls as real_write_xls, \
+    write_rows as real_write_rows
+from seahub.utils.export import start_export_job, \
+    export_to_file as real_export_to_file
 
 import pytest
 pytestmark = pytest.mark.django_db
@@ -147,20 +153,68 @@ class SysUserAdminExportExcelTest(BaseTestCase):
         self.assertEqual(200, resp.status_code)
         assert 'application/ms-excel' in resp._headers['content-type']
 
-    def write_xls(self, sheet_name, head, data_list):
+    def write_rows(self, path, sheet_name, head, rows, file_format='xlsx'):
         assert 'Role' in head
-        return real_write_xls(sheet_name, head, data_list)
+        return real_write_rows(path, sheet_name, head, rows, file_format)
 
-    @patch('seahub.views.sysadmin.write_xls')
-    @patch('seahub.views.sysadmin.is_pro_version')
-    def test_can_export_excel_in_pro(self, mock_is_pro_version, mock_write_xls):
+    @patch('seahub.utils.export.write_rows')
+    @patch('seahub.utils.export.is_pro_version')
+    def test_can_export_excel_in_pro(self, mock_is_pro_version, mock_write_rows):
         mock_is_pro_version.return_value = True
-        mock_write_xls.side_effect = self.write_xls
+        mock_write_rows.side_effect = self.write_rows
 
-        mock_write_xls.assert_called_once()
         resp = self.client.get(reverse('sys_useradmin_export_excel'))
         self.assertEqual(200, resp.status_code)
         assert 'application/ms-excel' in resp._headers['content-type']
+        assert mock_write_rows.call_count == 1
+
+    def test_can_export_csv(self):
+        resp = self.client.get(reverse('sys_useradmin_export_excel') + '?format=csv')
+        self.assertEqual(200, resp.status_code)
+        assert 'text/csv' in resp._headers['content-type']
+        assert self.user.username in ''.join(resp.streaming_content)
+
+    @patch('seahub.views.sysadmin.EXPORT_WAIT_TIMEOUT', 0)
+    def test_poll_export_progress(self):
+        started = threading.Event()
+        export_allowed = threading.Event()
+
+        def slow_export_to_file(*args, **kwargs):
+            started.set()
+            export_allowed.wait(10)
+            return real_export_to_file(*args, **kwargs)
+
+        with patch('seahub.utils.export.export_to_file',
+                   side_effect=slow_export_to_file):
+            resp = self.client.get(reverse('sys_useradmin_export_excel'))
+            self.assertEqual(200, resp.status_code)
+            job_id = resp.context['job']['id']
+
+            assert started.wait(10)
+            resp = self.client.get(reverse('sys_useradmin_export_excel') +
+                                   '?job_id=' + job_id,
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            assert json.loads(resp.content)['status'] == 'running'
+
+            export_allowed.set()
+            for i in range(50):
+                resp = self.client.get(reverse('sys_useradmin_export_excel') +
+                                       '?job_id=' + job_id,
+                                       HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                if 'application/ms-excel' in resp._headers['content-type']:
+                    break
+                assert json.loads(resp.content)['status'] == 'running'
+                time.sleep(0.1)
+
+        assert 'application/ms-excel' in resp._headers['content-type']
+
+    def test_can_not_get_job_of_other_user(self):
+        job = start_export_job('users', self.user.username)
+        job['future'].result()
+
+        resp = self.client.get(reverse('sys_useradmin_export_excel') +
+                               '?job_id=' + job['id'])
+        self.assertEqual(302, resp.status_code)
 
 
 class BatchAddUserTest(BaseTestCase):